@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Cold Start Benchmark
+Measures import-to-first-response time of the API Lambda locally. Every run is a fresh
+interpreter that imports lambda_function and handles one event, so each run pays the
+full cold start; a second call of the same event in that process gives the warm latency.
+Runs with EAGER_INIT=true show the cost of creating clients during init instead.
+
+The AgentCore client is constructed for real (boto3 import included) but its
+invoke_agent_runtime is replaced by a stub, so no AWS credentials or network are needed.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEPLOYMENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'deployment')
+
+CONTRACT = 'عقد عمل بين الطرف الأول والطرف الثاني لمدة سنة ميلادية تبدأ من تاريخ التوقيع. ' * 20
+
+EVENTS = {
+    'options': {'httpMethod': 'OPTIONS', 'path': '/api/analyze'},
+    'health': {'httpMethod': 'GET', 'path': '/health'},
+    'warmup': {'warmup': True},
+    'analyze': {
+        'httpMethod': 'POST',
+        'path': '/api/analyze',
+        'body': json.dumps({'analysis_type': 'explanation', 'contract_text': CONTRACT}, ensure_ascii=False)
+    },
+}
+
+# Runs inside the fresh interpreter; prints one JSON line of timings
+CHILD = '''
+import io, json, logging, sys, time
+started = time.perf_counter()
+logging.disable(logging.CRITICAL)
+
+import aws_clients
+
+def stub_invoke(**kwargs):
+    envelope = {'role': 'assistant', 'content': [{'text': json.dumps({'contract_summary': 'ملخص', 'contract_type': {}})}]}
+    return {'response': io.BytesIO(json.dumps(envelope).encode('utf-8'))}
+
+create_client = aws_clients.get_client
+def get_client(service, region=aws_clients.DEFAULT_REGION):
+    client = create_client(service, region)
+    if service == 'bedrock-agentcore':
+        client.invoke_agent_runtime = stub_invoke
+    return client
+aws_clients.get_client = get_client
+
+import lambda_function
+lambda_function.get_client = get_client
+imported = time.perf_counter()
+
+event = json.loads(sys.argv[1])
+lambda_function.lambda_handler(dict(event), None)
+first = time.perf_counter()
+lambda_function.lambda_handler(dict(event), None)
+second = time.perf_counter()
+
+print(json.dumps({
+    'import': imported - started,
+    'first_call': first - imported,
+    'total': first - started,
+    'warm_call': second - first,
+    'boto3': 'boto3' in sys.modules,
+}))
+'''
+
+
+def run_once(event, eager):
+    """Run one cold start in a fresh interpreter and return its timings in seconds"""
+    env = dict(
+        os.environ,
+        PYTHONPATH=DEPLOYMENT_DIR,
+        AWS_DEFAULT_REGION='us-west-2',
+        EAGER_INIT='true' if eager else 'false',
+        OCR_MODE='inprocess',
+        METRICS_EMF_ENABLED='false',
+        JOB_WORKER_MODE='thread',
+        PYTHONDONTWRITEBYTECODE='1',
+    )
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, json.dumps(event, ensure_ascii=False)],
+        env=env, cwd=DEPLOYMENT_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['process'] = time.perf_counter() - started
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per scenario')
+    parser.add_argument('--events', nargs='+', choices=sorted(EVENTS), default=list(EVENTS))
+    args = parser.parse_args()
+
+    print(f"{args.runs} cold starts per scenario, p50 in ms\n")
+    print(f"{'event':<10} {'init':<6} {'import':>8} {'first call':>11} {'import→resp':>12} "
+          f"{'process':>9} {'warm call':>10} {'boto3':>6}")
+
+    for name in args.events:
+        for eager in (False, True):
+            runs = [run_once(EVENTS[name], eager) for _ in range(args.runs)]
+            p50 = lambda field: statistics.median(run[field] for run in runs) * 1000
+            print(f"{name:<10} {'eager' if eager else 'lazy':<6} {p50('import'):>8.1f} {p50('first_call'):>11.1f} "
+                  f"{p50('total'):>12.1f} {p50('process'):>9.1f} {p50('warm_call'):>10.2f} "
+                  f"{'yes' if runs[0]['boto3'] else 'no':>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+Fake AWS clients for offline benchmarks
+Stand-ins for bedrock-agentcore, bedrock-runtime and lambda that answer with recorded or
+synthetic responses, with configurable latency, throttling and slow streams. They are
+installed through aws_clients.set_client, so the handlers run unmodified.
+"""
+
+import base64
+import io
+import json
+import os
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+import aws_clients
+
+RECORDINGS_FILE = 'recordings.jsonl'
+
+WORDS = (
+    'يلتزم الطرف الأول الثاني بسداد الأجر الشهري في موعده وفقاً لأحكام قانون العمل المصري رقم لسنة '
+    'العقد مدة سنة ميلادية تبدأ من تاريخ التوقيع ويجوز تجديدها باتفاق الطرفين كتابة قبل انتهائها بشهرين '
+    'ويستحق العامل إجازة سنوية مدفوعة الأجر وتعويضاً عن الفصل التعسفي ويخضع النزاع للمحاكم العمالية المختصة '
+    'مخاطرة عالية متوسطة منخفضة يوصى بإضافة بند واضح يحدد الالتزامات والجزاءات وآلية التحكيم والإخطار'
+).split()
+
+
+def sentence(rng, words=14):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)) + '.'
+
+
+def make_contract(size, seed=3):
+    """Contract-like Arabic text of varied sentences, numbered as articles"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    article = 1
+    while length < size:
+        if rng.random() < 0.15:
+            parts.append(f'\nالبند {article}:')
+            article += 1
+        parts.append(sentence(rng, rng.randint(8, 30)))
+        length += len(parts[-1]) + 1
+    return ' '.join(parts)[:size]
+
+
+def make_agent_answer(agent_arn, rng, items=6):
+    """Synthetic explanation or assessment findings, in the agents' JSON schemas"""
+    if 'assessment' in agent_arn:
+        answer = {
+            'risk_assessment': sentence(rng, 40),
+            'identified_risks': [
+                {'risk': sentence(rng), 'severity': rng.choice(['عالي', 'متوسط', 'منخفض']), 'impact': sentence(rng)}
+                for _ in range(items)
+            ],
+            'recommendations': [
+                {'priority': 'عالي', 'recommendation': sentence(rng), 'suggested_clause': sentence(rng, 25)}
+                for _ in range(items)
+            ],
+            'overall_fairness': sentence(rng)
+        }
+    else:
+        answer = {
+            'contract_summary': sentence(rng, 50),
+            'contract_type': {'نوع_رئيسي': 'عقد عمل', 'خصائص': [sentence(rng) for _ in range(items)]},
+            'additional_notes': {'ملاحظات_قانونية': [sentence(rng, 25) for _ in range(items)]}
+        }
+    envelope = {'role': 'assistant', 'content': [{'text': json.dumps(answer, ensure_ascii=False)}]}
+    return json.dumps(envelope, ensure_ascii=False)
+
+
+def make_image(seed=0, width=1200, height=1600):
+    """A page-sized JPEG (or signature-prefixed filler bytes without Pillow)"""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        return b'\xff\xd8\xff' + random.Random(seed).randbytes(200 * 1024)
+
+    rng = random.Random(seed)
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for line in range(40, height - 40, 36):
+        x = 60
+        while x < width - 60:
+            word = rng.randint(20, 90)
+            draw.rectangle((x, line, min(x + word, width - 60), line + 14), fill=rng.randint(0, 80))
+            x += word + rng.randint(8, 20)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def make_scan(seed=0, target_bytes=4 * 1024 * 1024):
+    """A photo-like JPEG of roughly target_bytes, for the large-upload path"""
+    rng = random.Random(seed)
+    try:
+        from PIL import Image
+    except ImportError:
+        return b'\xff\xd8\xff' + rng.randbytes(target_bytes)
+
+    def noise_jpeg(side):
+        buffer = io.BytesIO()
+        Image.frombytes('RGB', (side, side), rng.randbytes(side * side * 3)).save(buffer, 'JPEG', quality=90)
+        return buffer.getvalue()
+
+    # Noise barely compresses; size the image from a small sample's bytes per pixel
+    sample = noise_jpeg(500)
+    return noise_jpeg(int(500 * (target_bytes / len(sample)) ** 0.5))
+
+
+class LatencyModel:
+    """Sampled call latency: none, fixed:MS, uniform:LO:HI, lognormal:MEDIAN_MS:SIGMA or recorded"""
+
+    def __init__(self, spec='none', time_scale=1.0):
+        kind, _, params = spec.partition(':')
+        if kind not in ('none', 'fixed', 'uniform', 'lognormal', 'recorded'):
+            raise ValueError(f'Unknown latency model: {spec}')
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(value) for value in params.split(':')] if params else []
+        self.time_scale = time_scale
+
+    def sample(self, rng, recorded_ms=None):
+        """Seconds to wait for one call"""
+        if self.kind == 'fixed':
+            milliseconds = self.params[0]
+        elif self.kind == 'uniform':
+            milliseconds = rng.uniform(self.params[0], self.params[1])
+        elif self.kind == 'lognormal':
+            milliseconds = rng.lognormvariate(0, self.params[1]) * self.params[0]
+        elif self.kind == 'recorded':
+            milliseconds = recorded_ms or 0
+        else:
+            milliseconds = 0
+        return milliseconds / 1000 * self.time_scale
+
+
+class Faults:
+    """Fault injection settings shared by the fake clients"""
+
+    def __init__(self, throttle_rate=0.0, slow_stream_rate=0.0, chunk_delay_ms=50, chunk_size=256, time_scale=1.0):
+        self.throttle_rate = throttle_rate
+        self.slow_stream_rate = slow_stream_rate
+        self.chunk_delay = chunk_delay_ms / 1000 * time_scale
+        self.chunk_size = chunk_size
+        self.throttled = 0
+        self.slow_streams = 0
+        self._lock = threading.Lock()
+
+    def maybe_throttle(self, rng, operation):
+        if rng.random() < self.throttle_rate:
+            self.throttle(operation)
+
+    def throttle(self, operation):
+        with self._lock:
+            self.throttled += 1
+        raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, operation)
+
+    def body(self, rng, data):
+        """A response body, trickled out in delayed chunks for a share of calls"""
+        if rng.random() < self.slow_stream_rate:
+            with self._lock:
+                self.slow_streams += 1
+            return SlowStream(data, self.chunk_size, self.chunk_delay)
+        return SlowStream(data, len(data) or 1, 0)
+
+
+class SlowStream:
+    """A botocore StreamingBody stand-in that waits between chunks"""
+
+    def __init__(self, data, chunk_size, chunk_delay):
+        self._buffer = io.BytesIO(data)
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+
+    def read(self, amt=None):
+        parts = []
+        while amt is None or sum(len(part) for part in parts) < amt:
+            wanted = self.chunk_size if amt is None else min(self.chunk_size, amt - sum(len(part) for part in parts))
+            part = self._buffer.read(wanted)
+            if not part:
+                break
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            parts.append(part)
+        return b''.join(parts)
+
+    def iter_chunks(self, chunk_size=1024):
+        while True:
+            part = self.read(chunk_size)
+            if not part:
+                return
+            yield part
+
+    def iter_lines(self, chunk_size=1024):
+        pending = b''
+        for part in self.iter_chunks(chunk_size):
+            lines = (pending + part).split(b'\n')
+            pending = lines.pop()
+            yield from lines
+        if pending:
+            yield pending
+
+
+class ResponseLibrary:
+    """Recorded responses by operation and key (agent ARN or model ID), replayed in turn"""
+
+    def __init__(self, recordings=()):
+        self._entries = {}
+        self._positions = {}
+        self._lock = threading.Lock()
+        for entry in recordings:
+            self._entries.setdefault((entry['operation'], entry['key']), []).append(entry)
+            self._entries.setdefault((entry['operation'], None), []).append(entry)
+
+    def __len__(self):
+        return sum(len(entries) for (_, key), entries in self._entries.items() if key is not None)
+
+    def next(self, operation, key):
+        """The next recording for the key (or any of the operation), or None"""
+        slot = (operation, key) if (operation, key) in self._entries else (operation, None)
+        entries = self._entries.get(slot)
+        if not entries:
+            return None
+        with self._lock:
+            position = self._positions.get(slot, 0)
+            self._positions[slot] = position + 1
+        return entries[position % len(entries)]
+
+
+def load_recordings(directory):
+    """Recorded responses saved by Recorder"""
+    with open(os.path.join(directory, RECORDINGS_FILE), encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class Recorder:
+    """Appends real responses to DIRECTORY/recordings.jsonl"""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, RECORDINGS_FILE)
+        self._lock = threading.Lock()
+
+    def add(self, operation, key, latency_ms, body, content_type=''):
+        line = json.dumps({
+            'operation': operation, 'key': key, 'latency_ms': round(latency_ms, 1),
+            'content_type': content_type, 'body': body
+        }, ensure_ascii=False)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+class RecordingClient:
+    """Wraps a real client and records each agent or model response it returns"""
+
+    def __init__(self, client, recorder):
+        self._client = client
+        self._recorder = recorder
+
+    def invoke_agent_runtime(self, **kwargs):
+        started = time.perf_counter()
+        response = self._client.invoke_agent_runtime(**kwargs)
+        body = response['response'].read()
+        self._recorder.add('invoke_agent_runtime', kwargs['agentRuntimeArn'],
+                           (time.perf_counter() - started) * 1000, body.decode('utf-8'),
+                           response.get('contentType', ''))
+        return dict(response, response=io.BytesIO(body))
+
+    def invoke_model(self, **kwargs):
+        started = time.perf_counter()
+        response = self._client.invoke_model(**kwargs)
+        body = response['body'].read()
+        self._recorder.add('invoke_model', kwargs['modelId'], (time.perf_counter() - started) * 1000,
+                           body.decode('utf-8'))
+        return dict(response, body=io.BytesIO(body))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class FakeClient:
+    """Shared latency, fault and replay handling
+
+    With a capacity, calls beyond that many in flight are throttled, the way a
+    service quota rejects excess concurrency.
+    """
+
+    def __init__(self, library=None, latency=None, faults=None, seed=0, capacity=None):
+        self.library = library or ResponseLibrary()
+        self.latency = latency or LatencyModel()
+        self.faults = faults or Faults()
+        self.capacity = capacity
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _call(self, operation, key):
+        """Count the call, pick its recording, wait out its latency and maybe throttle"""
+        with self._lock:
+            self.calls += 1
+            rng = random.Random(self._rng.random())
+            over_capacity = self.capacity is not None and self.in_flight >= self.capacity
+            if not over_capacity:
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        if over_capacity:
+            self.faults.throttle(operation)
+
+        try:
+            recording = self.library.next(operation, key)
+            time.sleep(self.latency.sample(rng, recording and recording['latency_ms']))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        self.faults.maybe_throttle(rng, operation)
+        return rng, recording
+
+
+class FakeAgentCore(FakeClient):
+    """bedrock-agentcore stand-in answering with recorded or synthetic findings"""
+
+    def __init__(self, items=6, **kwargs):
+        super().__init__(**kwargs)
+        self.items = items
+
+    def invoke_agent_runtime(self, agentRuntimeArn, runtimeSessionId, payload, **kwargs):
+        rng, recording = self._call('invoke_agent_runtime', agentRuntimeArn)
+        if recording:
+            body, content_type = recording['body'], recording.get('content_type') or 'application/json'
+        else:
+            body, content_type = make_agent_answer(agentRuntimeArn, rng, self.items), 'application/json'
+        return {
+            'response': self.faults.body(rng, body.encode('utf-8')),
+            'contentType': content_type,
+            'runtimeSessionId': runtimeSessionId
+        }
+
+
+class FakeBedrockRuntime(FakeClient):
+    """bedrock-runtime stand-in answering invoke_model with recorded or synthetic OCR text"""
+
+    def invoke_model(self, modelId, body, **kwargs):
+        rng, recording = self._call('invoke_model', modelId)
+        if recording:
+            data = recording['body']
+        else:
+            text = '\n'.join(sentence(rng, rng.randint(10, 25)) for _ in range(30))
+            data = json.dumps({'content': [{'type': 'text', 'text': text}]}, ensure_ascii=False)
+        return {'body': self.faults.body(rng, data.encode('utf-8')), 'contentType': 'application/json'}
+
+
+class FakeLambda(FakeClient):
+    """lambda stand-in that runs the OCR function in-process behind a simulated hop
+
+    The payload and result are serialized both ways, like a real invoke.
+    """
+
+    def invoke(self, FunctionName, Payload, InvocationType='RequestResponse', **kwargs):
+        self._call('invoke', FunctionName)
+        if InvocationType == 'Event':
+            return {'StatusCode': 202}
+
+        import ocr_processor
+
+        event = json.loads(Payload)
+        result = json.dumps(ocr_processor.lambda_handler(event, None))
+        return {'StatusCode': 200, 'Payload': io.BytesIO(result.encode('utf-8'))}
+
+
+def install_fake_clients(agent_core=None, bedrock_runtime=None, lambda_client=None, region=aws_clients.DEFAULT_REGION):
+    """Install fakes through the shared client factory, so handlers pick them up"""
+    for service, client in (('bedrock-agentcore', agent_core), ('bedrock-runtime', bedrock_runtime),
+                            ('lambda', lambda_client)):
+        if client is not None:
+            aws_clients.set_client(service, client, region)
+
+
+def install_recording_clients(recorder, region=aws_clients.DEFAULT_REGION):
+    """Wrap the real agent and model clients so their responses are recorded"""
+    for service in ('bedrock-agentcore', 'bedrock-runtime'):
+        aws_clients.set_client(service, RecordingClient(aws_clients.get_client(service, region), recorder), region)
+
+
+def encode_image(image_bytes):
+    return base64.b64encode(image_bytes).decode('ascii')
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Handler Benchmark
+Drives lambda_handler and ocr_processor.lambda_handler with synthetic API Gateway events,
+with AgentCore, Claude Vision and the OCR Lambda replaced by fakes (fake_clients.py), and
+reports per-route throughput, latency percentiles, peak memory and the slowest stages.
+
+Fake latency follows --agent-latency/--vision-latency/--hop-latency (none, fixed:MS,
+uniform:LO:HI, lognormal:MEDIAN_MS:SIGMA, or recorded with --replay); --time-scale shrinks
+every injected wait. --throttle-rate raises ThrottlingException on a share of calls and
+--slow-stream-rate trickles a share of response bodies out in delayed chunks. With the
+default of no latency, the numbers are the handlers' own overhead.
+
+Peak memory is the largest Python heap growth while handling one request of the route;
+ocr_large sends a --large-image-mb photo-sized scan, the case that decides how small the
+Lambdas' memory setting can go; ocr_upload sends the same scans by object key, uploaded
+beforehand to an in-process local_s3.py stand-in, as browsers do with direct uploads.
+
+--record DIR runs against the real services (AWS credentials required) and saves every
+agent and model response; --replay DIR answers with those recordings afterwards.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'deployment'))
+
+from fake_clients import (
+    FakeAgentCore, FakeBedrockRuntime, FakeLambda, Faults, LatencyModel, Recorder, ResponseLibrary,
+    encode_image, install_fake_clients, install_recording_clients, load_recordings, make_contract, make_image, make_scan
+)
+
+ROUTES = ('health', 'analyze', 'full_report', 'stream', 'sections', 'ask', 'batch', 'ocr', 'ocr_pages', 'ocr_large',
+          'ocr_upload', 'ocr_direct')
+DEFAULT_ROUTES = ('health', 'analyze', 'full_report', 'stream', 'ask', 'batch', 'ocr', 'ocr_pages', 'ocr_large')
+
+QUESTION = 'ما هي مدة الإجازة السنوية وكيف يتم احتساب التعويض عند الفصل؟'
+
+
+def api_event(method, path, body=None):
+    """An API Gateway REST proxy event"""
+    return {
+        'httpMethod': method,
+        'path': path,
+        'headers': {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'},
+        'requestContext': {'stage': 'prod', 'requestId': 'benchmark'},
+        'isBase64Encoded': False,
+        'body': json.dumps(body, ensure_ascii=False) if body is not None else None
+    }
+
+
+def upload_files(files):
+    """Upload (name, content_type, bytes) files the way the website does; returns their object keys"""
+    import upload_store
+
+    session = upload_store.create_session([
+        {'name': name, 'content_type': content_type, 'size': len(data)} for name, content_type, data in files
+    ])
+    for upload, (_, _, data) in zip(session['uploads'], files):
+        request = urllib.request.Request(upload['url'], data=data, method='PUT', headers=upload['headers'])
+        urllib.request.urlopen(request).close()
+    return [upload['object_key'] for upload in session['uploads']]
+
+
+def build_events(route, count, args, image_data, scan_data, scan_keys=()):
+    """One event per request; contracts differ per request so nothing is served from cache"""
+    contract = lambda position: make_contract(args.contract_kb * 1024, seed=position)
+    if route == 'health':
+        return [api_event('GET', '/health') for _ in range(count)]
+    if route == 'analyze':
+        return [api_event('POST', '/api/analyze', {'analysis_type': 'explanation', 'contract_text': contract(i)})
+                for i in range(count)]
+    if route == 'full_report':
+        return [api_event('POST', '/api/analyze', {'analysis_type': 'both', 'contract_text': contract(i)})
+                for i in range(count)]
+    if route == 'stream':
+        return [api_event('POST', '/api/analyze', {'analysis_type': 'explanation', 'contract_text': contract(i),
+                                                   'stream': True})
+                for i in range(count)]
+    if route == 'sections':
+        return [api_event('POST', '/api/analyze', {'analysis_type': 'assessment', 'long_document': True,
+                                                   'contract_text': make_contract(80 * 1024, seed=i)})
+                for i in range(count)]
+    if route == 'ask':
+        return [api_event('POST', '/api/ask', {'question': QUESTION, 'contract_text': contract(i)})
+                for i in range(count)]
+    if route == 'batch':
+        return [api_event('POST', '/api/analyze/batch', {'items': [
+            {'analysis_type': 'explanation', 'contract_text': contract(i * 10 + item)} for item in range(5)
+        ]}) for i in range(count)]
+    if route == 'ocr':
+        return [api_event('POST', '/api/ocr', {'image_data': image_data[i % len(image_data)]}) for i in range(count)]
+    if route == 'ocr_large':
+        return [api_event('POST', '/api/ocr', {'image_data': scan_data[i % len(scan_data)]}) for i in range(count)]
+    if route == 'ocr_upload':
+        return [api_event('POST', '/api/ocr', {'object_key': scan_keys[i % len(scan_keys)]}) for i in range(count)]
+    if route == 'ocr_pages':
+        return [api_event('POST', '/api/ocr', {'pages': [image_data[(i + page) % len(image_data)]
+                                                         for page in range(args.pages)]})
+                for i in range(count)]
+    # The OCR function's own handler, as invoked by OCR_MODE=lambda
+    return [{'image_data': image_data[i % len(image_data)]} for i in range(count)]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_route(handler, events, concurrency):
+    """Send the events with bounded concurrency; returns (latencies in ms, error count, wall seconds)"""
+    def send(event):
+        started = time.perf_counter()
+        response = handler(event, None)
+        return (time.perf_counter() - started) * 1000, response.get('statusCode', 200) >= 400
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(send, events))
+    return [latency for latency, _ in outcomes], sum(1 for _, failed in outcomes if failed), time.perf_counter() - started
+
+
+def peak_memory_mb(handler, events):
+    """Peak Python heap growth of a single request, handling the events one by one"""
+    tracemalloc.start()
+    try:
+        peak = 0
+        for event in events:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            handler(event, None)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        return peak / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def slowest_stages(snapshot, count=3):
+    stages = sorted(snapshot['stages'].items(), key=lambda item: item[1].get('mean', 0), reverse=True)
+    return ', '.join(f"{name} {summary['p50']:.1f}" for name, summary in stages[:count] if summary.get('window'))
+
+
+def configure_environment(args):
+    """Must run before lambda_function is imported, which reads its settings at import"""
+    if not args.cache:
+        for name in ('RESULT_CACHE_ENABLED', 'IDEMPOTENCY_ENABLED', 'FOLLOWUP_CACHE_ENABLED', 'OCR_CACHE_ENABLED'):
+            os.environ[name] = 'false'
+    os.environ['METRICS_EMF_ENABLED'] = 'false'
+    os.environ['JOB_WORKER_MODE'] = 'thread'
+    os.environ.setdefault('BATCH_BASE_BACKOFF_SECONDS', str(1.0 * args.time_scale))
+    os.environ.setdefault('BATCH_MAX_BACKOFF_SECONDS', str(20.0 * args.time_scale))
+    if 'ocr_upload' in args.routes:
+        from local_s3 import start_server
+
+        # Kept on args so the server lives as long as the run
+        args.s3_server, endpoint = start_server()
+        os.environ['AWS_ENDPOINT_URL_S3'] = endpoint
+        os.environ['UPLOAD_BUCKET'] = 'benchmark-uploads'
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--routes', nargs='+', choices=ROUTES, default=list(DEFAULT_ROUTES))
+    parser.add_argument('--requests', type=int, default=40, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--contract-kb', type=int, default=20)
+    parser.add_argument('--pages', type=int, default=3, help='pages per ocr_pages request')
+    parser.add_argument('--large-image-mb', type=float, default=4.0, help='image size for ocr_large')
+    parser.add_argument('--ocr-mode', choices=('inprocess', 'lambda'), default='inprocess')
+    parser.add_argument('--agent-latency', help='default: none, or recorded with --replay')
+    parser.add_argument('--vision-latency', help='default: none, or recorded with --replay')
+    parser.add_argument('--hop-latency', default='none', help='OCR Lambda invoke overhead')
+    parser.add_argument('--time-scale', type=float, default=1.0, help='multiplier for every injected wait')
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--slow-stream-rate', type=float, default=0.0)
+    parser.add_argument('--chunk-delay-ms', type=float, default=50)
+    parser.add_argument('--memory-requests', type=int, default=3, help='requests per route traced for peak memory')
+    parser.add_argument('--cache', action='store_true', help='keep result, answer, OCR and idempotency caches on')
+    parser.add_argument('--record', metavar='DIR', help='call the real services and record their responses')
+    parser.add_argument('--replay', metavar='DIR', help='answer with responses recorded by --record')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    configure_environment(args)
+    logging.disable(logging.CRITICAL)
+
+    import lambda_function
+    import ocr_processor
+    import request_metrics
+
+    library = ResponseLibrary(load_recordings(args.replay) if args.replay else ())
+    default_latency = 'recorded' if args.replay else 'none'
+    faults = Faults(args.throttle_rate, args.slow_stream_rate, args.chunk_delay_ms, time_scale=args.time_scale)
+    agent = FakeAgentCore(library=library, faults=faults, seed=args.seed,
+                          latency=LatencyModel(args.agent_latency or default_latency, args.time_scale))
+    vision = FakeBedrockRuntime(library=library, faults=faults, seed=args.seed + 1,
+                                latency=LatencyModel(args.vision_latency or default_latency, args.time_scale))
+    hop = FakeLambda(latency=LatencyModel(args.hop_latency, args.time_scale), seed=args.seed + 2)
+
+    if args.record:
+        install_recording_clients(Recorder(args.record))
+        mode = f'recording to {args.record}'
+    else:
+        install_fake_clients(agent, vision, hop)
+        mode = f'replaying {len(library)} recordings' if args.replay else 'synthetic responses'
+    lambda_function.OCR_MODE = args.ocr_mode
+
+    image_data = [encode_image(make_image(seed)) for seed in range(4)]
+    scans = [make_scan(seed, int(args.large_image_mb * 1024 * 1024)) for seed in range(2)]
+    scan_data = [encode_image(scan) for scan in scans]
+    scan_keys = upload_files([(f'scan-{seed}.jpg', 'image/jpeg', scan) for seed, scan in enumerate(scans)]) \
+        if 'ocr_upload' in args.routes else ()
+    del scans
+
+    print(f"Handler benchmark: {mode}, {args.requests} requests per route, concurrency {args.concurrency}, "
+          f"OCR {args.ocr_mode}")
+    print(f"Latency: agent {agent.latency.spec}, vision {vision.latency.spec}, hop {hop.latency.spec}, "
+          f"time scale {args.time_scale}; throttle {args.throttle_rate:.0%}, slow streams {args.slow_stream_rate:.0%}\n")
+    print(f"{'route':<12} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} "
+          f"{'peak MB':>8}  slowest stages (p50 ms)")
+
+    for route in args.routes:
+        handler = ocr_processor.lambda_handler if route == 'ocr_direct' else lambda_function.lambda_handler
+        events = build_events(route, args.requests, args, image_data, scan_data, scan_keys)
+
+        # One untimed request so lazy imports and client set-up are not charged to the route
+        handler(build_events(route, 1, args, image_data, scan_data, scan_keys)[0], None)
+        request_metrics.reset()
+
+        latencies, errors, wall = run_route(handler, events, args.concurrency)
+        snapshot = request_metrics.snapshot()
+        peak = peak_memory_mb(handler, events[:args.memory_requests])
+
+        print(f"{route:<12} {errors:>6} {len(events) / wall:>8.1f} {statistics.median(latencies):>9.1f} "
+              f"{percentile(latencies, 0.9):>9.1f} {percentile(latencies, 0.99):>9.1f} {max(latencies):>9.1f} "
+              f"{peak:>8.1f}  {slowest_stages(snapshot)}")
+
+    print(f"\nFake calls: agent {agent.calls}, vision {vision.calls}, OCR hop {hop.calls}; "
+          f"throttled {faults.throttled}, slow streams {faults.slow_streams}")
+
+
+if __name__ == "__main__":
+    main()
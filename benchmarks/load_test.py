@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Load Test
+Sends a mix of /api/analyze, /api/ask and /api/ocr requests at increasing target rates and
+reports p50/p95/p99 latency, error rate and the rate at which the service saturates.
+Contracts are synthetic Arabic text of 1-200 KB (log-uniform) and OCR requests carry
+page-sized images, so long-document and multi-page paths are exercised too.
+
+Arrivals are open-loop (Poisson at the target rate), and latency is measured from each
+request's scheduled start, so a backlog shows up as latency instead of being hidden.
+
+Targets:
+  handler   call lambda_handler in this process (default)
+  serve     start streaming_server.py on --port in this process and send HTTP requests
+  URL       send HTTP requests to a running deployment (real backends, real cost)
+
+For handler and serve, AgentCore, Claude Vision and the OCR hop are the fakes from
+fake_clients.py with production-like latencies, scaled by --time-scale.
+--agent-capacity/--vision-capacity throttle calls beyond that many in flight, like
+service quotas. --containers caps concurrent handler calls, like reserved concurrency;
+requests beyond it are rejected with 429. In-process runs share one interpreter, so
+CPU-bound stages saturate sooner than on a fleet of containers.
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import math
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'deployment'))
+
+from fake_clients import (
+    FakeAgentCore, FakeBedrockRuntime, FakeLambda, Faults, LatencyModel, encode_image, install_fake_clients,
+    make_contract, make_image
+)
+
+ROUTES = ('analyze', 'ask', 'ocr')
+
+QUESTIONS = [
+    'ما هي مدة العقد وشروط تجديده؟',
+    'هل يحق لصاحب العمل إنهاء العقد أثناء فترة الاختبار؟',
+    'كيف يتم احتساب التعويض عند الفصل التعسفي؟',
+    'ما هي التزامات الطرف الثاني في حالة الإخلال بالعقد؟',
+    'هل يتضمن العقد شرط عدم المنافسة وما مدته؟',
+]
+
+
+def parse_mix(spec):
+    """'analyze=60,ask=30,ocr=10' as route weights"""
+    weights = {}
+    for part in spec.split(','):
+        route, _, weight = part.partition('=')
+        if route not in ROUTES:
+            raise ValueError(f'Unknown route in mix: {route}')
+        weights[route] = float(weight or 1)
+    return weights
+
+
+def make_contract_bytes(size_kb, seed):
+    """A contract of size_kb kilobytes of UTF-8"""
+    size = int(size_kb * 1024)
+    # Arabic letters take two bytes, so half as many characters fill the size
+    return make_contract(size // 2 + 64, seed=seed).encode('utf-8')[:size].decode('utf-8', errors='ignore')
+
+
+class Workload:
+    """Pre-built request bodies, so generating them does not slow the sender"""
+
+    def __init__(self, mix, min_kb, max_kb, pages, pool_size, seed):
+        self.rng = random.Random(seed)
+        self.routes = list(mix)
+        self.weights = [mix[route] for route in self.routes]
+        sizes = [math.exp(self.rng.uniform(math.log(min_kb), math.log(max_kb))) for _ in range(pool_size)]
+        self.contracts = [make_contract_bytes(size, seed + position) for position, size in enumerate(sizes)]
+        self.images = [encode_image(make_image(seed + position)) for position in range(4)] if 'ocr' in mix else []
+        self.pages = pages
+
+    def next_request(self, position):
+        """(route, path, body) for the request at this position"""
+        route = self.rng.choices(self.routes, self.weights)[0]
+        contract = self.rng.choice(self.contracts)
+        user_id = f'load_user_{position}'
+        if route == 'analyze':
+            analysis_type = self.rng.choice(['explanation', 'assessment', 'both'])
+            return route, '/api/analyze', {'analysis_type': analysis_type, 'contract_text': contract, 'user_id': user_id}
+        if route == 'ask':
+            return route, '/api/ask', {'question': self.rng.choice(QUESTIONS), 'contract_text': contract,
+                                       'user_id': user_id}
+        page_count = self.rng.randint(1, self.pages)
+        if page_count == 1:
+            return route, '/api/ocr', {'image_data': self.rng.choice(self.images), 'user_id': user_id}
+        return route, '/api/ocr', {'pages': [self.rng.choice(self.images) for _ in range(page_count)],
+                                   'user_id': user_id}
+
+
+class HandlerTarget:
+    """lambda_handler in this process, with an optional cap on concurrent invocations"""
+
+    def __init__(self, containers=None):
+        import lambda_function
+
+        self.handler = lambda_function.lambda_handler
+        self.slots = threading.BoundedSemaphore(containers) if containers else None
+
+    def send(self, path, body):
+        if self.slots and not self.slots.acquire(blocking=False):
+            return 429
+        try:
+            event = {
+                'httpMethod': 'POST',
+                'path': path,
+                'headers': {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'},
+                'body': json.dumps(body, ensure_ascii=False)
+            }
+            return self.handler(event, None)['statusCode']
+        finally:
+            if self.slots:
+                self.slots.release()
+
+
+class HttpTarget:
+    """The API over HTTP, with gzip-compressed uploads"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def send(self, path, body):
+        data = gzip.compress(json.dumps(body, ensure_ascii=False).encode('utf-8'))
+        request = urllib.request.Request(self.base_url + path, data=data, method='POST', headers={
+            'Content-Type': 'application/json', 'Content-Encoding': 'gzip', 'Accept-Encoding': 'gzip'
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except OSError:
+            return 599
+
+
+def start_local_server(port):
+    """Serve the API over HTTP from a background thread"""
+    from http.server import ThreadingHTTPServer
+
+    import streaming_server
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), streaming_server.ContractAPIRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{port}'
+
+
+def run_step(target, workload, rate, duration, max_in_flight):
+    """Offer `rate` requests per second for `duration` seconds; returns per-request outcomes
+    (route, status, latency in ms, and send and finish times in seconds from the step start)"""
+    outcomes = []
+    lock = threading.Lock()
+    rng = random.Random(rate)
+
+    def send(route, path, body, scheduled):
+        status = target.send(path, body)
+        finished = time.perf_counter()
+        with lock:
+            outcomes.append((route, status, (finished - scheduled) * 1000, scheduled - started, finished - started))
+
+    started = time.perf_counter()
+    scheduled = started
+    position = 0
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        while True:
+            scheduled += rng.expovariate(rate)
+            if scheduled - started >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            route, path, body = workload.next_request(position)
+            position += 1
+            executor.submit(send, route, path, body, scheduled)
+    return outcomes
+
+
+def summarize(outcomes, duration):
+    """Latency percentiles, error rate, the rate sent against the rate completed within the
+    step (the drain after it is left out), and backlog growth
+
+    A service that falls behind queues requests, so those sent late in the step wait longer
+    than those sent early; one that keeps up serves both alike, however slow each request is.
+    Backlog growth is the median latency of the last third of the step over the first third.
+    """
+    latencies = sorted(outcome[2] for outcome in outcomes)
+    errors = sum(1 for outcome in outcomes if outcome[1] >= 400)
+    percentile = lambda fraction: latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+    early = [outcome[2] for outcome in outcomes if outcome[3] < duration / 3]
+    late = [outcome[2] for outcome in outcomes if outcome[3] >= 2 * duration / 3]
+    # Too few requests per third for a stable median says nothing either way
+    growth = statistics.median(late) / statistics.median(early) if min(len(early), len(late)) >= 10 else 1.0
+    return {
+        'requests': len(outcomes),
+        'offered': len(outcomes) / duration,
+        'throughput': sum(1 for outcome in outcomes if outcome[4] <= duration) / duration,
+        'backlog_growth': growth,
+        'error_rate': errors / len(outcomes) if outcomes else 0.0,
+        'throttled': sum(1 for outcome in outcomes if outcome[1] == 429),
+        'p50': statistics.median(latencies) if latencies else 0.0,
+        'p95': percentile(0.95) if latencies else 0.0,
+        'p99': percentile(0.99) if latencies else 0.0
+    }
+
+
+def print_row(label, summary):
+    print(f"  {label:<10} {summary['requests']:>6} {summary['offered']:>8.1f} {summary['throughput']:>8.1f} "
+          f"{summary['error_rate']:>7.1%} "
+          f"{summary['throttled']:>6} {summary['p50']:>9.0f} {summary['p95']:>9.0f} {summary['p99']:>9.0f} "
+          f"{summary['backlog_growth']:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', default='handler', help='handler, serve, or the base URL of a deployment')
+    parser.add_argument('--port', type=int, default=8089, help='port for --target serve')
+    parser.add_argument('--rates', default='2,4,8,16,32', help='target requests per second, one step each')
+    parser.add_argument('--duration', type=float, default=15, help='seconds per step')
+    parser.add_argument('--mix', default='analyze=60,ask=30,ocr=10')
+    parser.add_argument('--min-kb', type=float, default=1)
+    parser.add_argument('--max-kb', type=float, default=200)
+    parser.add_argument('--pages', type=int, default=3, help='most pages per OCR request')
+    parser.add_argument('--pool', type=int, default=24, help='distinct contracts to draw from')
+    parser.add_argument('--agent-latency', default='lognormal:9000:0.4')
+    parser.add_argument('--vision-latency', default='lognormal:6000:0.3')
+    parser.add_argument('--hop-latency', default='fixed:80')
+    parser.add_argument('--time-scale', type=float, default=0.1, help='multiplier for every stub latency')
+    parser.add_argument('--agent-capacity', type=int, help='concurrent agent calls before throttling')
+    parser.add_argument('--vision-capacity', type=int, help='concurrent Claude Vision calls before throttling')
+    parser.add_argument('--containers', type=int, help='concurrent handler calls before 429 (handler target)')
+    parser.add_argument('--ocr-mode', choices=('inprocess', 'lambda'), default='inprocess')
+    parser.add_argument('--slo-p99-ms', type=float, default=30000, help='p99 above this counts as saturated')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--max-backlog-growth', type=float, default=2.0,
+                        help='median latency of the last third of a step over the first third that counts as saturated')
+    parser.add_argument('--max-in-flight', type=int, default=512)
+    parser.add_argument('--timeout', type=float, default=120, help='HTTP timeout in seconds')
+    parser.add_argument('--cache', action='store_true', help='keep result, answer, OCR and idempotency caches on')
+    parser.add_argument('--seed', type=int, default=17)
+    args = parser.parse_args()
+
+    remote = args.target not in ('handler', 'serve')
+    if not args.cache:
+        for name in ('RESULT_CACHE_ENABLED', 'IDEMPOTENCY_ENABLED', 'FOLLOWUP_CACHE_ENABLED', 'OCR_CACHE_ENABLED'):
+            os.environ[name] = 'false'
+    os.environ['METRICS_EMF_ENABLED'] = 'false'
+    logging.disable(logging.CRITICAL)
+
+    if not remote:
+        import lambda_function
+
+        faults = Faults(time_scale=args.time_scale)
+        agent = FakeAgentCore(faults=faults, seed=args.seed, capacity=args.agent_capacity,
+                              latency=LatencyModel(args.agent_latency, args.time_scale))
+        vision = FakeBedrockRuntime(faults=faults, seed=args.seed + 1, capacity=args.vision_capacity,
+                                    latency=LatencyModel(args.vision_latency, args.time_scale))
+        install_fake_clients(agent, vision, FakeLambda(latency=LatencyModel(args.hop_latency, args.time_scale)))
+        lambda_function.OCR_MODE = args.ocr_mode
+
+    if args.target == 'handler':
+        target = HandlerTarget(args.containers)
+    elif args.target == 'serve':
+        target = HttpTarget(start_local_server(args.port), args.timeout)
+    else:
+        target = HttpTarget(args.target, args.timeout)
+
+    mix = parse_mix(args.mix)
+    workload = Workload(mix, args.min_kb, args.max_kb, args.pages, args.pool, args.seed)
+    sizes = sorted(len(contract.encode('utf-8')) / 1024 for contract in workload.contracts)
+
+    print(f"Load test against {args.target}: mix {args.mix}, contracts {sizes[0]:.0f}-{sizes[-1]:.0f} KB "
+          f"(median {statistics.median(sizes):.0f} KB), {args.duration:.0f}s per step")
+    if not remote:
+        print(f"Stub latency x{args.time_scale}: agent {args.agent_latency}, vision {args.vision_latency}, "
+              f"hop {args.hop_latency}; capacity agent {args.agent_capacity or '-'}, "
+              f"vision {args.vision_capacity or '-'}, containers {args.containers or '-'}")
+    print(f"\n  {'rate':<10} {'reqs':>6} {'sent/s':>8} {'done/s':>8} {'errors':>7} {'429':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'backlog':>8}")
+
+    saturation = None
+    for rate in [float(value) for value in args.rates.split(',')]:
+        outcomes = run_step(target, workload, rate, args.duration, args.max_in_flight)
+        summary = summarize(outcomes, args.duration)
+        print_row(f'{rate:g}/s', summary)
+        for route in mix:
+            route_outcomes = [outcome for outcome in outcomes if outcome[0] == route]
+            if route_outcomes:
+                print_row(f'  {route}', summarize(route_outcomes, args.duration))
+
+        # Saturated once errors or tail latency break the limits, or a backlog builds up during the step
+        if saturation is None and (summary['error_rate'] > args.max_error_rate or summary['p99'] > args.slo_p99_ms
+                                   or summary['backlog_growth'] > args.max_backlog_growth):
+            saturation = rate
+            print(f"  -- saturated at {rate:g} req/s")
+
+    if saturation is None:
+        print("\nNo saturation within the tested rates; raise --rates to find the limit")
+    else:
+        print(f"\nSaturation point: {saturation:g} req/s "
+              f"(p99 > {args.slo_p99_ms:.0f} ms, errors > {args.max_error_rate:.0%} "
+              f"or backlog growth > {args.max_backlog_growth:g}x)")
+
+
+if __name__ == "__main__":
+    main()
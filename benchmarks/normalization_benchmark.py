@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Arabic Normalization Benchmark
+Times arabic_text.normalize_text on synthetic contracts against the equivalent chain of
+regex passes and a single str.translate table, checking all three produce identical output.
+"""
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'deployment'))
+
+from arabic_text import DELETED_CHARACTERS, DIGITS, LETTER_VARIANTS, normalize_text, normalize_words
+from result_cache import make_cache_key
+
+WORDS = [
+    'العقد', 'الطرف', 'الأول', 'الثاني', 'يلتزم', 'بدفع', 'مبلغ', 'قدره', 'جنيه', 'مصري',
+    'إنهاء', 'فترة', 'الاختبار', 'مدة', 'سنة', 'ميلادية', 'تبدأ', 'من', 'تاريخ', 'التوقيع',
+    'على', 'أن', 'يخطر', 'كتابياً', 'قبل', 'شهرين', 'البند', 'المادة', 'القانون', 'المدني',
+    'مسمّى', 'الإجازة', 'السنوية', 'مؤقت', 'هيئة', 'قائمة', 'Contract', 'LLC'
+]
+TASHKEEL = ['َ', 'ُ', 'ِ', 'ّ', 'ْ', 'ً', 'ٍ']
+
+# The same rules as separate regex passes, the way ad-hoc cleanup code applies them
+REGEX_PASSES = [
+    (re.compile('[ؐ-ًؚ-ٰٟۖ-ۭ]'), ''),
+    (re.compile('ـ'), ''),
+    (re.compile('[أإآٱ]'), 'ا'),
+    (re.compile('[ىیئ]'), 'ي'),
+    (re.compile('ة'), 'ه'),
+    (re.compile('ؤ'), 'و'),
+    (re.compile('ک'), 'ك'),
+]
+ARABIC_INDIC_DIGITS = re.compile('[٠-٩۰-۹]')
+WHITESPACE = re.compile(r'\s+')
+
+TRANSLATE_TABLE = str.maketrans({**dict.fromkeys(DELETED_CHARACTERS), **LETTER_VARIANTS, **DIGITS})
+
+
+def regex_normalize(text):
+    """Reference implementation: one regex pass per rule"""
+    text = unicodedata.normalize('NFKC', text)
+    for pattern, replacement in REGEX_PASSES:
+        text = pattern.sub(replacement, text)
+    text = ARABIC_INDIC_DIGITS.sub(lambda match: str(int(unicodedata.digit(match.group()))), text)
+    return WHITESPACE.sub(' ', text.lower()).strip()
+
+
+def translate_normalize(text):
+    """Alternative: NFKC, then one str.translate pass over the same tables"""
+    text = unicodedata.normalize('NFKC', text).translate(TRANSLATE_TABLE)
+    return ' '.join(text.lower().split())
+
+
+def make_contract(size, seed=7):
+    """Build a contract-like text with tashkeel, tatweel, letter variants and Arabic-Indic digits"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    clause = 1
+    while length < size:
+        if rng.random() < 0.02:
+            word = f'\nالبند {"".join(chr(0x0660 + int(d)) for d in str(clause))}:\n'
+            clause += 1
+        else:
+            word = rng.choice(WORDS)
+            if rng.random() < 0.2:
+                word = ''.join(c + rng.choice(TASHKEEL) if rng.random() < 0.5 else c for c in word)
+            if rng.random() < 0.05:
+                word = word[:2] + 'ــ' + word[2:]
+            if rng.random() < 0.05:
+                word = word.replace('ي', 'ی')
+        parts.append(word)
+        length += len(word) + 1
+    return ' '.join(parts)[:size]
+
+
+def time_call(fn, text, iterations):
+    """Return per-call milliseconds over iterations"""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn(text)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-kb', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    text = make_contract(args.size_kb * 1024)
+    expected = regex_normalize(text)
+    assert normalize_text(text) == expected, 'normalize_text and regex outputs differ'
+    assert translate_normalize(text) == expected, 'translate and regex outputs differ'
+
+    cases = [
+        ('regex passes', regex_normalize),
+        ('str.translate', translate_normalize),
+        ('normalize_text', normalize_text),
+        ('normalize_words', normalize_words),
+        ('make_cache_key', lambda value: make_cache_key(value, 'explanation', 'arn')),
+    ]
+
+    print(f"Contract: {len(text):,} characters, {args.iterations} iterations\n")
+    print(f"{'function':<16} {'p50 ms':>10} {'mean ms':>10} {'MB/s':>10}")
+    for name, fn in cases:
+        timings = time_call(fn, text, args.iterations)
+        median = statistics.median(timings)
+        throughput = len(text.encode('utf-8')) / 1024 / 1024 / (median / 1000)
+        print(f"{name:<16} {median:>10.2f} {statistics.mean(timings):>10.2f} {throughput:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
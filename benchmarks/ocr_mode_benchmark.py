@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+OCR Mode Benchmark
+Compares the in-process OCR pipeline with the Lambda-to-Lambda hop (OCR_MODE=lambda).
+Claude Vision is stubbed with a fixed latency so only the handler path differs; the
+remote mode performs the real JSON serialization of the invoke payload and response.
+"""
+
+import argparse
+import base64
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'deployment'))
+os.environ.setdefault('OCR_CACHE_ENABLED', 'false')
+os.environ.setdefault('METRICS_EMF_ENABLED', 'false')
+
+import lambda_function
+import ocr_processor
+
+
+class StubBedrockRuntime:
+    """Stands in for bedrock-runtime with a fixed Claude Vision latency"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def invoke_model(self, modelId, body):
+        time.sleep(self.latency)
+        text = json.dumps({'content': [{'text': 'عقد عمل بين الطرفين ' * 50}]}, ensure_ascii=False)
+        return {'body': io.BytesIO(text.encode('utf-8'))}
+
+
+class SimulatedLambdaClient:
+    """Invokes ocr_processor the way the Lambda service would, counting payload bytes"""
+
+    def __init__(self, hop_latency, cold_start):
+        self.hop_latency = hop_latency
+        self.cold_start = cold_start
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        self.request_bytes += len(Payload)
+        time.sleep(self.hop_latency + self.cold_start)
+        self.cold_start = 0
+
+        result = ocr_processor.lambda_handler(json.loads(Payload), None)
+        response_payload = json.dumps(result).encode('utf-8')
+        self.response_bytes += len(response_payload)
+        return {'Payload': io.BytesIO(response_payload)}
+
+
+def make_image_base64(width, height):
+    """Build a JPEG test page, falling back to random bytes with a JPEG header"""
+    try:
+        from PIL import Image
+        image = Image.effect_noise((width, height), 40).convert('RGB')
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=90)
+        image_bytes = output.getvalue()
+    except ImportError:
+        image_bytes = b'\xff\xd8\xff' + os.urandom(width * height // 4)
+    return 'data:image/jpeg;base64,' + base64.b64encode(image_bytes).decode('ascii')
+
+
+def run_mode(mode, body, iterations, lambda_client):
+    """Time process_contract_image end to end in one OCR mode"""
+    lambda_function.OCR_MODE = mode
+    lambda_function.get_lambda_client = lambda: lambda_client
+
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = lambda_function.process_contract_image(body)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert response['statusCode'] == 200, response['body']
+
+    tracemalloc.start()
+    lambda_function.process_contract_image(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return latencies, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--width', type=int, default=2400)
+    parser.add_argument('--height', type=int, default=3200)
+    parser.add_argument('--vision-latency-ms', type=float, default=50.0,
+                        help='stubbed Claude Vision latency, identical in both modes')
+    parser.add_argument('--hop-latency-ms', type=float, default=0.0,
+                        help='assumed network/invoke overhead per Lambda-to-Lambda call')
+    parser.add_argument('--cold-start-ms', type=float, default=0.0,
+                        help='assumed cold start of the OCR Lambda, paid on the first remote call')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    stub = StubBedrockRuntime(args.vision_latency_ms / 1000)
+    ocr_processor.get_client = lambda *a, **k: stub
+
+    body = json.dumps({'image_data': make_image_base64(args.width, args.height)})
+    print(f"Request body: {len(body):,} bytes, {args.iterations} iterations per mode\n")
+
+    remote_client = SimulatedLambdaClient(args.hop_latency_ms / 1000, args.cold_start_ms / 1000)
+    results = {
+        'inprocess': run_mode('inprocess', body, args.iterations, None) + (0,),
+        'lambda': run_mode('lambda', body, args.iterations, remote_client)
+        + ((remote_client.request_bytes + remote_client.response_bytes) // (args.iterations + 1),)
+    }
+
+    print(f"{'mode':<10} {'p50 ms':>10} {'mean ms':>10} {'max ms':>10} {'hop bytes/req':>15} {'peak MB':>10}")
+    for mode, (latencies, peak, hop_bytes) in results.items():
+        print(f"{mode:<10} {statistics.median(latencies):>10.1f} {statistics.mean(latencies):>10.1f} "
+              f"{max(latencies):>10.1f} {hop_bytes:>15,} {peak / 1024 / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
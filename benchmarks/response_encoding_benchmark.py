@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Response Encoding Benchmark
+Measures bytes on the wire for API responses and contract uploads before and after the
+shared response builder: the previous json.dumps(ensure_ascii=False) bodies against the
+compact encoder plus gzip. Responses are produced by lambda_handler with a stubbed agent,
+so the bodies have the real shape of each endpoint.
+"""
+
+import argparse
+import base64
+import gzip
+import io
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'deployment'))
+os.environ.setdefault('RESULT_CACHE_ENABLED', 'false')
+os.environ.setdefault('IDEMPOTENCY_ENABLED', 'false')
+os.environ.setdefault('METRICS_EMF_ENABLED', 'false')
+
+import http_responses
+import lambda_function
+
+WORDS = (
+    'يلتزم الطرف الأول الثاني بسداد الأجر الشهري في موعده وفقاً لأحكام قانون العمل المصري رقم لسنة '
+    'العقد مدة سنة ميلادية تبدأ من تاريخ التوقيع ويجوز تجديدها باتفاق الطرفين كتابة قبل انتهائها بشهرين '
+    'ويستحق العامل إجازة سنوية مدفوعة الأجر وتعويضاً عن الفصل التعسفي ويخضع النزاع للمحاكم العمالية المختصة '
+    'مخاطرة عالية متوسطة منخفضة يوصى بإضافة بند واضح يحدد الالتزامات والجزاءات وآلية التحكيم والإخطار'
+).split()
+
+
+class StubAgentCore:
+    """Stands in for bedrock-agentcore, answering with structured findings of a given size"""
+
+    def __init__(self, items, seed=5):
+        self.items = items
+        self.rng = random.Random(seed)
+
+    def invoke_agent_runtime(self, agentRuntimeArn, runtimeSessionId, payload):
+        say = lambda words=14: sentence(self.rng, words)
+        if 'assessment' in agentRuntimeArn:
+            answer = {
+                'risk_assessment': say(40),
+                'identified_risks': [
+                    {'risk': say(), 'severity': self.rng.choice(['عالي', 'متوسط', 'منخفض']), 'impact': say()}
+                    for _ in range(self.items)
+                ],
+                'recommendations': [
+                    {'priority': 'عالي', 'recommendation': say(), 'suggested_clause': say(25)}
+                    for _ in range(self.items)
+                ],
+                'overall_fairness': say()
+            }
+        else:
+            answer = {
+                'contract_summary': say(50),
+                'contract_type': {'نوع_رئيسي': 'عقد عمل', 'خصائص': [say() for _ in range(self.items)]},
+                'additional_notes': {'ملاحظات_قانونية': [say(25) for _ in range(self.items)]}
+            }
+        envelope = {'role': 'assistant', 'content': [{'text': json.dumps(answer, ensure_ascii=False)}]}
+        return {'response': io.BytesIO(json.dumps(envelope, ensure_ascii=False).encode('utf-8'))}
+
+
+def sentence(rng, words=14):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)) + '.'
+
+
+def make_contract(size, seed=3):
+    """Contract-like text of varied sentences, so compression ratios are not flattered by repetition"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        parts.append(sentence(rng, rng.randint(8, 30)))
+        length += len(parts[-1]) + 1
+    return ' '.join(parts)[:size]
+
+
+def wire_bytes(response):
+    """Bytes the client receives for a Lambda proxy response"""
+    if response.get('isBase64Encoded'):
+        return len(base64.b64decode(response['body']))
+    return len(response['body'].encode('utf-8'))
+
+
+def time_ms(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=12, help='list entries per agent finding')
+    parser.add_argument('--contract-kb', type=int, default=60)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    lambda_function.agent_core_client = StubAgentCore(args.items)
+    contract = make_contract(args.contract_kb * 1024)
+
+    requests = [
+        ('explanation', '/api/analyze', {'analysis_type': 'explanation', 'contract_text': contract}),
+        ('assessment', '/api/analyze', {'analysis_type': 'assessment', 'contract_text': contract}),
+        ('full report', '/api/analyze', {'analysis_type': 'both', 'contract_text': contract}),
+        ('full report json', '/api/analyze', {'analysis_type': 'both', 'contract_text': contract, 'format': 'json'}),
+        ('batch x5', '/api/analyze/batch', {'items': [{'analysis_type': 'both', 'contract_text': contract}] * 5}),
+    ]
+
+    encoder = 'orjson' if http_responses.orjson is not None else 'json'
+    print(f"Encoder: {encoder}, gzip level {http_responses.GZIP_LEVEL}, "
+          f"threshold {http_responses.GZIP_MIN_BYTES} bytes\n")
+    print(f"{'response':<18} {'before':>10} {'compact':>10} {'gzip':>10} {'saved':>7} "
+          f"{'json ms':>8} {'fast ms':>8} {'gzip ms':>8}")
+
+    for name, path, body in requests:
+        event = {'path': path, 'httpMethod': 'POST', 'body': json.dumps(body, ensure_ascii=False)}
+        plain = lambda_function.lambda_handler(event, None)
+        compressed = lambda_function.lambda_handler(dict(event, headers={'Accept-Encoding': 'gzip'}), None)
+
+        data = json.loads(plain['body'])
+        before = len(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+        after = wire_bytes(compressed)
+
+        raw = plain['body'].encode('utf-8')
+        json_ms = time_ms(lambda: json.dumps(data, ensure_ascii=False), args.iterations)
+        fast_ms = time_ms(lambda: http_responses.dumps(data), args.iterations)
+        gzip_ms = time_ms(lambda: gzip.compress(raw, compresslevel=http_responses.GZIP_LEVEL, mtime=0),
+                          args.iterations)
+        print(f"{name:<18} {before:>10,} {len(raw):>10,} {after:>10,} {1 - after / before:>6.0%} "
+              f"{json_ms:>8.2f} {fast_ms:>8.2f} {gzip_ms:>8.2f}")
+
+    upload = json.dumps({'analysis_type': 'explanation', 'contract_text': contract}, ensure_ascii=False).encode('utf-8')
+    compressed_upload = gzip.compress(upload, mtime=0)
+    print(f"\nUpload of a {args.contract_kb} KB contract: {len(upload):,} bytes, "
+          f"{len(compressed_upload):,} gzip-encoded ({1 - len(compressed_upload) / len(upload):.0%} saved)")
+
+
+if __name__ == "__main__":
+    main()
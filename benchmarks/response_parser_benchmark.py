@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Response Parser Benchmark
+Times response_parser on a corpus of agent responses against the previous nested
+try/json.loads chain with its regex fallback. Pass --corpus with a directory of recorded
+response bodies (one per file); otherwise a synthetic corpus of AgentCore envelopes with
+explanation, assessment, free-text and malformed answers is used.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'deployment'))
+
+from response_parser import (
+    clean_text_response, format_contract_json_to_arabic, parse_agent_response, render_response
+)
+
+SENTENCE = 'يلتزم الطرف الأول بسداد الأجر الشهري في موعده وفقاً لأحكام قانون العمل المصري. '
+
+
+def legacy_extract(response_text):
+    """The previous parser: up to two json.loads attempts, then a regex scan on failure"""
+    if not response_text or response_text.strip() == "":
+        return "لم أتمكن من الحصول على إجابة"
+    try:
+        if response_text.strip().startswith('{'):
+            parsed = json.loads(response_text)
+            if 'content' in parsed and isinstance(parsed['content'], list):
+                if parsed['content'] and 'text' in parsed['content'][0]:
+                    inner_text = parsed['content'][0]['text']
+                    try:
+                        inner_json = json.loads(inner_text)
+                        if len(inner_json) == 1 and 'contract_summary' in inner_json:
+                            return clean_text_response(inner_json['contract_summary'])
+                        return format_contract_json_to_arabic(inner_json)
+                    except Exception:
+                        return clean_text_response(inner_text)
+            elif any(key in parsed for key in ['contract_summary', 'contract_type', 'legal_classification']):
+                return format_contract_json_to_arabic(parsed)
+            elif 'text' in parsed:
+                return clean_text_response(parsed['text'])
+        return clean_text_response(response_text)
+    except Exception:
+        arabic_text = re.findall(r'[؀-ۿ\s]+', response_text)
+        return ' '.join(arabic_text).strip() if arabic_text else "تم استلام الرد لكن حدث خطأ في التحليل"
+
+
+def envelope(text):
+    return json.dumps({'role': 'assistant', 'content': [{'text': text}]}, ensure_ascii=False)
+
+
+def make_corpus(count, items, seed=11):
+    """Synthetic AgentCore responses in the shapes the agents return"""
+    rng = random.Random(seed)
+    corpus = []
+    for position in range(count):
+        shape = position % 5
+        if shape == 0:
+            corpus.append(envelope(json.dumps({
+                'contract_summary': SENTENCE * 3,
+                'contract_type': {'نوع_رئيسي': 'عقد عمل', 'تصنيف_فرعي': 'محدد المدة', 'خصائص': [SENTENCE] * items},
+                'legal_classification': {'القانون_الحاكم': 'قانون العمل رقم 12 لسنة 2003'},
+                'contract_duration': {'نوع_المدة': 'سنة', 'فترة_الاختبار': 'ثلاثة أشهر'},
+                'additional_notes': {'ملاحظات_قانونية': [SENTENCE * 2] * items}
+            }, ensure_ascii=False)))
+        elif shape == 1:
+            corpus.append(envelope(json.dumps({
+                'risk_assessment': SENTENCE * 2,
+                'identified_risks': [{'risk': SENTENCE, 'severity': rng.choice(['عالي', 'متوسط', 'منخفض']),
+                                      'impact': SENTENCE} for _ in range(items)],
+                'contract_weaknesses': [SENTENCE] * items,
+                'recommendations': [{'priority': 'عالي', 'recommendation': SENTENCE, 'suggested_clause': SENTENCE}
+                                    for _ in range(items)],
+                'overall_fairness': SENTENCE,
+                'legal_compliance': SENTENCE
+            }, ensure_ascii=False)))
+        elif shape == 2:
+            corpus.append(envelope(SENTENCE * items * 4))
+        elif shape == 3:
+            corpus.append(envelope(json.dumps({'contract_summary': '📋 ملخص العقد: ' + SENTENCE * items})))
+        else:
+            # Truncated agent output
+            corpus.append(envelope(SENTENCE * items)[:-rng.randint(5, 50)])
+    return corpus
+
+
+def load_corpus(directory):
+    """Recorded response bodies, one per file"""
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), encoding='utf-8') as f:
+            corpus.append(f.read())
+    return corpus
+
+
+def time_corpus(fn, corpus, iterations):
+    """Return milliseconds per pass over the whole corpus"""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        for response_text in corpus:
+            fn(response_text)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='directory of recorded agent response bodies')
+    parser.add_argument('--responses', type=int, default=200, help='synthetic corpus size')
+    parser.add_argument('--items', type=int, default=8, help='list entries per synthetic finding')
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else make_corpus(args.responses, args.items)
+    total_bytes = sum(len(response_text.encode('utf-8')) for response_text in corpus)
+
+    cases = [
+        ('legacy extract', legacy_extract),
+        ('parse + render', lambda value: render_response(parse_agent_response(value))),
+        ('parse (json)', parse_agent_response),
+    ]
+
+    kinds = {}
+    for response_text in corpus:
+        kind = parse_agent_response(response_text)['kind']
+        kinds[kind] = kinds.get(kind, 0) + 1
+
+    print(f"Corpus: {len(corpus)} responses, {total_bytes / 1024:.0f} KB, kinds {kinds}, "
+          f"{args.iterations} iterations\n")
+    print(f"{'parser':<16} {'p50 ms':>10} {'mean ms':>10} {'MB/s':>10}")
+    for name, fn in cases:
+        timings = time_corpus(fn, corpus, args.iterations)
+        median = statistics.median(timings)
+        throughput = total_bytes / 1024 / 1024 / (median / 1000)
+        print(f"{name:<16} {median:>10.2f} {statistics.mean(timings):>10.2f} {throughput:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Incremental reading and cleaning of AgentCore streaming responses
+Turns the agent response body into partial Arabic text as chunks arrive
+"""
+
+import codecs
+import json
+import re
+
+STREAM_CHUNK_SIZE = 1024
+
+SUMMARY_PREFIXES = [
+    '📋 ملخص العقد:',
+    'ملخص العقد:',
+    '📋 ملخص العقد',
+    'ملخص العقد'
+]
+
+JSON_PUNCTUATION = re.compile(r'[{}"\[\]]')
+WHITESPACE = re.compile(r'\s+')
+
+
+def iter_agent_text(response, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield decoded text pieces from an invoke_agent_runtime response as they arrive"""
+    body = response['response']
+    content_type = response.get('contentType', '')
+
+    # Agents that stream emit server-sent events with one JSON-encoded delta per data line
+    if 'text/event-stream' in content_type and hasattr(body, 'iter_lines'):
+        for line in body.iter_lines(chunk_size=chunk_size):
+            line = line.decode('utf-8') if isinstance(line, bytes) else line
+            if not line.startswith('data:'):
+                continue
+
+            data = line[5:].strip()
+            try:
+                delta = json.loads(data)
+            except ValueError:
+                delta = data
+            if isinstance(delta, str):
+                yield delta
+        return
+
+    if isinstance(body, (str, bytes)):
+        yield body.decode('utf-8') if isinstance(body, bytes) else body
+        return
+
+    # Multi-byte Arabic characters can straddle chunk boundaries
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    if hasattr(body, 'iter_chunks'):
+        chunks = body.iter_chunks(chunk_size=chunk_size)
+    else:
+        chunks = iter(lambda: body.read(chunk_size), b'')
+
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+class JsonStringStreamer:
+    """Stream the string values of a JSON document as their characters are decoded"""
+
+    def __init__(self, skip_keys=()):
+        self.skip_keys = set(skip_keys)
+        self._stack = []
+        self._expect_key = False
+        self._in_string = False
+        self._is_key = False
+        self._key = ''
+        self._current_key = None
+        self._escape = ''
+        self._high_surrogate = ''
+
+    def feed(self, chunk):
+        """Return value text decoded from this chunk, one space after each value"""
+        out = []
+        for ch in chunk:
+            if self._in_string:
+                if self._escape:
+                    self._escape += ch
+                    if self._escape[1] == 'u' and len(self._escape) < 6:
+                        continue
+                    self._write(out, self._decode_escape())
+                elif ch == '\\':
+                    self._escape = ch
+                elif ch == '"':
+                    self._in_string = False
+                    if self._is_key:
+                        self._current_key = self._key
+                    elif self._emitting():
+                        out.append(' ')
+                else:
+                    self._write(out, ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._is_key = self._expect_key
+                self._key = ''
+            elif ch in '{[':
+                self._stack.append(ch)
+                self._expect_key = ch == '{'
+            elif ch in '}]':
+                if self._stack:
+                    self._stack.pop()
+            elif ch == ',':
+                self._expect_key = bool(self._stack) and self._stack[-1] == '{'
+            elif ch == ':':
+                self._expect_key = False
+        return ''.join(out)
+
+    def _emitting(self):
+        return self._current_key not in self.skip_keys
+
+    def _write(self, out, text):
+        if self._is_key:
+            self._key += text
+        elif self._emitting():
+            out.append(text)
+
+    def _decode_escape(self):
+        escape, self._escape = self._escape, ''
+
+        # Characters outside the BMP (emoji) arrive as two \u escapes
+        if escape[1] == 'u' and 0xD800 <= int(escape[2:], 16) <= 0xDBFF:
+            self._high_surrogate = escape
+            return ''
+
+        decoded = json.loads(f'"{self._high_surrogate}{escape}"')
+        self._high_surrogate = ''
+        return decoded
+
+
+class IncrementalTextCleaner:
+    """Incremental counterpart of clean_text_response for streamed chunks"""
+
+    # The AgentCore envelope wraps the agent text, which may itself be JSON
+    ENVELOPE_SKIP_KEYS = ('role', 'type')
+
+    def __init__(self):
+        self._levels = [None, None]
+        self._head = ''
+        self._prefix_done = False
+        self._pending_space = False
+        self._emitted = False
+        self._max_prefix = max(len(prefix) for prefix in SUMMARY_PREFIXES)
+
+    def feed(self, chunk):
+        """Return cleaned text that is safe to emit for this chunk"""
+        chunk = self._unwrap(chunk)
+        cleaned = WHITESPACE.sub(' ', JSON_PUNCTUATION.sub('', chunk))
+        if not cleaned:
+            return ''
+
+        if not self._prefix_done:
+            self._head += cleaned
+            self._head = self._head.lstrip()
+            if self._could_be_prefix(self._head):
+                return ''
+            cleaned = self._strip_prefix(self._head)
+            self._head = ''
+            self._prefix_done = True
+
+        return self._emit(cleaned)
+
+    def finish(self):
+        """Flush any text held back while checking for a summary prefix"""
+        if self._prefix_done:
+            return ''
+        self._prefix_done = True
+        return self._emit(self._strip_prefix(self._head)).rstrip()
+
+    def _unwrap(self, chunk):
+        """Reduce JSON input, at up to two nesting levels, to its string values"""
+        for level, skip_keys in enumerate((self.ENVELOPE_SKIP_KEYS, ())):
+            if self._levels[level] is None:
+                if not chunk.strip():
+                    return ''
+                is_json = chunk.lstrip().startswith('{')
+                self._levels[level] = JsonStringStreamer(skip_keys) if is_json else False
+
+            if not self._levels[level]:
+                break
+            chunk = self._levels[level].feed(chunk)
+        return chunk
+
+    def _could_be_prefix(self, head):
+        if len(head) > self._max_prefix:
+            return False
+        return any(prefix.startswith(head) or head.startswith(prefix) for prefix in SUMMARY_PREFIXES)
+
+    def _strip_prefix(self, head):
+        for prefix in SUMMARY_PREFIXES:
+            if head.startswith(prefix):
+                return head[len(prefix):].lstrip()
+        return head
+
+    def _emit(self, text):
+        """Collapse whitespace across chunk boundaries and hold trailing spaces"""
+        if not self._emitted:
+            text = text.lstrip()
+        elif self._pending_space and not text.startswith(' '):
+            text = ' ' + text
+
+        if not text.strip():
+            self._pending_space = self._pending_space or bool(text)
+            return ''
+
+        self._pending_space = text.endswith(' ')
+        self._emitted = True
+        return text.rstrip(' ')
+
+
+def format_sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
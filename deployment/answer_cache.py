@@ -0,0 +1,180 @@
+"""
+Follow-up answer cache scoped to a contract
+Questions match cached ones by normalized text first, then by a local bag-of-n-grams
+cosine similarity, so common rephrasings skip the agent call
+"""
+
+import hashlib
+import logging
+import math
+import os
+import threading
+from collections import Counter
+
+from arabic_text import normalize_words
+from cache_backends import create_backend
+
+logger = logging.getLogger(__name__)
+
+# Question words and particles that carry no meaning for matching
+QUESTION_STOP_WORDS = {
+    'ما', 'ماذا', 'هي', 'هو', 'هل', 'كم', 'كيف', 'متي', 'اين', 'لماذا', 'من', 'في', 'علي',
+    'عن', 'الي', 'الى', 'او', 'و', 'ان', 'هذا', 'هذه', 'ذلك', 'تلك', 'يا', 'لي', 'العقد'
+}
+
+
+def normalize_question(question):
+    """Normalize a question for exact matching: letter variants, diacritics, punctuation"""
+    return ' '.join(normalize_words(question))
+
+
+def question_vector(normalized_question):
+    """Sparse vector of content words and their character trigrams"""
+    features = Counter()
+    for word in normalized_question.split():
+        if word in QUESTION_STOP_WORDS:
+            continue
+        # Drop the definite article so "الاختبار" and "اختبار" share features
+        if word.startswith('ال') and len(word) > 3:
+            word = word[2:]
+        features[word] += 1
+        padded = f' {word} '
+        for i in range(len(padded) - 2):
+            features[padded[i:i + 3]] += 1
+    return features
+
+
+def cosine_similarity(a, b):
+    """Cosine similarity of two sparse vectors"""
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(count * b.get(feature, 0) for feature, count in a.items())
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm if norm else 0.0
+
+
+class FollowupAnswerCache:
+    """Per-contract answer cache with exact and similarity tiers"""
+
+    def __init__(self, backend, ttl=None, threshold=0.8, max_questions=50, enabled=True):
+        self.backend = backend
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_questions = max_questions
+        self.enabled = enabled
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def get(self, scope, question):
+        """Return (answer, tier) for a cached question about this contract, or (None, None)"""
+        if not self.enabled:
+            return None, None
+
+        normalized = normalize_question(question)
+        try:
+            answer = self.backend.get(self._answer_key(scope, normalized))
+            if answer is not None:
+                self._count('exact_hits')
+                return answer, 'exact'
+
+            match = self._find_similar(scope, normalized)
+            if match is not None:
+                answer = self.backend.get(self._answer_key(scope, match))
+                if answer is not None:
+                    self._count('similar_hits')
+                    return answer, 'similar'
+        except Exception as e:
+            logger.error(f"Answer cache read failed: {e}")
+            self._count('errors')
+
+        self._count('misses')
+        return None, None
+
+    def set(self, scope, question, answer):
+        """Store an answer and add the question to the contract's index"""
+        if not self.enabled:
+            return
+
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+
+        try:
+            self.backend.set(self._answer_key(scope, normalized), answer, self.ttl)
+
+            # Most recently asked last; the oldest questions fall off the index
+            index = [q for q in (self.backend.get(self._index_key(scope)) or []) if q != normalized]
+            index.append(normalized)
+            self.backend.set(self._index_key(scope), index[-self.max_questions:], self.ttl)
+        except Exception as e:
+            logger.error(f"Answer cache write failed: {e}")
+            self._count('errors')
+
+    def stats(self):
+        """Return hit counters per tier together with backend statistics"""
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            lookups = hits + self.misses
+            stats = {
+                'enabled': self.enabled,
+                'exact_hits': self.exact_hits,
+                'similar_hits': self.similar_hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'threshold': self.threshold
+            }
+        stats['store'] = self.backend.stats()
+        return stats
+
+    def _find_similar(self, scope, normalized):
+        """Return the most similar indexed question above the threshold"""
+        index = self.backend.get(self._index_key(scope))
+        if not index:
+            return None
+
+        vector = question_vector(normalized)
+        best_question, best_score = None, self.threshold
+        for candidate in index:
+            score = cosine_similarity(vector, question_vector(candidate))
+            if score >= best_score:
+                best_question, best_score = candidate, score
+
+        if best_question is not None:
+            logger.info(f"Similar cached question (score {best_score:.2f}): {best_question[:60]}")
+        return best_question
+
+    def _answer_key(self, scope, normalized):
+        digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        return f'followup:{scope}:{digest}'
+
+    def _index_key(self, scope):
+        return f'followup-index:{scope}'
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+def create_answer_cache():
+    """Create the follow-up answer cache from environment configuration"""
+    ttl = int(os.environ.get('FOLLOWUP_CACHE_TTL_SECONDS', 24 * 60 * 60))
+    backend = create_backend(
+        os.environ.get('FOLLOWUP_CACHE_BACKEND', 'memory'),
+        max_entries=int(os.environ.get('FOLLOWUP_CACHE_MAX_ENTRIES', 2048)),
+        max_bytes=int(os.environ.get('FOLLOWUP_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+        default_ttl=ttl,
+        namespace='followup'
+    )
+    return FollowupAnswerCache(
+        backend,
+        ttl=ttl,
+        threshold=float(os.environ.get('FOLLOWUP_CACHE_SIMILARITY_THRESHOLD', 0.8)),
+        max_questions=int(os.environ.get('FOLLOWUP_CACHE_MAX_QUESTIONS', 50)),
+        enabled=os.environ.get('FOLLOWUP_CACHE_ENABLED', 'true').lower() == 'true'
+    )
@@ -0,0 +1,82 @@
+"""
+Shared Arabic text normalization
+Everything that hashes, compares or indexes contract text goes through these helpers, so
+trivially different copies of a contract (OCR output, retyped text) map to the same keys
+"""
+
+import re
+import string
+import unicodedata
+
+# Tashkeel (harakat, tanween, shadda, sukun, Quranic annotation marks) and tatweel
+DELETED_CHARACTERS = (
+    [chr(code) for code in range(0x0610, 0x061B)]
+    + [chr(code) for code in range(0x064B, 0x0660)]
+    + ['\u0670']
+    + [chr(code) for code in range(0x06D6, 0x06EE)]
+    + ['\u0640']
+)
+
+LETTER_VARIANTS = {
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    # Alef maqsura, Farsi yeh (common in OCR output) and yeh with hamza
+    'ى': 'ي', '\u06cc': 'ي', 'ئ': 'ي',
+    'ة': 'ه',
+    'ؤ': 'و',
+    # Farsi keheh
+    '\u06a9': 'ك'
+}
+
+# Arabic-Indic (٠-٩) and Extended Arabic-Indic (۰-۹) digits
+DIGITS = {chr(0x0660 + value): str(value) for value in range(10)}
+DIGITS.update({chr(0x06F0 + value): str(value) for value in range(10)})
+
+PUNCTUATION = string.punctuation + '،؛؟«»٪٫٬“”‘’–—…'
+
+# Precompiled once: a single deletion pass, then only the replacements that occur in the
+# text. On CPython this is several times faster than str.translate with a non-ASCII table,
+# which looks up every character in a dict.
+DELETED_PATTERN = re.compile('[' + ''.join(DELETED_CHARACTERS) + ']')
+REPLACEMENTS = tuple(LETTER_VARIANTS.items()) + tuple(DIGITS.items())
+PUNCTUATION_PATTERN = re.compile('[' + re.escape(PUNCTUATION) + ']')
+
+BLANK_LINES = re.compile(r'\n\s*\n')
+REPEATED_SPACES = re.compile(r' +')
+
+
+def normalize_arabic(text):
+    """Strip tashkeel and tatweel, unify letter variants and map Arabic-Indic digits"""
+    text = DELETED_PATTERN.sub('', text or '')
+    for variant, replacement in REPLACEMENTS:
+        if variant in text:
+            text = text.replace(variant, replacement)
+    return text
+
+
+def normalize_compatibility(text):
+    """Arabic normalization plus NFKC, which unfolds presentation forms from PDF text"""
+    text = normalize_arabic(text)
+    # Cheap once the marks are gone; presentation forms may decompose into variants again
+    if not unicodedata.is_normalized('NFKC', text):
+        text = normalize_arabic(unicodedata.normalize('NFKC', text))
+    return text
+
+
+def normalize_text(text):
+    """Canonical form for hashing and comparison: NFKC, Arabic orthography, case and whitespace"""
+    return ' '.join(normalize_compatibility(text).lower().split())
+
+
+def normalize_words(text):
+    """Normalized text split into words, with punctuation removed"""
+    return PUNCTUATION_PATTERN.sub(' ', normalize_compatibility(text)).lower().split()
+
+
+def collapse_whitespace(text):
+    """Replace every run of whitespace, including line breaks, with one space"""
+    return ' '.join((text or '').split())
+
+
+def tidy_whitespace(text):
+    """Collapse repeated spaces and blank lines while keeping the line structure"""
+    return REPEATED_SPACES.sub(' ', BLANK_LINES.sub('\n\n', text or '')).strip()
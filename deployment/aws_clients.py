@@ -0,0 +1,99 @@
+"""
+Shared boto3 client factory
+Clients are created once per (service, region) and reused for the container's lifetime,
+so warm invocations skip client construction and reuse pooled TLS connections. boto3 is
+imported on first use, so routes that never call AWS do not pay for it on a cold start.
+"""
+
+import os
+import threading
+import time
+
+DEFAULT_REGION = 'us-west-2'
+
+# Agent and model calls stream long LLM answers; control-plane calls are quick
+LONG_RUNNING_SERVICES = {'bedrock-agentcore', 'bedrock-runtime', 'bedrock-agent-runtime', 'lambda'}
+
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 50))
+MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', 3))
+
+# Agent calls are retried by lambda_function.invoke_agent_with_retry, with backoff and jitter,
+# so botocore makes a single attempt; retrying in both layers multiplies the attempts, each
+# of which may wait out the LLM read timeout. botocore owns retries for every other service
+HANDLER_RETRIED_SERVICES = {'bedrock-agentcore'}
+CONNECT_TIMEOUT = int(os.environ.get('AWS_CONNECT_TIMEOUT', 5))
+LLM_READ_TIMEOUT = int(os.environ.get('AWS_LLM_READ_TIMEOUT', 300))
+READ_TIMEOUT = int(os.environ.get('AWS_READ_TIMEOUT', 30))
+
+# Presigned upload URLs use SigV4 and regional virtual-hosted names, so browsers are not
+# redirected; endpoints given by IP (AWS_ENDPOINT_URL_S3 for a local stand-in) stay path-style
+S3_ADDRESSING_STYLE = os.environ.get('S3_ADDRESSING_STYLE', 'virtual')
+
+_clients = {}
+_session = None
+_lock = threading.Lock()
+
+# Seconds spent importing boto3 and constructing each client, for cold-start reporting
+_timings = {}
+
+
+def client_config(service):
+    """Build the botocore Config for a service"""
+    from botocore.config import Config
+
+    extra = {'signature_version': 's3v4', 's3': {'addressing_style': S3_ADDRESSING_STYLE}} if service == 's3' else {}
+    return Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        retries={'mode': 'adaptive', 'max_attempts': 1 if service in HANDLER_RETRIED_SERVICES else MAX_ATTEMPTS},
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=LLM_READ_TIMEOUT if service in LONG_RUNNING_SERVICES else READ_TIMEOUT,
+        tcp_keepalive=True,
+        **extra
+    )
+
+
+def get_client(service, region=DEFAULT_REGION):
+    """Return the cached client for (service, region), creating it on first use"""
+    key = (service, region)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    # boto3 sessions are not thread-safe, so construction is serialized;
+    # the clients themselves are safe to share between threads
+    with _lock:
+        global _session
+        client = _clients.get(key)
+        if client is None:
+            if _session is None:
+                started = time.perf_counter()
+                import boto3
+
+                _session = boto3.session.Session()
+                _timings['boto3'] = round(time.perf_counter() - started, 3)
+
+            started = time.perf_counter()
+            client = _session.client(service, region_name=region, config=client_config(service))
+            _clients[key] = client
+            _timings[f'{service}:{region}'] = round(time.perf_counter() - started, 3)
+    return client
+
+
+def client_timings():
+    """Seconds spent on the boto3 import and on each client's construction"""
+    return dict(_timings)
+
+
+def set_client(service, client, region=DEFAULT_REGION):
+    """Install a client for a service and region (for tests and offline benchmarks)"""
+    with _lock:
+        _clients[(service, region)] = client
+
+
+def reset_clients():
+    """Drop cached clients (for tests and credential rotation)"""
+    global _session
+    with _lock:
+        _clients.clear()
+        _timings.clear()
+        _session = None
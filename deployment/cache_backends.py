@@ -0,0 +1,509 @@
+"""
+Pluggable key/value cache backends with TTL and size-based eviction
+Used by the Lambda functions to keep expensive agent results between requests
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class CacheBackend:
+    """Interface for JSON value stores with per-entry expiry"""
+
+    def get(self, key):
+        """Return the stored value or None when missing or expired"""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        """Store a JSON-serializable value for ttl seconds"""
+        raise NotImplementedError
+
+    def add(self, key, value, ttl=None):
+        """Store value only if key is missing or expired, returning whether it was stored"""
+        raise NotImplementedError
+
+    def replace(self, key, expected, value, ttl=None):
+        """Store value only if key currently holds expected, returning whether it was stored"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove a key if present"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove every entry"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Return backend counters for monitoring"""
+        return {'backend': self.__class__.__name__}
+
+    def warm(self):
+        """Open connections ahead of the first request; local stores have nothing to do"""
+
+
+class MemoryLRUBackend(CacheBackend):
+    """In-process LRU cache that survives between warm Lambda invocations"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 default_ttl=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, size, serialized = entry
+            if expires_at < time.time():
+                self._remove(key)
+                self.expirations += 1
+                return None
+
+            self._entries.move_to_end(key)
+
+        return json.loads(serialized)
+
+    def set(self, key, value, ttl=None):
+        serialized = json.dumps(value, ensure_ascii=False)
+        size = len(serialized.encode('utf-8'))
+
+        # Values larger than the whole budget would evict everything for nothing
+        if size > self.max_bytes:
+            logger.warning(f"Cache value for {key[:16]} too large to store ({size} bytes)")
+            return
+
+        expires_at = time.time() + (ttl if ttl is not None else self.default_ttl)
+
+        with self._lock:
+            self._insert(key, expires_at, size, serialized)
+
+    def add(self, key, value, ttl=None):
+        serialized = json.dumps(value, ensure_ascii=False)
+        size = len(serialized.encode('utf-8'))
+        if size > self.max_bytes:
+            raise ValueError(f"Cache value for {key[:16]} too large to store ({size} bytes)")
+
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.default_ttl)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= now:
+                return False
+            self._insert(key, expires_at, size, serialized)
+            return True
+
+    def replace(self, key, expected, value, ttl=None):
+        serialized = json.dumps(value, ensure_ascii=False)
+        size = len(serialized.encode('utf-8'))
+        if size > self.max_bytes:
+            raise ValueError(f"Cache value for {key[:16]} too large to store ({size} bytes)")
+
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.default_ttl)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now or entry[2] != json.dumps(expected, ensure_ascii=False):
+                return False
+            self._insert(key, expires_at, size, serialized)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def _insert(self, key, expires_at, size, serialized):
+        """Store an entry and evict the oldest ones beyond the limits, with the lock held"""
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (expires_at, size, serialized)
+        self._total_bytes += size
+
+        while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+
+
+class SQLiteBackend(CacheBackend):
+    """SQLite file store - local stand-in for the shared cache in tests and development
+
+    Stores sharing a file each keep their own table, so one store's limits never evict
+    another's rows (cache pressure must not drop job records).
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 default_ttl=DEFAULT_TTL_SECONDS, table='cache_entries'):
+        if not re.fullmatch(r'[a-z_]+', table):
+            raise ValueError(f"Invalid SQLite table name: {table}")
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.table} (
+                cache_key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT value, expires_at FROM {self.table} WHERE cache_key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, expires_at = row
+            if expires_at < now:
+                self._conn.execute(f'DELETE FROM {self.table} WHERE cache_key = ?', (key,))
+                self._conn.commit()
+                self.expirations += 1
+                return None
+
+            self._conn.execute(
+                f'UPDATE {self.table} SET accessed_at = ? WHERE cache_key = ?', (now, key)
+            )
+            self._conn.commit()
+
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        serialized = json.dumps(value, ensure_ascii=False)
+        size = len(serialized.encode('utf-8'))
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.default_ttl)
+
+        with self._lock:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?, ?)',
+                (key, serialized, size, expires_at, now)
+            )
+            self._conn.execute(f'DELETE FROM {self.table} WHERE expires_at < ?', (now,))
+            self._evict()
+            self._conn.commit()
+
+    def add(self, key, value, ttl=None):
+        serialized = json.dumps(value, ensure_ascii=False)
+        size = len(serialized.encode('utf-8'))
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.default_ttl)
+
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self.table} WHERE expires_at < ?', (now,))
+            cursor = self._conn.execute(
+                f'INSERT OR IGNORE INTO {self.table} VALUES (?, ?, ?, ?, ?)',
+                (key, serialized, size, expires_at, now)
+            )
+            self._evict()
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def replace(self, key, expected, value, ttl=None):
+        serialized = json.dumps(value, ensure_ascii=False)
+        size = len(serialized.encode('utf-8'))
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.default_ttl)
+
+        with self._lock:
+            cursor = self._conn.execute(
+                f"""UPDATE {self.table} SET value = ?, size = ?, expires_at = ?, accessed_at = ?
+                WHERE cache_key = ? AND value = ? AND expires_at >= ?""",
+                (serialized, size, expires_at, now, key, json.dumps(expected, ensure_ascii=False), now)
+            )
+            self._evict()
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self.table} WHERE cache_key = ?', (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self.table}')
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}'
+            ).fetchone()
+        return {
+            'backend': 'sqlite',
+            'entries': entries,
+            'bytes': total_bytes,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+    def _evict(self):
+        """Drop least recently accessed rows until both limits hold"""
+        while True:
+            entries, total_bytes = self._conn.execute(
+                f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}'
+            ).fetchone()
+            if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                return
+
+            cursor = self._conn.execute(
+                f"""DELETE FROM {self.table} WHERE cache_key IN (
+                    SELECT cache_key FROM {self.table} ORDER BY accessed_at LIMIT 1
+                )"""
+            )
+            if cursor.rowcount == 0:
+                return
+            self.evictions += 1
+
+
+class DynamoDBBackend(CacheBackend):
+    """Shared cache across Lambda containers, expiry handled by the table TTL attribute"""
+
+    def __init__(self, table_name, region='us-west-2', default_ttl=DEFAULT_TTL_SECONDS):
+        self.table_name = table_name
+        self.region = region
+        self.default_ttl = default_ttl
+        self.expirations = 0
+
+    @property
+    def _client(self):
+        # Resolved on first use, so creating the backend at import time stays cheap
+        from aws_clients import get_client
+
+        return get_client('dynamodb', self.region)
+
+    def get(self, key):
+        response = self._client.get_item(
+            TableName=self.table_name,
+            Key={'cache_key': {'S': key}}
+        )
+        item = response.get('Item')
+        if not item:
+            return None
+
+        # DynamoDB deletes expired items lazily, so check the TTL ourselves
+        if float(item['expires_at']['N']) < time.time():
+            self.expirations += 1
+            return None
+
+        return json.loads(item['value']['S'])
+
+    def set(self, key, value, ttl=None):
+        expires_at = int(time.time() + (ttl if ttl is not None else self.default_ttl))
+        self._client.put_item(
+            TableName=self.table_name,
+            Item={
+                'cache_key': {'S': key},
+                'value': {'S': json.dumps(value, ensure_ascii=False)},
+                'expires_at': {'N': str(expires_at)}
+            }
+        )
+
+    def add(self, key, value, ttl=None):
+        now = time.time()
+        try:
+            self._client.put_item(
+                TableName=self.table_name,
+                Item={
+                    'cache_key': {'S': key},
+                    'value': {'S': json.dumps(value, ensure_ascii=False)},
+                    'expires_at': {'N': str(int(now + (ttl if ttl is not None else self.default_ttl)))}
+                },
+                # Expired items may linger until DynamoDB's TTL sweep, so they count as missing
+                ConditionExpression='attribute_not_exists(cache_key) OR expires_at < :now',
+                ExpressionAttributeValues={':now': {'N': str(int(now))}}
+            )
+        except self._client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def replace(self, key, expected, value, ttl=None):
+        now = time.time()
+        try:
+            self._client.put_item(
+                TableName=self.table_name,
+                Item={
+                    'cache_key': {'S': key},
+                    'value': {'S': json.dumps(value, ensure_ascii=False)},
+                    'expires_at': {'N': str(int(now + (ttl if ttl is not None else self.default_ttl)))}
+                },
+                # "value" is a reserved word in expressions
+                ConditionExpression='#value = :expected AND expires_at >= :now',
+                ExpressionAttributeNames={'#value': 'value'},
+                ExpressionAttributeValues={
+                    ':expected': {'S': json.dumps(expected, ensure_ascii=False)},
+                    ':now': {'N': str(int(now))}
+                }
+            )
+        except self._client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def delete(self, key):
+        self._client.delete_item(
+            TableName=self.table_name,
+            Key={'cache_key': {'S': key}}
+        )
+
+    def clear(self):
+        raise NotImplementedError("Clearing a shared DynamoDB cache is not supported")
+
+    def stats(self):
+        return {
+            'backend': 'dynamodb',
+            'table': self.table_name,
+            'expirations': self.expirations
+        }
+
+    def warm(self):
+        # A read of a missing key sets up the client and its TLS connection
+        self._client.get_item(TableName=self.table_name, Key={'cache_key': {'S': 'warmup'}})
+
+
+class TieredBackend(CacheBackend):
+    """In-process LRU in front of a shared store"""
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        try:
+            value = self.shared.get(key)
+        except Exception as e:
+            logger.error(f"Shared cache read failed: {e}")
+            return None
+
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.local.set(key, value, ttl)
+        try:
+            self.shared.set(key, value, ttl)
+        except Exception as e:
+            logger.error(f"Shared cache write failed: {e}")
+
+    def add(self, key, value, ttl=None):
+        # The shared store decides, so only one container wins across the fleet
+        if not self.shared.add(key, value, ttl):
+            return False
+        self.local.set(key, value, ttl)
+        return True
+
+    def replace(self, key, expected, value, ttl=None):
+        if not self.shared.replace(key, expected, value, ttl):
+            # The local copy is stale if another container changed the entry
+            self.local.delete(key)
+            return False
+        self.local.set(key, value, ttl)
+        return True
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def warm(self):
+        self.local.warm()
+        self.shared.warm()
+
+    def stats(self):
+        return {
+            'backend': 'tiered',
+            'local': self.local.stats(),
+            'shared': self.shared.stats()
+        }
+
+
+def create_backend(kind, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                   default_ttl=DEFAULT_TTL_SECONDS, sqlite_path=None, dynamodb_table=None,
+                   local_cache=True, namespace=None):
+    """
+    Build a cache backend by name
+
+    kind: "memory" for a per-container LRU, "sqlite" or "dynamodb" for an
+    LRU in front of the matching shared store. Pass local_cache=False for
+    mutable records that other containers update, so reads are never stale.
+    namespace names the store's own SQLite table ("<namespace>_entries").
+    """
+    local = MemoryLRUBackend(max_entries=max_entries, max_bytes=max_bytes, default_ttl=default_ttl)
+
+    if kind == 'memory':
+        return local
+
+    if kind == 'sqlite':
+        path = sqlite_path or os.environ.get('CACHE_SQLITE_PATH', '/tmp/legal-analysis-cache.sqlite3')
+        table = f'{namespace}_entries' if namespace else 'cache_entries'
+        shared = SQLiteBackend(path, max_entries=max_entries, max_bytes=max_bytes, default_ttl=default_ttl,
+                               table=table)
+    elif kind == 'dynamodb':
+        table = dynamodb_table or os.environ.get('CACHE_DYNAMODB_TABLE', 'egyptian-legal-cache')
+        shared = DynamoDBBackend(table, region=os.environ.get('AWS_REGION', 'us-west-2'), default_ttl=default_ttl)
+    else:
+        raise ValueError(f"Unknown cache backend: {kind}")
+
+    return TieredBackend(local, shared) if local_cache else shared
@@ -0,0 +1,119 @@
+"""
+In-memory BM25 index over the clauses of one contract
+Follow-up questions retrieve the few relevant clauses instead of sending the whole contract
+"""
+
+import math
+import threading
+from collections import Counter, OrderedDict
+
+from answer_cache import QUESTION_STOP_WORDS
+from arabic_text import normalize_words
+from clause_splitter import split_clauses, split_long_text
+
+PASSAGE_MAX_CHARS = 2000
+
+# Article combinations are stripped outright; a bare leading و/ب/ف/ل may be part of the
+# word itself ("وظيفة"), so both readings are indexed
+ARTICLE_PREFIXES = ('وبال', 'وال', 'بال', 'فال', 'كال', 'لل', 'ال')
+LETTER_PREFIXES = ('و', 'ب', 'ف', 'ل')
+ARABIC_SUFFIXES = ('يات', 'ات', 'ون', 'ين', 'يه', 'يا', 'ها', 'هم', 'ه', 'ي', 'ا')
+
+
+def strip_suffix(word):
+    """Strip one common suffix, keeping at least 3 letters"""
+    for suffix in ARABIC_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def stems(word):
+    """Light Arabic stemming: the word without article and suffix, plus the reading without a leading particle"""
+    for prefix in ARTICLE_PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 3:
+            return {strip_suffix(word[len(prefix):])}
+
+    forms = {strip_suffix(word)}
+    if word.startswith(LETTER_PREFIXES) and len(word) >= 5:
+        forms.add(strip_suffix(word[1:]))
+    return forms
+
+
+def tokenize(text):
+    """Normalized, stemmed content words of a text"""
+    tokens = []
+    for word in normalize_words(text):
+        if word not in QUESTION_STOP_WORDS:
+            tokens.extend(stems(word))
+    return tokens
+
+
+class ClauseIndex:
+    """BM25 ranking of a contract's clauses"""
+
+    def __init__(self, contract_text, k1=1.5, b=0.75, passage_max_chars=PASSAGE_MAX_CHARS):
+        self.k1 = k1
+        self.b = b
+        self.passages = []
+        for clause in split_clauses(contract_text):
+            # Long clauses are indexed as several passages that share the clause heading
+            for piece in split_long_text(clause['text'], passage_max_chars):
+                self.passages.append({'clause': clause['index'], 'heading': clause['heading'], 'text': piece})
+
+        self._term_counts = [Counter(tokenize(passage['text'])) for passage in self.passages]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+        document_frequency = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        total = len(self.passages)
+        self._idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def search(self, query, k=4):
+        """Return up to k passages with a positive score, best first, with their "passage" position and "score" """
+        terms = [term for term in set(tokenize(query)) if term in self._idf]
+        if not terms:
+            return []
+
+        scored = []
+        for position, counts in enumerate(self._term_counts):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[position] / (self._average_length or 1))
+            for term in terms:
+                frequency = counts.get(term)
+                if frequency:
+                    score += self._idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            if score > 0:
+                scored.append((score, position))
+
+        scored.sort(reverse=True)
+        return [dict(self.passages[position], passage=position, score=round(score, 4)) for score, position in scored[:k]]
+
+
+class ClauseIndexCache:
+    """Per-container LRU of clause indexes, so each contract is indexed once"""
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, contract_id, contract_text):
+        """Return the index for a contract, building it on first use"""
+        with self._lock:
+            index = self._indexes.get(contract_id)
+            if index is not None:
+                self._indexes.move_to_end(contract_id)
+                return index
+
+        index = ClauseIndex(contract_text)
+        with self._lock:
+            self._indexes[contract_id] = index
+            while len(self._indexes) > self.max_size:
+                self._indexes.popitem(last=False)
+        return index
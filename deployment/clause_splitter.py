@@ -0,0 +1,105 @@
+"""
+Arabic contract clause splitter
+Splits contracts on clause and article headings ("البند الأول", "المادة (5)", "أولاً:")
+and packs the clauses into size-bounded sections for per-section analysis
+"""
+
+import re
+
+ORDINAL_WORDS = 'أول|اول|ثاني|ثالث|رابع|خامس|سادس|سابع|ثامن|تاسع|عاشر|حادي'
+TENS_WORDS = 'عشرون|عشرين|ثلاثون|ثلاثين|أربعون|اربعون|أربعين|اربعين|خمسون|خمسين'
+
+CLAUSE_HEADING = re.compile(
+    r'^[ \t]*('
+    # "البند الأول", "المادة الحادية عشرة", "البند الثاني والعشرون"
+    rf'(?:البند|بند|المادة|مادة|الفصل|الباب)\s+(?:ال)?(?:(?:{ORDINAL_WORDS})ة?(?:\s+عشرة?)?'
+    rf'(?:\s+و\s*ال(?:{TENS_WORDS}))?|(?:{TENS_WORDS}))'
+    # "المادة (5)", "البند 12", "مادة ١٢"
+    r'|(?:البند|بند|المادة|مادة|الفصل|الباب)\s*\(?\s*[0-9٠-٩]+\s*\)?'
+    # "أولاً:", "ثانيا -"
+    rf'|(?:{ORDINAL_WORDS})ا?ً?\s*[:\-–)]'
+    r')',
+    re.MULTILINE
+)
+
+BREAK_PATTERNS = ('\n\n', '\n', '. ', '، ', ' ')
+
+
+def split_clauses(text):
+    """Split a contract into clauses; text before the first heading is the preamble
+
+    Each clause is a dict with its position ("index"), the matched "heading"
+    ('' for the preamble) and the clause "text" including the heading.
+    """
+    text = text or ''
+    starts = [match.start() for match in CLAUSE_HEADING.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+
+    clauses = []
+    for position, start in enumerate(starts):
+        end = starts[position + 1] if position + 1 < len(starts) else len(text)
+        clause_text = text[start:end].strip()
+        if not clause_text:
+            continue
+
+        heading = ''
+        match = CLAUSE_HEADING.match(clause_text)
+        if match:
+            heading = match.group(1).strip(' \t:-–')
+            # Keep the closing bracket of "المادة (5)" but not of "أولاً)"
+            if '(' not in heading:
+                heading = heading.rstrip(')').strip()
+
+        clauses.append({'index': len(clauses), 'heading': heading, 'text': clause_text})
+    return clauses
+
+
+def split_long_text(text, max_chars):
+    """Cut text into pieces of at most max_chars, preferring paragraph and sentence breaks"""
+    pieces = []
+    while len(text) > max_chars:
+        cut = -1
+        for pattern in BREAK_PATTERNS:
+            cut = text.rfind(pattern, max_chars // 2, max_chars)
+            if cut != -1:
+                cut += len(pattern)
+                break
+        if cut == -1:
+            cut = max_chars
+
+        pieces.append(text[:cut].strip())
+        text = text[cut:]
+
+    if text.strip():
+        pieces.append(text.strip())
+    return pieces
+
+
+def group_sections(clauses, max_chars):
+    """Pack consecutive clauses into sections of at most max_chars
+
+    Clauses longer than max_chars are cut on paragraph and sentence breaks.
+    Each section is a dict with its "text" and the "headings" it covers.
+    """
+    sections = []
+    parts, headings, size = [], [], 0
+
+    def flush():
+        if parts:
+            sections.append({'text': '\n\n'.join(parts), 'headings': headings[:]})
+            parts.clear()
+            headings.clear()
+
+    for clause in clauses:
+        for piece in split_long_text(clause['text'], max_chars):
+            if parts and size + len(piece) + 2 > max_chars:
+                flush()
+                size = 0
+            parts.append(piece)
+            size += len(piece) + 2
+            if clause['heading'] and clause['heading'] not in headings:
+                headings.append(clause['heading'])
+
+    flush()
+    return sections
@@ -0,0 +1,73 @@
+"""
+Server-side contract registry
+Contracts are stored once under a hash of their normalized text, so chat turns can
+refer to them by contract_id instead of resending the full text
+"""
+
+import hashlib
+import logging
+import os
+
+from arabic_text import normalize_text
+from cache_backends import create_backend
+
+logger = logging.getLogger(__name__)
+
+
+def make_contract_id(contract_text):
+    """Derive the contract ID from the normalized contract text"""
+    return hashlib.sha256(normalize_text(contract_text).encode('utf-8')).hexdigest()
+
+
+class ContractRegistry:
+    """Store and look up contract texts by content hash"""
+
+    def __init__(self, backend, ttl=None):
+        self.backend = backend
+        self.ttl = ttl
+
+    def register(self, contract_text):
+        """Store a contract and return its ID, or None if the store is unavailable"""
+        contract_id = make_contract_id(contract_text)
+        try:
+            # The ID ignores whitespace differences, but the stored text keeps the
+            # original line breaks the agents rely on to tell clauses apart
+            if self.backend.get(self._key(contract_id)) is None:
+                self.backend.set(self._key(contract_id), contract_text, self.ttl)
+        except Exception as e:
+            logger.error(f"Contract registry write failed: {e}")
+            return None
+        return contract_id
+
+    def get(self, contract_id):
+        """Return the stored contract text or None when unknown or expired"""
+        try:
+            return self.backend.get(self._key(contract_id))
+        except Exception as e:
+            logger.error(f"Contract registry read failed: {e}")
+            return None
+
+    def stats(self):
+        """Return backend statistics"""
+        return self.backend.stats()
+
+    def _key(self, contract_id):
+        return f'contract:{contract_id}'
+
+
+def create_contract_registry():
+    """Create the contract registry from environment configuration
+
+    Follow-up questions may land on any container, so deployed stacks should use
+    CONTRACT_REGISTRY_BACKEND=dynamodb; sqlite is the local stand-in.
+    """
+    ttl = int(os.environ.get('CONTRACT_REGISTRY_TTL_SECONDS', 7 * 24 * 60 * 60))
+    backend = create_backend(
+        os.environ.get('CONTRACT_REGISTRY_BACKEND', 'memory'),
+        max_entries=int(os.environ.get('CONTRACT_REGISTRY_MAX_ENTRIES', 256)),
+        max_bytes=int(os.environ.get('CONTRACT_REGISTRY_MAX_BYTES', 64 * 1024 * 1024)),
+        default_ttl=ttl,
+        dynamodb_table=os.environ.get('CONTRACT_DYNAMODB_TABLE'),
+        namespace='contract'
+    )
+    return ContractRegistry(backend, ttl=ttl)
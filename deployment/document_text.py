@@ -0,0 +1,189 @@
+"""
+Local text extraction for digital documents
+PDFs exported from Word carry a text layer and DOCX files are plain XML, so their text
+is read here in milliseconds. Only pages without usable text - scans - are rendered for
+Claude Vision
+"""
+
+import io
+import os
+import posixpath
+import re
+import unicodedata
+import zipfile
+from xml.etree import ElementTree
+
+from arabic_text import tidy_whitespace
+
+# A page needs this many letters or digits in its text layer to skip Claude Vision
+OCR_MIN_TEXT_CHARS = int(os.environ.get('OCR_MIN_TEXT_CHARS', 40))
+
+# Pages this much covered by one image are scans; a scanner's own OCR layer is not trusted
+SCANNED_PAGE_COVERAGE = 0.8
+
+# Fonts without a proper Unicode map turn text into private-use or stray Latin characters;
+# a text layer with more than this share of characters outside the expected scripts is unreadable
+MAX_UNEXPECTED_RATIO = 0.1
+
+# Arabic (with presentation forms), ASCII, Latin-1, general punctuation and whitespace
+EXPECTED_CHARACTERS = re.compile('[\u0600-\u06ff\u0750-\u077f\ufb50-\ufdff\ufe70-\ufeff\x00-\xff\u2000-\u206f\\s]')
+
+# Uncompressed size limit for each part read from the archive (zip bombs)
+DOCX_MAX_PART_BYTES = 50 * 1024 * 1024
+DOCX_IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+RELATIONSHIP = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+EMBED = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed'
+BLIP = '{http://schemas.openxmlformats.org/drawingml/2006/main}blip'
+
+
+def detect_document_type(data):
+    """'pdf' or 'docx' from the file signature, None for anything else (images)"""
+    if data.startswith(b'%PDF'):
+        return 'pdf'
+    if data.startswith(b'PK\x03\x04'):
+        return 'docx'
+    return None
+
+
+def readable_text(text):
+    """A text layer tidied for analysis, or None when its characters are garbled"""
+    text = text or ''
+    # PDF text often holds Arabic presentation forms (ﻻ, ﺍﻟ...) rather than letters
+    if not unicodedata.is_normalized('NFKC', text):
+        text = unicodedata.normalize('NFKC', text)
+
+    unexpected = len(text) - len(EXPECTED_CHARACTERS.findall(text))
+    if unexpected > len(text) * MAX_UNEXPECTED_RATIO:
+        return None
+    return tidy_whitespace(text)
+
+
+def has_enough_text(text):
+    return sum(1 for character in text if character.isalnum()) >= OCR_MIN_TEXT_CHARS
+
+
+def read_pdf_pages(pdf_bytes, max_pages, dpi):
+    """Each page as {'page', 'text'} from its text layer, or {'page', 'image'} - a JPEG
+    rendering for Claude Vision - when it has none (requires PyMuPDF)"""
+
+    try:
+        import pymupdf
+    except ImportError:
+        raise ValueError("معالجة ملفات PDF غير متاحة في هذه البيئة")
+
+    try:
+        document = pymupdf.open(stream=pdf_bytes, filetype='pdf')
+    except Exception as e:
+        raise ValueError(f"فشل في قراءة ملف PDF: {str(e)}")
+
+    with document:
+        if document.page_count > max_pages:
+            raise ValueError(f"عدد الصفحات كبير جداً، الحد الأقصى {max_pages} صفحة")
+
+        pages = []
+        for page_number, page in enumerate(document, start=1):
+            images = page.get_image_info()
+            # Unsorted: MuPDF already puts right-to-left lines in logical order, and sorting
+            # by position reverses the words of Arabic lines
+            text = None if is_scanned_page(page, images) else readable_text(page.get_text())
+            # Little text is fine on a page with nothing else drawn on it, such as a signature page
+            if text is not None and (has_enough_text(text) or not (images or page.get_cdrawings())):
+                pages.append({'page': page_number, 'text': text})
+            else:
+                pages.append({'page': page_number,
+                              'image': page.get_pixmap(dpi=dpi).tobytes(output='jpeg', jpg_quality=85)})
+        return pages
+
+
+def is_scanned_page(page, images):
+    """True when a single image covers most of the page"""
+    page_area = abs(page.rect) or 1
+    return any(abs(page.rect & info['bbox']) / page_area >= SCANNED_PAGE_COVERAGE for info in images)
+
+
+def read_docx(docx_bytes, max_images):
+    """(text, images) of a Word document; images - embedded pictures in document order -
+    are only returned, instead of the text, when there is too little text, e.g. for scans
+    pasted into Word"""
+
+    try:
+        with zipfile.ZipFile(io.BytesIO(docx_bytes)) as archive:
+            xml = read_part(archive, 'word/document.xml')
+            # Word never writes a DTD, so none is parsed (entity expansion)
+            if b'<!DOCTYPE' in xml[:4096]:
+                raise ValueError("ملف Word غير صالح")
+            root = ElementTree.fromstring(xml)
+
+            text = readable_text(body_text(root))
+            if text and has_enough_text(text):
+                return text, []
+            images = embedded_images(archive, root, max_images)
+            return (None, images) if images else (text, [])
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        raise ValueError(f"فشل في قراءة ملف Word: {str(e)}")
+
+
+def body_text(root):
+    """Paragraphs and table rows of the document body, one per line"""
+    lines = []
+    body = root.find(f'{W}body')
+    for block in body if body is not None else []:
+        if block.tag == f'{W}tbl':
+            for row in block.iter(f'{W}tr'):
+                cells = [' '.join(paragraph_text(paragraph) for paragraph in cell.iter(f'{W}p'))
+                         for cell in row.iterfind(f'{W}tc')]
+                lines.append(' | '.join(cell.strip() for cell in cells))
+        else:
+            # Paragraphs, and paragraphs wrapped in content controls
+            lines.extend(paragraph_text(paragraph) for paragraph in block.iter(f'{W}p'))
+    return '\n'.join(lines)
+
+
+def paragraph_text(paragraph):
+    """Visible text of a paragraph; deleted tracked changes (w:delText) are left out"""
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == f'{W}t':
+            parts.append(node.text or '')
+        elif node.tag == f'{W}tab':
+            parts.append('\t')
+        elif node.tag in (f'{W}br', f'{W}cr'):
+            parts.append('\n')
+    return ''.join(parts)
+
+
+def embedded_images(archive, root, max_images):
+    """Raster images referenced by the document body, in order, without repeats"""
+    try:
+        relationships = ElementTree.fromstring(read_part(archive, 'word/_rels/document.xml.rels'))
+    except KeyError:
+        return []
+
+    targets = {
+        relationship.get('Id'): relationship.get('Target')
+        for relationship in relationships.iter(RELATIONSHIP)
+        if relationship.get('TargetMode') != 'External'
+    }
+    names = set(archive.namelist())
+    paths = []
+    for blip in root.iter(BLIP):
+        target = targets.get(blip.get(EMBED))
+        if not target:
+            continue
+        # Targets are relative to word/, or absolute within the package
+        path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('word', target))
+        if path in names and path not in paths and posixpath.splitext(path)[1].lower() in DOCX_IMAGE_EXTENSIONS:
+            paths.append(path)
+
+    if len(paths) > max_images:
+        raise ValueError(f"عدد الصور في الملف كبير جداً، الحد الأقصى {max_images} صورة")
+    return [read_part(archive, path) for path in paths]
+
+
+def read_part(archive, name):
+    info = archive.getinfo(name)
+    if info.file_size > DOCX_MAX_PART_BYTES:
+        raise ValueError("ملف Word كبير جداً")
+    return archive.read(info)
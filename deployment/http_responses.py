@@ -0,0 +1,120 @@
+"""
+Shared API Gateway response building
+JSON bodies are serialized with orjson when it is packaged, compressed with gzip for
+clients that accept it, and gzip-encoded request bodies are inflated before routing
+"""
+
+import base64
+import gzip
+import json
+import os
+import zlib
+
+from request_metrics import span
+
+# orjson is optional - without it the standard library encoder is used
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+
+GZIP_MIN_BYTES = int(os.environ.get('GZIP_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+
+# Upper bound for inflated request bodies, so a small compressed upload cannot exhaust memory
+MAX_REQUEST_BODY_BYTES = int(os.environ.get('MAX_REQUEST_BODY_BYTES', 20 * 1024 * 1024))
+
+
+def dumps(data):
+    """Serialize to JSON text, keeping Arabic as UTF-8 instead of \\u escapes"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(data, ensure_ascii=False)
+
+
+def json_response(status_code, data, headers=None):
+    """Build a Lambda proxy response with a JSON body"""
+    with span('serialize'):
+        body = dumps(data)
+    return {
+        'statusCode': status_code,
+        'headers': dict(JSON_HEADERS, **(headers or {})),
+        'body': body
+    }
+
+
+def error_response(status_code, error, headers=None):
+    """Build a JSON error response with the API's {"success": false, "error": ...} shape"""
+    return json_response(status_code, {'success': False, 'error': error}, headers)
+
+
+def lower_headers(event):
+    """Request headers with lower-cased names"""
+    return {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+
+
+def accepts_gzip(headers):
+    """Whether the Accept-Encoding header allows gzip"""
+    for coding in (headers.get('accept-encoding') or '').split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() not in ('gzip', '*'):
+            continue
+        params = params.replace(' ', '')
+        try:
+            return not params.startswith('q=') or float(params[2:]) > 0
+        except ValueError:
+            return True
+    return False
+
+
+def encode_response(response, headers):
+    """Gzip a response body when the client accepts it and it is large enough to benefit"""
+    body = response.get('body')
+    if not isinstance(body, str) or response.get('isBase64Encoded') or not accepts_gzip(headers):
+        return response
+
+    raw = body.encode('utf-8')
+    if len(raw) < GZIP_MIN_BYTES:
+        return response
+
+    # A fixed mtime keeps the output identical for identical bodies
+    compressed = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    return dict(
+        response,
+        headers=dict(response.get('headers') or {}, **{'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}),
+        body=base64.b64encode(compressed).decode('ascii'),
+        isBase64Encoded=True
+    )
+
+
+def decode_request_body(event):
+    """Request body as text, inflating gzip uploads
+
+    Raises ValueError with a user-facing message for bodies that cannot be decoded.
+    """
+    body = event.get('body')
+    if body is None:
+        return '{}'
+    if not event.get('isBase64Encoded') and isinstance(body, str):
+        return body
+
+    try:
+        raw = base64.b64decode(body) if event.get('isBase64Encoded') else body
+        oversized = False
+        if lower_headers(event).get('content-encoding', '').strip().lower() == 'gzip':
+            # wbits=31 reads the gzip container; max_length caps the inflated size
+            inflater = zlib.decompressobj(wbits=31)
+            raw = inflater.decompress(raw, MAX_REQUEST_BODY_BYTES)
+            oversized = bool(inflater.unconsumed_tail)
+        text = raw.decode('utf-8')
+    except (zlib.error, ValueError):
+        raise ValueError('تعذر قراءة محتوى الطلب')
+
+    if oversized:
+        raise ValueError('حجم الطلب بعد فك الضغط يتجاوز الحد المسموح')
+    return text
@@ -0,0 +1,152 @@
+"""
+Idempotent POST handling
+Completed responses are replayed for repeated requests, in-progress requests are
+claimed atomically across containers, and concurrent identical requests inside one
+container share a single upstream call
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from cache_backends import create_backend
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_IN_PROGRESS = 'in_progress'
+IDEMPOTENCY_COMPLETED = 'completed'
+
+BODY_HASH_CHUNK_CHARS = 1024 * 1024
+
+
+def request_fingerprint(path, body):
+    """Hash of the route and raw request body"""
+    digest = hashlib.sha256(path.encode('utf-8'))
+    digest.update(b'\x00')
+    # Hashed in slices so a multi-megabyte upload is never copied whole
+    body = body or ''
+    for offset in range(0, len(body), BODY_HASH_CHUNK_CHARS):
+        digest.update(body[offset:offset + BODY_HASH_CHUNK_CHARS].encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers with the same key share its result"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Call fn, or wait for the in-flight call with the same key and return its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+            else:
+                self.shared += 1
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+class IdempotencyStore:
+    """Records in-progress and completed requests by idempotency key"""
+
+    def __init__(self, backend, ttl=None, lock_ttl=300, poll_interval=0.5):
+        self.backend = backend
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self.replays = 0
+        self.conflicts = 0
+        self._lock = threading.Lock()
+
+    def begin(self, key, fingerprint):
+        """Claim a key; returns None when claimed, otherwise the existing record"""
+        record = {'status': IDEMPOTENCY_IN_PROGRESS, 'fingerprint': fingerprint, 'started_at': time.time()}
+        # Short TTL so a crashed invocation does not block retries for the full period
+        if self.backend.add(self._key(key), record, self.lock_ttl):
+            return None
+        return self.backend.get(self._key(key)) or record
+
+    def wait(self, key, timeout):
+        """Poll an in-progress key until it completes, disappears or timeout passes"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            time.sleep(self.poll_interval)
+            record = self.backend.get(self._key(key))
+            if record is None or record['status'] == IDEMPOTENCY_COMPLETED:
+                return record
+        return self.backend.get(self._key(key))
+
+    def complete(self, key, fingerprint, response, ttl=None):
+        """Store the final response for replay"""
+        record = {'status': IDEMPOTENCY_COMPLETED, 'fingerprint': fingerprint, 'response': response}
+        self.backend.set(self._key(key), record, ttl if ttl is not None else self.ttl)
+
+    def release(self, key):
+        """Drop a claim so the request can be retried"""
+        try:
+            self.backend.delete(self._key(key))
+        except Exception as e:
+            logger.error(f"Failed to release idempotency key: {e}")
+
+    def count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        """Return replay and conflict counters together with backend statistics"""
+        with self._lock:
+            stats = {'replays': self.replays, 'conflicts': self.conflicts}
+        stats['store'] = self.backend.stats()
+        return stats
+
+    def _key(self, key):
+        return f'idempotency:{key}'
+
+
+def create_idempotency_store():
+    """Create the idempotency store from environment configuration
+
+    Retries usually land on another Lambda container, so deployed stacks need
+    IDEMPOTENCY_BACKEND=dynamodb for cross-container protection.
+    """
+    if os.environ.get('IDEMPOTENCY_ENABLED', 'true').lower() != 'true':
+        return None
+
+    ttl = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 24 * 60 * 60))
+    backend = create_backend(
+        os.environ.get('IDEMPOTENCY_BACKEND', 'memory'),
+        max_entries=int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 1024)),
+        max_bytes=int(os.environ.get('IDEMPOTENCY_MAX_BYTES', 64 * 1024 * 1024)),
+        default_ttl=ttl,
+        dynamodb_table=os.environ.get('IDEMPOTENCY_DYNAMODB_TABLE'),
+        local_cache=False,
+        namespace='idempotency'
+    )
+    return IdempotencyStore(
+        backend,
+        ttl=ttl,
+        lock_ttl=int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', 300))
+    )
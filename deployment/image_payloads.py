@@ -0,0 +1,121 @@
+"""
+Base64 image payloads without extra copies
+A 5 MB scan arrives as ~7 MB of base64 text. These helpers check its size from the
+text length, decode it in chunks, and write base64 straight into JSON request bodies,
+so the API and OCR Lambdas hold as few full-size copies of an image as possible
+"""
+
+import base64
+import binascii
+import io
+import json
+import os
+
+MIN_IMAGE_BYTES = 100
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+
+# Largest file OCR accepts; uploaded images may exceed Claude Vision's 5 MB limit, and
+# pre-processing shrinks them first. Upload sessions refuse larger files up front
+OCR_MAX_SOURCE_BYTES = int(os.environ.get('OCR_MAX_SOURCE_BYTES', 20 * 1024 * 1024))
+
+# Base64 characters handled per step; a multiple of 4 so chunks decode independently
+BASE64_CHUNK_CHARS = 1024 * 1024
+
+
+def base64_start(encoded):
+    """Offset of the base64 data in the text, past any data URL prefix"""
+    comma = encoded.find(',')
+    return comma + 1 if comma >= 0 else 0
+
+
+def decoded_size(encoded, start=0):
+    """Size of the decoded data implied by the base64 length, without decoding it"""
+    length = len(encoded) - start
+    padding = 2 if encoded.endswith('==', start) else 1 if encoded.endswith('=', start) else 0
+    return max(0, length * 3 // 4 - padding)
+
+
+def is_canonical(encoded, start, size):
+    """True when the text is plain padded base64 of `size` bytes, with no line breaks or spaces"""
+    return len(encoded) - start == 4 * ((size + 2) // 3)
+
+
+def validate_image_size(size, max_bytes=MAX_IMAGE_BYTES):
+    """Return an error message when an image is outside the accepted size range"""
+
+    if size < MIN_IMAGE_BYTES:
+        return "الصورة صغيرة جداً، يرجى رفع صورة أكبر"
+
+    if size > max_bytes:
+        return f"الصورة كبيرة جداً، الحد الأقصى {max_bytes // (1024 * 1024)} ميجابايت"
+
+    return None
+
+
+def decode_base64(encoded, start=0):
+    """Decode base64 text from `start`, raising ValueError on invalid data
+
+    Decodes chunk by chunk so no full-size intermediate copy of the text is made;
+    text with line breaks that splits unevenly falls back to one lenient decode.
+    """
+    output = io.BytesIO()
+    try:
+        for offset in range(start, len(encoded), BASE64_CHUNK_CHARS):
+            output.write(binascii.a2b_base64(encoded[offset:offset + BASE64_CHUNK_CHARS]))
+    except binascii.Error:
+        return base64.b64decode(encoded[start:])
+    # Returns the buffer itself rather than a copy
+    return output.getvalue()
+
+
+def join_parts(parts):
+    """One buffer holding byte strings and (text, start) regions of ASCII text, in order
+
+    The buffer is sized up front so it never reallocates, and text is encoded into
+    it chunk by chunk rather than as a full-size bytes copy.
+    """
+    size = sum(len(part) if isinstance(part, bytes) else len(part[0]) - part[1] for part in parts)
+    buffer = bytearray(size)
+    position = 0
+    for part in parts:
+        chunks = [part] if isinstance(part, bytes) else (
+            part[0][offset:offset + BASE64_CHUNK_CHARS].encode('ascii')
+            for offset in range(part[1], len(part[0]), BASE64_CHUNK_CHARS)
+        )
+        for chunk in chunks:
+            buffer[position:position + len(chunk)] = chunk
+            position += len(chunk)
+    return buffer
+
+
+def is_json_safe(text):
+    """True when a string can be written into JSON as-is, without escaping"""
+    return text.isascii() and text.isprintable() and '"' not in text and '\\' not in text
+
+
+def json_value_parts(value):
+    if isinstance(value, str) and is_json_safe(value):
+        return [b'"', (value, 0), b'"']
+    return [json.dumps(value).encode('utf-8')]
+
+
+def json_bytes(payload):
+    """UTF-8 JSON of a flat payload, such as the OCR function's event
+
+    Strings, and lists of strings, that need no escaping - base64 images - are
+    copied straight into the output instead of going through json.dumps.
+    """
+    parts = [b'{']
+    for position, (key, value) in enumerate(payload.items()):
+        parts.append((b', ' if position else b'') + json.dumps(key).encode('utf-8') + b': ')
+        if isinstance(value, list):
+            parts.append(b'[')
+            for item_position, item in enumerate(value):
+                if item_position:
+                    parts.append(b', ')
+                parts.extend(json_value_parts(item))
+            parts.append(b']')
+        else:
+            parts.extend(json_value_parts(value))
+    parts.append(b'}')
+    return join_parts(parts)
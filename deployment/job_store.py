@@ -0,0 +1,137 @@
+"""
+Job store for asynchronous analysis and OCR requests
+Jobs are JSON records in a pluggable TTL backend (see cache_backends.py). Requests and
+results too large for a record (DynamoDB items are capped at 400 KB) are kept in the
+upload bucket, with only their object key (request_key, result_key) in the record
+"""
+
+import json
+import os
+import time
+import uuid
+
+import upload_store
+from cache_backends import create_backend
+
+JOB_STATUS_QUEUED = 'queued'
+JOB_STATUS_RUNNING = 'running'
+JOB_STATUS_SUCCEEDED = 'succeeded'
+JOB_STATUS_FAILED = 'failed'
+
+
+class PayloadTooLarge(ValueError):
+    """A request or result is too large for a job record and there is no bucket to hold it"""
+
+
+class JobStore:
+    """Create, read and update job records"""
+
+    def __init__(self, backend, ttl=None, shared=False, max_inline_bytes=None, stale_after=None):
+        self.backend = backend
+        self.ttl = ttl
+        # A running job not finished this long after it started lost its worker (timeout, crash)
+        self.stale_after = stale_after
+        # Whether every container sees the same records; memory and sqlite stores are per container in Lambda
+        self.shared = shared
+        self.max_inline_bytes = max_inline_bytes
+
+    def create(self, job_type, request):
+        """Record a new queued job and return it"""
+        now = time.time()
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'type': job_type,
+            'status': JOB_STATUS_QUEUED,
+            'created_at': now,
+            'updated_at': now
+        }
+        job.update(self._inline(job['job_id'], 'request', request))
+        self.backend.set(self._key(job['job_id']), job, self.ttl)
+        return job
+
+    def get(self, job_id):
+        """Return the job record or None"""
+        return self.backend.get(self._key(job_id))
+
+    def claim(self, job_id):
+        """Move a queued job to running for one worker; returns the job, or None when it is
+        missing or already claimed (async invocations can be delivered more than once)"""
+        job = self.get(job_id)
+        if job is None or job['status'] != JOB_STATUS_QUEUED:
+            return None
+
+        now = time.time()
+        claimed = dict(job, status=JOB_STATUS_RUNNING, started_at=now, updated_at=now)
+        return claimed if self.backend.replace(self._key(job_id), job, claimed, self.ttl) else None
+
+    def expire_stale(self, job):
+        """Mark a job failed when its worker stopped without recording an outcome; returns the
+        current job. The job is not run again, so a lost worker never doubles the agent calls"""
+        now = time.time()
+        if (self.stale_after is None or job['status'] != JOB_STATUS_RUNNING
+                or job.get('started_at', now) > now - self.stale_after):
+            return job
+
+        failed = dict(job, status=JOB_STATUS_FAILED, statusCode=504, request=None, request_key=None,
+                      finished_at=now, updated_at=now,
+                      result={'success': False, 'error': 'انتهت مهلة تنفيذ المهمة، يرجى إعادة المحاولة'})
+        if self.backend.replace(self._key(job['job_id']), job, failed, self.ttl):
+            return failed
+        return self.get(job['job_id']) or job
+
+    def update(self, job_id, **fields):
+        """Merge fields into a job record and return the updated job"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+
+        if fields.get('result') is not None:
+            fields.update(self._inline(job_id, 'result', fields.pop('result')))
+        job.update(fields)
+        job['updated_at'] = time.time()
+        self.backend.set(self._key(job_id), job, self.ttl)
+        return job
+
+    def payload(self, job, name):
+        """A job's request or result, loaded from the bucket when it was too large for the record"""
+        if job.get(f'{name}_key'):
+            return upload_store.load_payload(job[f'{name}_key'])
+        return job.get(name)
+
+    def _inline(self, job_id, name, value):
+        """Record fields holding the value, or the key of its copy in the bucket when it is too large"""
+        if self.max_inline_bytes is not None:
+            size = len(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+            if size > self.max_inline_bytes:
+                if not upload_store.uploads_enabled():
+                    raise PayloadTooLarge(size)
+                return {name: None, f'{name}_key': upload_store.store_payload(f'{job_id}/{name}.json', value)}
+        return {name: value, f'{name}_key': None}
+
+    def _key(self, job_id):
+        return f'job:{job_id}'
+
+
+def create_job_store():
+    """Create the job store from environment configuration
+
+    Workers run in separate Lambda invocations, so deployed stacks need a shared
+    backend (JOB_STORE_BACKEND=dynamodb); memory and sqlite suit local runs.
+    """
+    ttl = int(os.environ.get('JOB_TTL_SECONDS', 24 * 60 * 60))
+    kind = os.environ.get('JOB_STORE_BACKEND', 'memory')
+    # Room is left in the 400 KB DynamoDB item for the record's other fields
+    max_inline_bytes = int(os.environ.get('JOB_INLINE_MAX_BYTES', 350 * 1024)) if kind == 'dynamodb' else None
+    # Defaults to the longest Lambda timeout; set it to the function's own timeout
+    stale_after = int(os.environ.get('JOB_STALE_SECONDS', 15 * 60))
+    backend = create_backend(
+        kind,
+        max_entries=int(os.environ.get('JOB_STORE_MAX_ENTRIES', 1024)),
+        max_bytes=int(os.environ.get('JOB_STORE_MAX_BYTES', 128 * 1024 * 1024)),
+        default_ttl=ttl,
+        dynamodb_table=os.environ.get('JOB_DYNAMODB_TABLE'),
+        local_cache=False,
+        namespace='job'
+    )
+    return JobStore(backend, ttl=ttl, shared=kind == 'dynamodb', max_inline_bytes=max_inline_bytes,
+                    stale_after=stale_after)
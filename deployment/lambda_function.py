@@ -6,171 +6,407 @@ AWS Lambda Function for contract analysis with RAG-enhanced AgentCore
 import json
 import logging
 import os
-import boto3
 import uuid
 import base64
-import re
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Start of the init phase; local modules and caches are timed from here
+INIT_STARTED = time.perf_counter()
+
 from botocore.exceptions import ClientError
 
+import job_store as jobs
+import request_metrics
+import upload_store
+from agent_streaming import IncrementalTextCleaner, format_sse_event, iter_agent_text
+from aws_clients import client_timings, get_client
+from answer_cache import create_answer_cache
+from clause_index import ClauseIndexCache
+from clause_splitter import group_sections, split_clauses
+from contract_registry import create_contract_registry, make_contract_id
+from http_responses import decode_request_body, encode_response, error_response, json_response, lower_headers
+from idempotency import (
+    IDEMPOTENCY_COMPLETED, IDEMPOTENCY_IN_PROGRESS, SingleFlight, create_idempotency_store, request_fingerprint
+)
+from image_payloads import OCR_MAX_SOURCE_BYTES, base64_start, decoded_size, json_bytes, validate_image_size
+from request_metrics import propagate, record_outcome, record_size, span
+from response_parser import (
+    EMPTY_ANSWER, RESPONSE_TEXT, format_contract_json_to_arabic, parse_agent_response, render_response, response_kind
+)
+from result_cache import create_result_cache, make_cache_key
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Bedrock AgentCore client
-try:
-    agent_core_client = boto3.client('bedrock-agentcore', region_name='us-west-2')
-    logger.info("Bedrock AgentCore client initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize AgentCore client: {e}")
-    agent_core_client = None
+# Bedrock AgentCore client, created on first use so /health and CORS preflight
+# requests don't pay for boto3 on a cold start
+agent_core_client = None
+
+def get_agent_core_client():
+    """Return the AgentCore client, creating it on first use (None if it cannot be created)"""
+    global agent_core_client
+    if agent_core_client is None:
+        try:
+            agent_core_client = get_client('bedrock-agentcore', 'us-west-2')
+            logger.info("Bedrock AgentCore client initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize AgentCore client: {e}")
+    return agent_core_client
+
+# Map analysis types to deployed agent ARNs
+AGENT_ARNS = {
+    'explanation': 'arn:aws:bedrock-agentcore:us-west-2:273667282126:runtime/memoryenhancedexplanation-L1S4nKChZB',
+    'assessment': 'arn:aws:bedrock-agentcore:us-west-2:273667282126:runtime/memoryenhancedassessment-JAX5fj2gv1'
+}
+
+# Follow-up questions are answered by the explanation agent
+FOLLOWUP_AGENT_ARN = AGENT_ARNS['explanation']
+
+# Analysis type that runs every agent concurrently and merges the outputs
+FULL_REPORT_TYPE = 'both'
+
+FULL_REPORT_TITLES = {
+    'explanation': '📖 شرح العقد',
+    'assessment': '⚖️ تقييم المخاطر والتوصيات'
+}
+
+# Contracts longer than the threshold are split on clause boundaries, the sections are
+# analyzed concurrently and the per-section findings merged (send "long_document" to override)
+LONG_DOCUMENT_THRESHOLD_CHARS = int(os.environ.get('LONG_DOCUMENT_THRESHOLD_CHARS', 30000))
+SECTION_MAX_CHARS = int(os.environ.get('SECTION_MAX_CHARS', 12000))
+SECTION_MAX_COUNT = int(os.environ.get('SECTION_MAX_COUNT', 24))
+SECTION_MAX_CONCURRENCY = int(os.environ.get('SECTION_MAX_CONCURRENCY', 4))
+
+# Batch analysis limits and retry policy for throttled agent calls
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 500))
+BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', 8))
+BATCH_MAX_RETRIES = int(os.environ.get('BATCH_MAX_RETRIES', 4))
+BATCH_BASE_BACKOFF_SECONDS = float(os.environ.get('BATCH_BASE_BACKOFF_SECONDS', 1.0))
+BATCH_MAX_BACKOFF_SECONDS = float(os.environ.get('BATCH_MAX_BACKOFF_SECONDS', 20.0))
+
+# Retries of interactive agent calls (analysis, follow-ups, streams); the AgentCore client
+# makes a single attempt, so this loop is the only retry layer (see aws_clients.py)
+AGENT_MAX_RETRIES = int(os.environ.get('AGENT_MAX_RETRIES', 2))
+
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceQuotaExceededException'
+}
+
+# Server-side failures worth another attempt, as botocore's standard retries treat them
+TRANSIENT_STATUS_CODES = {500, 502, 503, 504}
+
+# OCR runs in this container by default, avoiding a second Lambda hop and cold start;
+# OCR_MODE=lambda keeps the original remote ocr-processor invocation
+OCR_MODE = os.environ.get('OCR_MODE', 'inprocess')
+OCR_FUNCTION_NAME = os.environ.get('OCR_FUNCTION_NAME', 'ocr-processor')
+
+# Request fields that carry a document for OCR, passed on to the OCR pipeline as they are
+OCR_INPUT_KEYS = ('image_data', 'pages', 'pdf_data', 'document_data', 'object_key', 'object_keys')
+
+# Asynchronous jobs: workers run in a separate async invocation of this function in
+# Lambda, or a background thread when running locally (JOB_WORKER_MODE=thread)
+JOB_WORKER_MODE = os.environ.get(
+    'JOB_WORKER_MODE', 'lambda' if os.environ.get('AWS_LAMBDA_FUNCTION_NAME') else 'thread'
+)
+JOB_FUNCTION_NAME = os.environ.get(
+    'JOB_FUNCTION_NAME', os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'egyptian-legal-contract-api')
+)
+job_store = jobs.create_job_store()
+
+# Analysis results cache, kept for the lifetime of the container
+result_cache = create_result_cache()
+
+# Analyzed contracts, so follow-up questions can send a contract_id instead of the text
+contract_registry = create_contract_registry()
+
+# Answers to follow-up questions, matched per contract by exact or similar wording
+answer_cache = create_answer_cache()
+
+# Follow-ups about longer contracts send only the top-k clauses found by a per-contract BM25 index
+FOLLOWUP_RETRIEVAL_MIN_CHARS = int(os.environ.get('FOLLOWUP_RETRIEVAL_MIN_CHARS', 6000))
+FOLLOWUP_TOP_K = int(os.environ.get('FOLLOWUP_TOP_K', 4))
+clause_indexes = ClauseIndexCache(max_size=int(os.environ.get('CLAUSE_INDEX_CACHE_SIZE', 32)))
+PREAMBLE_LABEL = 'مقدمة العقد'
+
+# Repeated POSTs (retries, double-clicks) replay the first response; requests without an
+# Idempotency-Key header are keyed by their body and caller for a short window
+idempotency_store = create_idempotency_store()
+single_flight = SingleFlight()
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 10))
+IDEMPOTENCY_DERIVED_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_DERIVED_TTL_SECONDS', 300))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Job IDs are minted per request, so job submissions are only deduplicated by an explicit key
+IDEMPOTENCY_KEY_ONLY_PATHS = {'/api/jobs'}
+
+# Warm-up pings ({"warmup": true}, e.g. from a scheduled EventBridge rule) prime clients
+# and cache connections; EAGER_INIT=true does the same during init for provisioned concurrency
+EAGER_INIT = os.environ.get('EAGER_INIT', 'false').lower() == 'true'
+
+# Init-phase timings in seconds (import, client construction, first call), so cold
+# starts can be told apart from warm latency in the logs
+INIT_TIMINGS = {}
+cold_start = True
+
+# Fallback messages from the response parser that must never be cached
+UNCACHEABLE_RESULTS = {EMPTY_ANSWER}
+
+# "format": "json" returns the agent's structured findings instead of rendered Arabic text
+RESPONSE_FORMATS = ('text', 'json')
+
+def result_entry(parsed):
+    """Rendered text plus, for structured answers, the decoded object; the shape stored in the result cache"""
+    entry = {'result': render_response(parsed), 'response_type': parsed['kind']}
+    if parsed['kind'] != RESPONSE_TEXT:
+        entry['structured'] = parsed['data']
+    return entry
+
+def format_result(entry, response_format='text'):
+    """Response fields for a result entry in the requested format"""
+    if response_format != 'json':
+        return {'result': entry['result']}
+    # Entries cached before structured results were kept only have the text
+    return {
+        'result': entry.get('structured') or {'text': entry['result']},
+        'response_type': entry.get('response_type', RESPONSE_TEXT),
+        'format': 'json'
+    }
+
+def create_session_id(user_id, session_id=None):
+    """Create an AgentCore session ID, keeping a client-supplied one when valid"""
+    if not session_id:
+        session_id = f'session-{user_id}-{uuid.uuid4().hex}'
+    
+    # Ensure session ID meets AWS minimum length requirement (33 characters)
+    if len(session_id) < 33:
+        session_id = f'session-{user_id}-{uuid.uuid4().hex}'
+    
+    return session_id
+
+def build_analysis_payload(analysis_type, contract_text, user_id):
+    """Build the AgentCore payload for a full contract analysis"""
+    if analysis_type == 'explanation':
+        payload_data = {
+            "contract": contract_text,
+            "user_id": user_id,
+            "analysis_type": "detailed_explanation",
+            "request": "قم بتحليل هذا العقد وشرحه بالتفصيل. اشرح البنود والحقوق والواجبات بطريقة واضحة."
+        }
+    else:
+        payload_data = {
+            "contract": contract_text,
+            "user_id": user_id,
+            "analysis_type": "risk_assessment",
+            "request": "قم بتقييم هذا العقد من الناحية القانونية وحدد المخاطر والتوصيات."
+        }
+    
+    return json.dumps(payload_data, ensure_ascii=False).encode('utf-8')
+
+def build_section_payload(analysis_type, section, position, total, user_id):
+    """Build the AgentCore payload for one section of a long contract"""
+    scope = f"هذا هو الجزء {position} من {total} من عقد طويل"
+    if section['headings']:
+        scope += f" ويشمل: {'، '.join(section['headings'])}"
+    
+    if analysis_type == 'explanation':
+        payload_data = {
+            "contract": section['text'],
+            "user_id": user_id,
+            "analysis_type": "detailed_explanation",
+            "request": f"{scope}. قم بتحليل هذا الجزء وشرح بنوده والحقوق والواجبات الواردة فيه بطريقة واضحة."
+        }
+    else:
+        payload_data = {
+            "contract": section['text'],
+            "user_id": user_id,
+            "analysis_type": "risk_assessment",
+            "request": f"{scope}. قم بتقييم هذا الجزء من الناحية القانونية وحدد المخاطر والتوصيات المتعلقة به."
+        }
+    
+    return json.dumps(payload_data, ensure_ascii=False).encode('utf-8')
 
-def extract_clean_arabic_text(response_text):
-    """Extract clean Arabic text from complex JSON responses"""
-    if not response_text or response_text.strip() == "":
-        return "لم أتمكن من الحصول على إجابة"
+def build_followup_payload(question, contract_text, user_id, clauses=None):
+    """Build the AgentCore payload for a follow-up question - improved for detailed responses"""
+    # The contract is sent once, in the "contract" field the prompt refers to
+    if clauses:
+        source = f"""بناءً على بنود العقد ذات الصلة بالسؤال المقدمة في حقل "contract" ({'، '.join(clauses)})"""
+    else:
+        source = 'بناءً على العقد المقدم في حقل "contract"'
+    
+    payload_data = {
+        "contract": contract_text,
+        "user_id": user_id,
+        "question": f"""السؤال: {question}
+
+{source}، يرجى تقديم إجابة مفصلة وشاملة. اذكر التفاصيل القانونية والبنود ذات الصلة.
+
+يرجى الإجابة بشكل مفصل وواضح مع ذكر الأدلة من العقد."""
+    }
+    if clauses:
+        payload_data["clauses"] = clauses
+    
+    return json.dumps(payload_data, ensure_ascii=False).encode('utf-8')
+
+def select_followup_clauses(question, contract_text, contract_id):
+    """Pick the contract text to send with a follow-up question
+
+    Returns the top-k matching clauses and their headings, or the whole contract with
+    clauses None when it is short or no clause matches.
+    """
+    if len(contract_text) < FOLLOWUP_RETRIEVAL_MIN_CHARS:
+        return contract_text, None
+    
+    index = clause_indexes.get(contract_id or make_contract_id(contract_text), contract_text)
+    passages = index.search(question, FOLLOWUP_TOP_K)
+    if not passages:
+        return contract_text, None
+    
+    # Present the excerpts in document order
+    passages.sort(key=lambda passage: passage['passage'])
+    clauses = []
+    for passage in passages:
+        label = passage['heading'] or PREAMBLE_LABEL
+        if label not in clauses:
+            clauses.append(label)
+    
+    logger.info(f"Follow-up retrieval: {len(passages)} of {len(index.passages)} passages ({', '.join(clauses)})")
+    return '\n\n'.join(passage['text'] for passage in passages), clauses
+
+def resolve_followup_contract(data):
+    """Return (contract_text, contract_id) for a follow-up request
+
+    A known contract_id wins; otherwise a supplied contract_text is registered so
+    the client can switch to the ID. Returns (None, None) for an unknown ID
+    without a fallback text.
+    """
+    contract_id = data.get('contract_id')
+    if contract_id:
+        contract_text = contract_registry.get(contract_id)
+        if contract_text is not None:
+            return contract_text, contract_id
+        logger.info(f"Unknown or expired contract_id: {contract_id[:12]}")
+    
+    contract_text = data.get('contract_text', '')
+    if not contract_text:
+        return (None, None) if contract_id else ('', None)
+    
+    return contract_text, contract_registry.register(contract_text)
+
+def followup_cache_scope(contract_text, contract_id):
+    """Answer cache scope for a contract and the follow-up agent, or None without a contract"""
+    if not contract_text:
+        return None
+    agent_id = FOLLOWUP_AGENT_ARN.rsplit('/', 1)[-1]
+    return f'{agent_id}:{contract_id or make_contract_id(contract_text)}'
+
+def lambda_handler(event, context):
+    """AWS Lambda handler for Egyptian Legal Contract Analysis"""
+    global cold_start
+    first_call, cold_start = cold_start, False
+    started = time.perf_counter()
     
     try:
-        if response_text.strip().startswith('{'):
-            parsed = json.loads(response_text)
+        # Stage timings, sizes and cache outcomes are emitted as one EMF line per request
+        with request_metrics.request(metric_route(event)):
+            request_metrics.set_property('cold_start', first_call)
             
-            # Handle nested structure: {"role": "assistant", "content": [{"text": "..."}]}
-            if 'content' in parsed and isinstance(parsed['content'], list):
-                if parsed['content'] and 'text' in parsed['content'][0]:
-                    inner_text = parsed['content'][0]['text']
-                    
-                    try:
-                        inner_json = json.loads(inner_text)
-                        # For follow-up questions, check if it's a simple response
-                        if len(inner_json) == 1 and 'contract_summary' in inner_json:
-                            clean_answer = inner_json['contract_summary']
-                            if clean_answer.startswith('📋 ملخص العقد:'):
-                                clean_answer = clean_answer.replace('📋 ملخص العقد:', '').strip()
-                            return clean_text_response(clean_answer)
-                        return format_contract_json_to_arabic(inner_json)
-                    except:
-                        inner_cleaned = clean_text_response(inner_text)
-                        if inner_cleaned.startswith('📋 ملخص العقد:'):
-                            inner_cleaned = inner_cleaned.replace('📋 ملخص العقد:', '').strip()
-                        return inner_cleaned
+            # Scheduled warm-up ping: prime clients and caches without doing any work
+            if event.get('warmup'):
+                return warm_up()
             
-            # Handle direct JSON contract data
-            elif any(key in parsed for key in ['contract_summary', 'contract_type', 'legal_classification']):
-                return format_contract_json_to_arabic(parsed)
+            # Asynchronous job worker invocation (sent by dispatch_job)
+            if 'job_worker' in event:
+                return run_job(event['job_worker'])
             
-            # Handle simple text response
-            elif 'text' in parsed:
-                text_response = clean_text_response(parsed['text'])
-                if text_response.startswith('📋 ملخص العقد:'):
-                    text_response = text_response.replace('📋 ملخص العقد:', '').strip()
-                return text_response
-                
-        # If not JSON, clean and return as text
-        cleaned_text = clean_text_response(response_text)
-        if cleaned_text.startswith('📋 ملخص العقد:'):
-            cleaned_text = cleaned_text.replace('📋 ملخص العقد:', '').strip()
-        return cleaned_text
-        
-    except Exception as e:
-        logger.error(f"Error parsing response: {e}")
-        # Fallback: try to extract Arabic text with regex
-        arabic_text = re.findall(r'[\u0600-\u06FF\s]+', response_text)
-        if arabic_text:
-            result = ' '.join(arabic_text).strip()
-            if result.startswith('📋 ملخص العقد:'):
-                result = result.replace('📋 ملخص العقد:', '').strip()
-            return result
-        return "تم استلام الرد لكن حدث خطأ في التحليل"
-
-def format_contract_json_to_arabic(data):
-    """Format contract JSON data into clean Arabic text"""
-    result = []
-    
-    # For follow-up questions, don't repeat contract summary - just return the main content
-    if len(data) == 1 and 'contract_summary' in data:
-        return data['contract_summary']
-    
-    # Contract summary (only for full analysis)
-    if 'contract_summary' in data and len(data) > 1:
-        result.append(f"📋 ملخص العقد: {data['contract_summary']}")
-    
-    # Contract type
-    if 'contract_type' in data:
-        contract_type = data['contract_type']
-        if isinstance(contract_type, dict):
-            if 'نوع_رئيسي' in contract_type:
-                result.append(f"📝 نوع العقد: {contract_type['نوع_رئيسي']}")
-            if 'تصنيف_فرعي' in contract_type:
-                result.append(f"🏷️ التصنيف: {contract_type['تصنيف_فرعي']}")
+            response = route_request(event)
+            
+            # Large Arabic analyses are gzip-compressed for clients that accept it
+            with span('encode_response'):
+                response = encode_response(response, lower_headers(event))
             
-            # Characteristics
-            if 'خصائص' in contract_type and isinstance(contract_type['خصائص'], list):
-                result.append("\n✨ خصائص العقد:")
-                for feature in contract_type['خصائص']:
-                    result.append(f"  • {feature}")
-    
-    # Legal classification
-    if 'legal_classification' in data:
-        legal = data['legal_classification']
-        if isinstance(legal, dict):
-            result.append("\n⚖️ التصنيف القانوني:")
-            if 'القانون_الحاكم' in legal:
-                result.append(f"  📚 القانون الحاكم: {legal['القانون_الحاكم']}")
-            if 'طبيعة_العقد' in legal:
-                result.append(f"  🏛️ طبيعة العقد: {legal['طبيعة_العقد']}")
-            if 'درجة_الإلزام' in legal:
-                result.append(f"  ⚡ درجة الإلزام: {legal['درجة_الإلزام']}")
-    
-    # Contract duration
-    if 'contract_duration' in data:
-        duration = data['contract_duration']
-        if isinstance(duration, dict):
-            result.append("\n⏰ مدة العقد:")
-            if 'نوع_المدة' in duration:
-                result.append(f"  📅 نوع المدة: {duration['نوع_المدة']}")
-            if 'فترة_الاختبار' in duration:
-                result.append(f"  🧪 فترة الاختبار: {duration['فترة_الاختبار']}")
-            if 'تاريخ_البدء' in duration:
-                result.append(f"  🚀 تاريخ البدء: {duration['تاريخ_البدء']}")
-    
-    # Additional notes
-    if 'additional_notes' in data:
-        notes = data['additional_notes']
-        if isinstance(notes, dict) and 'ملاحظات_قانونية' in notes:
-            if isinstance(notes['ملاحظات_قانونية'], list):
-                result.append("\n📝 ملاحظات قانونية:")
-                for note in notes['ملاحظات_قانونية']:
-                    result.append(f"  • {note}")
-    
-    return '\n'.join(result) if result else "تم تحليل العقد بنجاح"
-
-def clean_text_response(text):
-    """Clean and format text response"""
-    if not text:
-        return "لم أتمكن من الحصول على إجابة"
-    
-    # Remove extra whitespace and clean up
-    cleaned = re.sub(r'\s+', ' ', text.strip())
-    
-    # Remove JSON-like patterns if they exist
-    cleaned = re.sub(r'[{}"\[\]]', '', cleaned)
-    
-    # Remove contract summary prefixes specifically
-    summary_prefixes = [
-        '📋 ملخص العقد:',
-        'ملخص العقد:',
-        '📋 ملخص العقد',
-        'ملخص العقد'
-    ]
-    
-    for prefix in summary_prefixes:
-        if cleaned.startswith(prefix):
-            cleaned = cleaned.replace(prefix, '').strip()
-            break
-    
-    return cleaned
+            request_metrics.set_property('status_code', response.get('statusCode'))
+            record_size('response_bytes', len(response.get('body') or ''))
+            return response
+    finally:
+        if first_call:
+            INIT_TIMINGS['first_call'] = round(time.perf_counter() - started, 3)
+            INIT_TIMINGS['clients'] = client_timings()
+            logger.info(f"Cold start timings: {INIT_TIMINGS}")
 
-def lambda_handler(event, context):
-    """AWS Lambda handler for Egyptian Legal Contract Analysis"""
+def metric_route(event):
+    """Route name for metrics, without IDs and arbitrary paths that would explode the dimensions"""
+    if event.get('warmup'):
+        return 'warmup'
+    if 'job_worker' in event:
+        return 'job_worker'
+    
+    path = event.get('path', '/')
+    if path.startswith('/api/jobs/'):
+        return '/api/jobs/{job_id}'
+    if path in post_handlers() or path in upload_handlers() or path in ('/health', '/metrics'):
+        return path
+    return 'other'
+
+def warm_up():
+    """Create AWS clients, open cache connections and wake the OCR path"""
+    started = time.perf_counter()
+    warmed = []
+    
+    if get_agent_core_client():
+        warmed.append('agentcore')
+    
+    if upload_store.uploads_enabled():
+        upload_store.get_s3_client()
+        warmed.append('uploads')
+    
+    stores = {
+        'result_cache': result_cache,
+        'contract_registry': contract_registry,
+        'answer_cache': answer_cache,
+        'idempotency': idempotency_store,
+        'jobs': job_store
+    }
+    for name, store in stores.items():
+        if store is None:
+            continue
+        try:
+            store.backend.warm()
+            warmed.append(name)
+        except Exception as e:
+            logger.warning(f"Warm-up of {name} failed: {e}")
+    
+    try:
+        if OCR_MODE == 'lambda':
+            # The OCR function has its own cold start; an async ping warms one of its containers
+            get_lambda_client().invoke(
+                FunctionName=OCR_FUNCTION_NAME,
+                InvocationType='Event',
+                Payload=json.dumps({'warmup': True})
+            )
+        else:
+            import ocr_processor
+            ocr_processor.warm_up()
+        warmed.append('ocr')
+    except Exception as e:
+        logger.warning(f"Warm-up of OCR failed: {e}")
+    
+    elapsed = round(time.perf_counter() - started, 3)
+    logger.info(f"Warm-up finished in {elapsed}s: {warmed}")
+    return json_response(200, {
+        'success': True,
+        'warmed': warmed,
+        'elapsed_seconds': elapsed,
+        'init': INIT_TIMINGS,
+        'clients': client_timings()
+    })
+
+def route_request(event):
+    """Dispatch an API Gateway proxy event to its endpoint"""
     
     # Handle CORS preflight
     if event.get('httpMethod') == 'OPTIONS':
@@ -178,7 +414,7 @@ def lambda_handler(event, context):
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                'Access-Control-Allow-Headers': 'Content-Type,Content-Encoding,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,Idempotency-Key',
                 'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
             },
             'body': ''
@@ -188,377 +424,838 @@ def lambda_handler(event, context):
         # Parse the request
         path = event.get('path', '/')
         method = event.get('httpMethod', 'GET')
-        body = event.get('body', '{}')
+        
+        # Large contracts may be uploaded gzip-compressed
+        record_size('request_bytes', len(event.get('body') or ''))
+        try:
+            with span('decode_request'):
+                body = decode_request_body(event)
+        except ValueError as e:
+            return error_response(400, str(e))
         
         # Health check endpoint
         if path == '/health' and method == 'GET':
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'status': 'healthy',
-                    'service': 'Egyptian Legal Contract Analysis API',
-                    'aws_status': 'connected',
-                    'agentcore_status': 'available',
-                    'region': 'us-west-2'
-                })
-            }
+            return json_response(200, {
+                'status': 'healthy',
+                'service': 'Egyptian Legal Contract Analysis API',
+                'aws_status': 'connected',
+                'agentcore_status': 'available',
+                'region': 'us-west-2',
+                'result_cache': result_cache.stats(),
+                'answer_cache': answer_cache.stats(),
+                'idempotency': idempotency_store.stats() if idempotency_store else None,
+                'init': INIT_TIMINGS
+            })
+        
+        # Rolling stage-latency histograms of this container
+        if path == '/metrics' and method == 'GET':
+            return json_response(200, request_metrics.snapshot())
         
-        # Contract analysis endpoint
-        if path == '/api/analyze' and method == 'POST':
-            return analyze_contract(body)
+        # Upload sessions hand out fresh keys and URLs, so they are never replayed
+        upload_handler = upload_handlers().get(path) if method == 'POST' else None
+        if upload_handler:
+            return upload_handler(body)
         
-        # Follow-up questions endpoint for chat functionality
-        if path == '/api/ask' and method == 'POST':
-            return ask_followup_question(body)
+        # Analysis, batch, follow-up, job and OCR endpoints, deduplicated on repeats
+        post_handler = post_handlers().get(path) if method == 'POST' else None
+        if post_handler:
+            return handle_idempotent(event, path, body, post_handler)
         
-        # OCR processing endpoint
-        if path == '/api/ocr' and method == 'POST':
-            return process_contract_image(body)
+        # Asynchronous job status
+        if path.startswith('/api/jobs/') and method == 'GET':
+            return get_job(path[len('/api/jobs/'):])
         
         # Default response for unknown paths
-        return {
-            'statusCode': 404,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'success': False,
-                'error': 'مسار غير موجود'
-            })
-        }
+        return error_response(404, 'مسار غير موجود')
         
     except Exception as e:
         logger.error(f"Unexpected error in lambda_handler: {e}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'success': False,
-                'error': f'خطأ غير متوقع: {str(e)}'
-            })
-        }
+        return error_response(500, f'خطأ غير متوقع: {str(e)}')
+
+def post_handlers():
+    """Map POST routes to their endpoint functions"""
+    return {
+        '/api/analyze': analyze_contract,
+        '/api/analyze/batch': analyze_contract_batch,
+        '/api/ask': ask_followup_question,
+        '/api/jobs': create_job,
+        '/api/ocr': process_contract_image
+    }
+
+def upload_handlers():
+    """Map upload routes to their endpoint functions"""
+    return {
+        '/api/uploads': create_upload_session,
+        '/api/uploads/complete': complete_upload
+    }
+
+def handle_idempotent(event, path, body, handler):
+    """Run a POST handler at most once per idempotency key"""
+    if idempotency_store is None:
+        return handler(body)
+    
+    try:
+        data = json.loads(body) if isinstance(body, str) else (body or {})
+    except ValueError:
+        return handler(body)
+    
+    # Malformed bodies get the handler's own error
+    if not isinstance(data, dict):
+        return handler(body)
+    
+    client_key = lower_headers(event).get('idempotency-key')
+    fingerprint = request_fingerprint(path, body if isinstance(body, str) else json.dumps(body, sort_keys=True))
+    caller = caller_identity(event)
+    
+    if client_key:
+        if len(client_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return error_response(400, 'مفتاح عدم التكرار غير صالح')
+        # Keys are only unique per client, so two callers picking the same one never see
+        # each other's responses
+        store_key, ttl = f'key:{caller or "anonymous"}:{client_key}', None
+    elif data.get('use_cache', True) is False:
+        # An explicit request for a fresh result is never answered from a previous one
+        return handler(data)
+    else:
+        # Without a user_id the response carries a freshly generated one, which must not be
+        # handed to anyone else; without a caller, identical bodies could be different users
+        if not caller or not data.get('user_id') or path in IDEMPOTENCY_KEY_ONLY_PATHS:
+            return handler(data)
+        store_key, ttl = f'body:{caller}:{fingerprint}', IDEMPOTENCY_DERIVED_TTL_SECONDS
+    
+    # Identical concurrent requests in this container share one upstream call;
+    # the handler gets the parsed body so large uploads are not parsed twice
+    return single_flight.do(
+        f'{store_key}:{fingerprint}',
+        lambda: run_idempotent(store_key, fingerprint, ttl, handler, data)
+    )
+
+def caller_identity(event):
+    """The authenticated principal, or else the source IP, of an API Gateway request"""
+    context = event.get('requestContext') or {}
+    authorizer = context.get('authorizer') or {}
+    claims = authorizer.get('claims') or (authorizer.get('jwt') or {}).get('claims') or {}
+    principal = claims.get('sub') or authorizer.get('principalId')
+    if principal:
+        return f'principal:{principal}'
+    
+    # REST APIs (payload 1.0) and HTTP APIs (payload 2.0)
+    source_ip = (context.get('identity') or {}).get('sourceIp') or (context.get('http') or {}).get('sourceIp')
+    return f'ip:{source_ip}' if source_ip else None
+
+def run_idempotent(store_key, fingerprint, ttl, handler, body):
+    """Claim the key, replay a completed response, or run the handler and record its result"""
+    try:
+        record = idempotency_store.begin(store_key, fingerprint)
+    except Exception as e:
+        logger.error(f"Idempotency store unavailable, running without it: {e}")
+        return handler(body)
+    
+    if record is not None:
+        if record['fingerprint'] != fingerprint:
+            idempotency_store.count('conflicts')
+            return error_response(422, 'مفتاح عدم التكرار مستخدم لطلب مختلف')
+        
+        # The original request is running in another container; give it a moment to finish
+        if record['status'] == IDEMPOTENCY_IN_PROGRESS:
+            record = idempotency_store.wait(store_key, IDEMPOTENCY_WAIT_SECONDS)
+        
+        if record and record['status'] == IDEMPOTENCY_COMPLETED:
+            logger.info(f"Replaying idempotent response ({store_key[:24]})")
+            idempotency_store.count('replays')
+            response = record['response']
+            return dict(response, headers=dict(response.get('headers', {}), **{'Idempotent-Replayed': 'true'}))
+        
+        idempotency_store.count('conflicts')
+        return error_response(
+            409, 'الطلب نفسه قيد المعالجة، يرجى المحاولة بعد قليل', headers={'Retry-After': '2'}
+        )
+    
+    try:
+        response = handler(body)
+    except Exception:
+        idempotency_store.release(store_key)
+        raise
+    
+    # Failures and throttling are released so the client can retry them
+    try:
+        if response.get('statusCode', 500) >= 500 or response.get('statusCode') == 429:
+            idempotency_store.release(store_key)
+        else:
+            idempotency_store.complete(store_key, fingerprint, response, ttl)
+    except Exception as e:
+        logger.error(f"Failed to record idempotent response: {e}")
+        idempotency_store.release(store_key)
+    
+    return response
 
 def analyze_contract(body_str):
     """Analyze contract using direct Bedrock AgentCore API"""
     try:
-        if not agent_core_client:
-            return {
-                'statusCode': 503,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': 'خدمة AgentCore غير متاحة'
-                })
-            }
+        if not get_agent_core_client():
+            return error_response(503, 'خدمة AgentCore غير متاحة')
 
         # Parse request body
         if isinstance(body_str, str):
             data = json.loads(body_str)
         else:
             data = body_str
+        if not isinstance(data, dict):
+            return error_response(400, 'بيانات الطلب غير صحيحة')
         
         analysis_type = data.get('analysis_type')
         contract_text = data.get('contract_text')
         user_id = data.get('user_id', f'web_user_{uuid.uuid4().hex[:8]}')
         
         if not analysis_type or not contract_text:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False, 
-                    'error': 'نوع التحليل أو نص العقد مفقود'
-                })
-            }
+            return error_response(400, 'نوع التحليل أو نص العقد مفقود')
         
-        # Map analysis types to deployed agent ARNs
-        agent_arns = {
-            'explanation': 'arn:aws:bedrock-agentcore:us-west-2:273667282126:runtime/memoryenhancedexplanation-L1S4nKChZB',
-            'assessment': 'arn:aws:bedrock-agentcore:us-west-2:273667282126:runtime/memoryenhancedassessment-JAX5fj2gv1'
-        }
+        if analysis_type not in AGENT_ARNS and analysis_type != FULL_REPORT_TYPE:
+            return error_response(400, 'نوع التحليل غير صحيح')
         
-        if analysis_type not in agent_arns:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': 'نوع التحليل غير صحيح'
-                })
-            }
+        response_format = data.get('format', 'text')
+        if response_format not in RESPONSE_FORMATS:
+            return error_response(400, 'صيغة الاستجابة غير مدعومة')
         
-        agent_arn = agent_arns[analysis_type]
-        session_id = f'session-{user_id}-{uuid.uuid4().hex}'
+        long_document = data.get('long_document')
         
-        # Ensure session ID meets AWS minimum length requirement (33 characters)
-        if len(session_id) < 33:
-            session_id = f'session-{user_id}-{uuid.uuid4().hex}'
-        
-        # Prepare payload data
-        if analysis_type == 'explanation':
-            payload_data = {
-                "contract": contract_text,
-                "user_id": user_id,
-                "analysis_type": "detailed_explanation",
-                "request": "قم بتحليل هذا العقد وشرحه بالتفصيل. اشرح البنود والحقوق والواجبات بطريقة واضحة."
-            }
+        # "stream" is served by streaming_server.py; API Gateway's proxy integration buffers
+        # the whole response, so here it is answered as the usual JSON body
+        if analysis_type == FULL_REPORT_TYPE:
+            status_code, response_data = run_full_report(
+                contract_text, user_id, use_cache=data.get('use_cache', True), long_document=long_document,
+                response_format=response_format
+            )
         else:
-            payload_data = {
-                "contract": contract_text,
-                "user_id": user_id,
-                "analysis_type": "risk_assessment",
-                "request": "قم بتقييم هذا العقد من الناحية القانونية وحدد المخاطر والتوصيات."
+            status_code, response_data = run_contract_analysis(
+                analysis_type, contract_text, user_id, use_cache=data.get('use_cache', True),
+                long_document=long_document, response_format=response_format
+            )
+        
+        if status_code == 200:
+            contract_id = contract_registry.register(contract_text)
+            if contract_id:
+                response_data['contract_id'] = contract_id
+        
+        return json_response(status_code, response_data)
+            
+    except Exception as e:
+        logger.error(f"Error in analyze_contract: {e}")
+        return error_response(500, f'خطأ غير متوقع: {str(e)}')
+
+def streams_analysis(data):
+    """Whether streaming_server.py answers an /api/analyze request as a stream of agent chunks
+    
+    Full reports and sectioned analyses merge several agent calls, so they are
+    always returned in one piece.
+    """
+    return (isinstance(data, dict) and bool(data.get('stream'))
+            and data.get('analysis_type') != FULL_REPORT_TYPE
+            and isinstance(data.get('contract_text'), str)
+            and not use_long_document_mode(data['contract_text'], data.get('long_document')))
+
+def streams_answer(data):
+    """Whether streaming_server.py answers an /api/ask request as a stream of agent chunks"""
+    return isinstance(data, dict) and bool(data.get('stream'))
+
+def use_long_document_mode(contract_text, long_document=None):
+    """Decide whether a contract is analyzed section by section"""
+    if long_document is not None:
+        return bool(long_document)
+    return len(contract_text) > LONG_DOCUMENT_THRESHOLD_CHARS
+
+def run_contract_analysis(analysis_type, contract_text, user_id, use_cache=True, max_retries=AGENT_MAX_RETRIES,
+                          long_document=None, response_format='text'):
+    """Run one validated analysis request, returning (status_code, response_data)"""
+    if use_long_document_mode(contract_text, long_document):
+        return run_sectioned_analysis(
+            analysis_type, contract_text, user_id, use_cache=use_cache, response_format=response_format
+        )
+    
+    agent_arn = AGENT_ARNS[analysis_type]
+    session_id = create_session_id(user_id)
+    
+    # Serve repeated submissions of the same contract from the result cache
+    cache_key = make_cache_key(contract_text, analysis_type, agent_arn)
+    
+    if use_cache:
+        with span('result_cache_lookup'):
+            cached = result_cache.get(cache_key)
+        record_outcome('result_cache', 'miss' if cached is None else 'hit')
+        if cached is not None:
+            logger.info(f"Result cache hit: {analysis_type} ({cache_key[:12]})")
+            return 200, dict(
+                format_result(cached, response_format),
+                success=True,
+                analysis_type=analysis_type,
+                user_id=user_id,
+                session_id=session_id,
+                cached=True
+            )
+    
+    payload = build_analysis_payload(analysis_type, contract_text, user_id)
+    
+    logger.info(f"Invoking agent: {analysis_type} for user: {user_id}")
+    
+    try:
+        # Invoke the selected agent
+        response = invoke_agent_with_retry(agent_arn, session_id, payload, max_retries=max_retries)
+        
+        # Process response
+        if 'response' not in response:
+            return 500, {
+                'success': False,
+                'error': 'لم يتم الحصول على استجابة من الوكيل'
             }
         
-        # Convert payload to bytes
-        payload = json.dumps(payload_data, ensure_ascii=False).encode('utf-8')
+        # Parse the agent response once; the entry keeps both the text and the structured findings
+        response_text = read_agent_response(response['response'])
+        with span('parse_response'):
+            entry = result_entry(parse_agent_response(response_text))
         
-        logger.info(f"Invoking agent: {analysis_type} for user: {user_id}")
+        if use_cache and entry['result'] not in UNCACHEABLE_RESULTS:
+            result_cache.set(cache_key, entry)
         
+        return 200, dict(
+            format_result(entry, response_format),
+            success=True,
+            analysis_type=analysis_type,
+            user_id=user_id,
+            session_id=session_id,
+            cached=False
+        )
+        
+    except ClientError as e:
+        logger.error(f"Bedrock AgentCore error: {e}")
+        return 429 if is_throttling_error(e) else 500, {
+            'success': False,
+            'error': f'خطأ في استدعاء الوكيل: {str(e)}'
+        }
+
+def split_contract_sections(contract_text):
+    """Split a long contract into clause-aligned sections, at most SECTION_MAX_COUNT of them"""
+    max_chars = max(SECTION_MAX_CHARS, -(-len(contract_text) // SECTION_MAX_COUNT))
+    return group_sections(split_clauses(contract_text), max_chars)
+
+def merge_finding_values(current, value):
+    """Merge two finding values: dicts key by key, lists as an ordered union, scalars first-wins"""
+    if current in (None, '', [], {}):
+        return value
+    if isinstance(current, dict) and isinstance(value, dict):
+        merged = dict(current)
+        for key, item in value.items():
+            merged[key] = merge_finding_values(current.get(key), item)
+        return merged
+    if isinstance(current, list) and isinstance(value, list):
+        return current + [item for item in value if item not in current]
+    return current
+
+def merge_section_findings(findings, text_notes):
+    """Reduce per-section findings into one document for format_contract_json_to_arabic"""
+    merged = {}
+    summaries = []
+    
+    for finding in findings:
+        for key, value in finding.items():
+            if key == 'contract_summary':
+                if value and value not in summaries:
+                    summaries.append(value)
+            else:
+                merged[key] = merge_finding_values(merged.get(key), value)
+    
+    if summaries:
+        merged['contract_summary'] = ' '.join(summaries)
+    
+    # Sections answered in free text are kept as notes rather than dropped
+    if text_notes:
+        notes = merged.get('additional_notes') if isinstance(merged.get('additional_notes'), dict) else {}
+        legal_notes = notes.get('ملاحظات_قانونية') if isinstance(notes.get('ملاحظات_قانونية'), list) else []
+        merged['additional_notes'] = dict(notes, **{'ملاحظات_قانونية': legal_notes + text_notes})
+    
+    return merged
+
+def section_label(section, position):
+    """Human-readable clause range of a section"""
+    headings = section['headings']
+    if not headings:
+        return f'الجزء {position}'
+    if len(headings) == 1:
+        return headings[0]
+    return f'{headings[0]} - {headings[-1]}'
+
+def run_sectioned_analysis(analysis_type, contract_text, user_id, use_cache=True, response_format='text'):
+    """Map-reduce analysis of a long contract: sections concurrently, then a local merge"""
+    agent_arn = AGENT_ARNS[analysis_type]
+    session_id = create_session_id(user_id)
+    started = time.time()
+    
+    cache_key = make_cache_key(contract_text, f'{analysis_type}:sections', agent_arn)
+    
+    if use_cache:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Result cache hit: {analysis_type} sections ({cache_key[:12]})")
+            return 200, dict(format_result(cached, response_format), sections=cached['sections'], success=True,
+                             analysis_type=analysis_type, mode='sections', user_id=user_id,
+                             session_id=session_id, cached=True)
+    
+    sections = split_contract_sections(contract_text)
+    logger.info(f"Sectioned analysis: {analysis_type}, {len(contract_text)} chars in {len(sections)} sections")
+    
+    def analyze_section(position, section):
+        section_started = time.time()
+        payload = build_section_payload(analysis_type, section, position, len(sections), user_id)
         try:
-            # Invoke the selected agent
-            response = agent_core_client.invoke_agent_runtime(
-                agentRuntimeArn=agent_arn,
-                runtimeSessionId=session_id,
-                payload=payload
+            # Sections fan out in parallel, so throttling is retried like batch items
+            response = invoke_agent_with_retry(
+                agent_arn, create_session_id(user_id), payload, max_retries=BATCH_MAX_RETRIES
             )
-            
-            # Process response
-            if 'response' in response:
-                response_body = response['response']
-                
-                # For streaming responses, we need to read all chunks
-                if hasattr(response_body, 'read'):
-                    try:
-                        full_content = response_body.read()
-                        if isinstance(full_content, bytes):
-                            full_content = full_content.decode('utf-8')
-                        response_body = full_content
-                    except Exception as read_error:
-                        logger.error(f"Error reading response body: {read_error}")
-                        response_body = str(response_body)
-                
-                # Extract clean Arabic text from complex JSON responses
-                clean_response = extract_clean_arabic_text(response_body)
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({
-                        'success': True,
-                        'analysis_type': analysis_type,
-                        'result': clean_response,
-                        'user_id': user_id,
-                        'session_id': session_id
-                    }, ensure_ascii=False)
-                }
-            else:
-                return {
-                    'statusCode': 500,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({
-                        'success': False,
-                        'error': 'لم يتم الحصول على استجابة من الوكيل'
-                    })
-                }
-                
+            if 'response' not in response:
+                return 500, None, 'لم يتم الحصول على استجابة من الوكيل', time.time() - section_started
+            return 200, read_agent_response(response['response']), None, time.time() - section_started
         except ClientError as e:
-            logger.error(f"Bedrock AgentCore error: {e}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': f'خطأ في استدعاء الوكيل: {str(e)}'
-                })
-            }
+            logger.error(f"Bedrock AgentCore error in section {position}: {e}")
+            status_code = 429 if is_throttling_error(e) else 500
+            return status_code, None, f'خطأ في استدعاء الوكيل: {str(e)}', time.time() - section_started
+    
+    # Latency follows the slowest section instead of the whole document
+    with ThreadPoolExecutor(max_workers=max(1, min(SECTION_MAX_CONCURRENCY, len(sections)))) as executor:
+        futures = [executor.submit(propagate(analyze_section), position, section)
+                   for position, section in enumerate(sections, 1)]
+        outcomes = [future.result() for future in futures]
+    
+    findings = []
+    text_notes = []
+    errors = {}
+    section_info = []
+    
+    for position, (section, (status_code, response_text, error, elapsed)) in enumerate(zip(sections, outcomes), 1):
+        section_info.append({
+            'section': position,
+            'headings': section['headings'],
+            'characters': len(section['text']),
+            'statusCode': status_code,
+            'elapsed': round(elapsed, 3)
+        })
+        if status_code != 200:
+            errors[str(position)] = {'statusCode': status_code, 'error': error}
+            continue
+        
+        with span('parse_response'):
+            parsed = parse_agent_response(response_text)
+        if parsed['kind'] != RESPONSE_TEXT:
+            findings.append(parsed['data'])
+        elif parsed['data'] not in UNCACHEABLE_RESULTS:
+            text_notes.append(f"{section_label(section, position)}: {parsed['data']}")
+    
+    timings = {'total': round(time.time() - started, 3)}
+    logger.info(f"Sectioned analysis timings: {timings}, {len(errors)} failed sections")
+    
+    if not findings and not text_notes:
+        first_error = next(iter(errors.values()), {'statusCode': 500, 'error': 'لم يتم الحصول على استجابة من الوكيل'})
+        return first_error['statusCode'], {
+            'success': False,
+            'error': first_error['error'],
+            'errors': errors,
+            'sections': section_info
+        }
+    
+    merged = merge_section_findings(findings, text_notes)
+    result = {
+        'result': format_contract_json_to_arabic(merged),
+        'structured': merged,
+        'response_type': response_kind(merged),
+        'sections': section_info
+    }
+    
+    # Partial results are returned but not cached, so a retry can fill the gaps
+    if use_cache and not errors:
+        result_cache.set(cache_key, result)
+    
+    return 200, dict(format_result(result, response_format), sections=section_info, success=True,
+                     analysis_type=analysis_type, mode='sections', errors=errors, timings=timings,
+                     user_id=user_id, session_id=session_id, cached=False)
+
+def run_full_report(contract_text, user_id, use_cache=True, max_retries=AGENT_MAX_RETRIES, long_document=None,
+                    response_format='text'):
+    """Run every analysis agent concurrently and merge the formatted outputs"""
+    started = time.time()
+    
+    def timed_analysis(analysis_type):
+        agent_started = time.time()
+        status_code, response_data = run_contract_analysis(
+            analysis_type, contract_text, user_id, use_cache=use_cache, max_retries=max_retries,
+            long_document=long_document, response_format=response_format
+        )
+        return status_code, response_data, time.time() - agent_started
+    
+    # Wall-clock time becomes the slowest agent rather than the sum of both
+    with ThreadPoolExecutor(max_workers=len(AGENT_ARNS)) as executor:
+        futures = {analysis_type: executor.submit(propagate(timed_analysis), analysis_type) for analysis_type in AGENT_ARNS}
+        outcomes = {analysis_type: future.result() for analysis_type, future in futures.items()}
+    
+    sections = []
+    results = {}
+    errors = {}
+    timings = {}
+    
+    for analysis_type, (status_code, response_data, elapsed) in outcomes.items():
+        timings[analysis_type] = round(elapsed, 3)
+        if status_code == 200:
+            results[analysis_type] = response_data['result']
+            sections.append(f"{FULL_REPORT_TITLES[analysis_type]}\n{response_data['result']}")
+        else:
+            errors[analysis_type] = {'statusCode': status_code, 'error': response_data.get('error')}
+    
+    timings['total'] = round(time.time() - started, 3)
+    logger.info(f"Full report timings: {timings}")
+    
+    if not results:
+        # Report the first failure's status when no agent succeeded
+        first_error = next(iter(errors.values()))
+        return first_error['statusCode'], {
+            'success': False,
+            'error': first_error['error'],
+            'errors': errors,
+            'timings': timings
+        }
+    
+    # Follow-up questions go to the explanation agent, so hand back its session
+    explanation = outcomes['explanation'][1]
+    
+    report = {
+        'success': True,
+        'analysis_type': FULL_REPORT_TYPE,
+        'result': '\n\n'.join(sections),
+        'results': results,
+        'errors': errors,
+        'timings': timings,
+        'user_id': user_id,
+        'session_id': explanation.get('session_id', create_session_id(user_id)),
+        'cached': all(outcome[1].get('cached', False) for outcome in outcomes.values())
+    }
+    
+    # Structured reports keep each agent's object under its analysis type
+    if response_format == 'json':
+        report.update(result=results, format='json')
+    
+    return 200, report
+
+def read_agent_response(response_body):
+    """Read an AgentCore response body into text"""
+    # For streaming responses, we need to read all chunks
+    if hasattr(response_body, 'read'):
+        try:
+            with span('agent_read'):
+                full_content = response_body.read()
+            if isinstance(full_content, bytes):
+                full_content = full_content.decode('utf-8')
+            response_body = full_content
+        except Exception as read_error:
+            logger.error(f"Error reading response body: {read_error}")
+            response_body = str(response_body)
+    
+    return response_body
+
+def is_throttling_error(error):
+    """Check whether a ClientError signals throttling"""
+    return error.response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+
+def is_transient_error(error):
+    """Check whether a ClientError is a server-side failure that may pass on retry"""
+    return error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') in TRANSIENT_STATUS_CODES
+
+def invoke_agent_with_retry(agent_arn, session_id, payload, max_retries=AGENT_MAX_RETRIES):
+    """Invoke an agent runtime, backing off exponentially with jitter when throttled or on a
+    transient server error; the only retry layer for agent calls"""
+    attempt = 0
+    while True:
+        try:
+            with span('agent_invoke'):
+                return get_agent_core_client().invoke_agent_runtime(
+                    agentRuntimeArn=agent_arn,
+                    runtimeSessionId=session_id,
+                    payload=payload
+                )
+        except ClientError as e:
+            if not (is_throttling_error(e) or is_transient_error(e)) or attempt >= max_retries:
+                raise
             
+            delay = min(BATCH_MAX_BACKOFF_SECONDS, BATCH_BASE_BACKOFF_SECONDS * (2 ** attempt))
+            delay *= random.uniform(0.5, 1.0)
+            attempt += 1
+            logger.warning(f"Agent call failed ({e.response.get('Error', {}).get('Code')}), "
+                           f"retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+def analyze_contract_batch(body_str):
+    """Analyze many contracts in one request with bounded concurrent agent calls"""
+    try:
+        if not get_agent_core_client():
+            return error_response(503, 'خدمة AgentCore غير متاحة')
+
+        # Parse request body
+        if isinstance(body_str, str):
+            data = json.loads(body_str)
+        else:
+            data = body_str
+        
+        items = data.get('items')
+        user_id = data.get('user_id', f'web_user_{uuid.uuid4().hex[:8]}')
+        
+        if not isinstance(items, list) or not items:
+            return error_response(400, 'قائمة العقود مطلوبة')
+        
+        if len(items) > BATCH_MAX_ITEMS:
+            return error_response(400, f'الحد الأقصى لعدد العقود في الطلب الواحد هو {BATCH_MAX_ITEMS}')
+        
+        max_concurrency = int(data.get('max_concurrency', BATCH_MAX_CONCURRENCY))
+        max_concurrency = max(1, min(max_concurrency, BATCH_MAX_CONCURRENCY, len(items)))
+        use_cache = data.get('use_cache', True)
+        response_format = data.get('format', 'text')
+        
+        logger.info(f"Batch analysis: {len(items)} contracts, concurrency {max_concurrency}")
+        started = time.time()
+        
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = [
+                executor.submit(propagate(analyze_batch_item), index, item, user_id, use_cache, response_format)
+                for index, item in enumerate(items)
+            ]
+            results = [future.result() for future in futures]
+        
+        succeeded = sum(1 for result in results if result['statusCode'] == 200)
+        
+        return json_response(200, {
+            'success': True,
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'max_concurrency': max_concurrency,
+            'elapsed_seconds': round(time.time() - started, 3),
+            'results': results
+        })
+        
     except Exception as e:
-        logger.error(f"Error in analyze_contract: {e}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'success': False,
-                'error': f'خطأ غير متوقع: {str(e)}'
-            })
-        }
+        logger.error(f"Error in analyze_contract_batch: {e}")
+        return error_response(500, f'خطأ غير متوقع: {str(e)}')
+
+def analyze_batch_item(index, item, user_id, use_cache=True, response_format='text'):
+    """Analyze one batch item, returning its own status code instead of raising"""
+    try:
+        analysis_type = item.get('analysis_type') if isinstance(item, dict) else None
+        contract_text = item.get('contract_text') if isinstance(item, dict) else None
+        response_format = item.get('format', response_format) if isinstance(item, dict) else response_format
+        
+        if not analysis_type or not contract_text:
+            return {'index': index, 'statusCode': 400, 'success': False, 'error': 'نوع التحليل أو نص العقد مفقود'}
+        
+        if analysis_type not in AGENT_ARNS and analysis_type != FULL_REPORT_TYPE:
+            return {'index': index, 'statusCode': 400, 'success': False, 'error': 'نوع التحليل غير صحيح'}
+        
+        if response_format not in RESPONSE_FORMATS:
+            return {'index': index, 'statusCode': 400, 'success': False, 'error': 'صيغة الاستجابة غير مدعومة'}
+        
+        if analysis_type == FULL_REPORT_TYPE:
+            status_code, response_data = run_full_report(
+                contract_text, item.get('user_id', user_id), use_cache=use_cache, max_retries=BATCH_MAX_RETRIES,
+                long_document=item.get('long_document'), response_format=response_format
+            )
+        else:
+            status_code, response_data = run_contract_analysis(
+                analysis_type, contract_text, item.get('user_id', user_id), use_cache=use_cache,
+                max_retries=BATCH_MAX_RETRIES, long_document=item.get('long_document'),
+                response_format=response_format
+            )
+        return dict(response_data, index=index, statusCode=status_code)
+        
+    except Exception as e:
+        logger.error(f"Error in batch item {index}: {e}")
+        return {'index': index, 'statusCode': 500, 'success': False, 'error': f'خطأ غير متوقع: {str(e)}'}
 
 def ask_followup_question(body_str):
     """Handle follow-up questions in chat mode"""
     try:
-        if not agent_core_client:
-            return {
-                'statusCode': 503,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': 'خدمة AgentCore غير متاحة'
-                })
-            }
+        if not get_agent_core_client():
+            return error_response(503, 'خدمة AgentCore غير متاحة')
 
         # Parse request body
         if isinstance(body_str, str):
             data = json.loads(body_str)
         else:
             data = body_str
+        if not isinstance(data, dict):
+            return error_response(400, 'بيانات الطلب غير صحيحة')
         
         question = data.get('question')
-        contract_text = data.get('contract_text', '')
         user_id = data.get('user_id', f'web_user_{uuid.uuid4().hex[:8]}')
-        session_id = data.get('session_id', f'session-{user_id}-{uuid.uuid4().hex}')
-        
-        # Ensure session ID meets AWS minimum length requirement (33 characters)
-        if len(session_id) < 33:
-            session_id = f'session-{user_id}-{uuid.uuid4().hex}'
+        session_id = create_session_id(user_id, data.get('session_id'))
         
         if not question:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': 'السؤال مطلوب'
+            return error_response(400, 'السؤال مطلوب')
+        
+        contract_text, contract_id = resolve_followup_contract(data)
+        if contract_text is None:
+            return error_response(404, 'العقد غير موجود أو انتهت صلاحيته، يرجى إعادة إرسال نص العقد')
+        
+        # Repeated or rephrased questions about the same contract are served from cache
+        cache_scope = followup_cache_scope(contract_text, contract_id) if data.get('use_cache', True) else None
+        
+        if cache_scope:
+            with span('answer_cache_lookup'):
+                cached_answer, cache_tier = answer_cache.get(cache_scope, question)
+            record_outcome('answer_cache', cache_tier or 'miss')
+            if cached_answer is not None:
+                logger.info(f"Answer cache hit ({cache_tier}): {question[:100]}")
+                return json_response(200, {
+                    'success': True,
+                    'question': question,
+                    'result': cached_answer,
+                    'user_id': user_id,
+                    'session_id': session_id,
+                    'contract_id': contract_id,
+                    'cached': True,
+                    'cache_tier': cache_tier
                 })
-            }
         
         # Use the explanation agent for follow-up questions
-        agent_arn = 'arn:aws:bedrock-agentcore:us-west-2:273667282126:runtime/memoryenhancedexplanation-L1S4nKChZB'
-        
-        # Prepare payload for follow-up question - improved for detailed responses
-        payload_data = {
-            "contract": contract_text,
-            "user_id": user_id,
-            "question": f"""السؤال: {question}
-
-بناءً على العقد المقدم، يرجى تقديم إجابة مفصلة وشاملة. اذكر التفاصيل القانونية والبنود ذات الصلة.
-
-العقد المرجعي:
-{contract_text}
-
-يرجى الإجابة بشكل مفصل وواضح مع ذكر الأدلة من العقد."""
-        }
+        agent_arn = FOLLOWUP_AGENT_ARN
         
-        # Convert payload to bytes
-        payload = json.dumps(payload_data, ensure_ascii=False).encode('utf-8')
+        with span('select_clauses'):
+            contract_excerpt, clauses = select_followup_clauses(question, contract_text, contract_id)
+        payload = build_followup_payload(question, contract_excerpt, user_id, clauses)
         
         logger.info(f"Follow-up question: {question[:100]}...")
         
         try:
             # Invoke the explanation agent
-            response = agent_core_client.invoke_agent_runtime(
-                agentRuntimeArn=agent_arn,
-                runtimeSessionId=session_id,
-                payload=payload
-            )
+            response = invoke_agent_with_retry(agent_arn, session_id, payload)
             
             # Process response
             if 'response' in response:
-                response_body = response['response']
-                
-                # For streaming responses, we need to read all chunks
-                if hasattr(response_body, 'read'):
-                    try:
-                        full_content = response_body.read()
-                        if isinstance(full_content, bytes):
-                            full_content = full_content.decode('utf-8')
-                        response_body = full_content
-                    except Exception as read_error:
-                        logger.error(f"Error reading response body: {read_error}")
-                        response_body = str(response_body)
+                response_body = read_agent_response(response['response'])
                 
                 # Extract clean Arabic text from complex JSON responses
-                clean_response = extract_clean_arabic_text(response_body)
+                with span('parse_response'):
+                    clean_response = render_response(parse_agent_response(response_body))
                 
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({
-                        'success': True,
-                        'question': question,
-                        'result': clean_response,
-                        'user_id': user_id,
-                        'session_id': session_id
-                    }, ensure_ascii=False)
-                }
+                if cache_scope and clean_response not in UNCACHEABLE_RESULTS:
+                    answer_cache.set(cache_scope, question, clean_response)
+                
+                return json_response(200, {
+                    'success': True,
+                    'question': question,
+                    'result': clean_response,
+                    'user_id': user_id,
+                    'session_id': session_id,
+                    'contract_id': contract_id,
+                    'clauses': clauses,
+                    'cached': False
+                })
             else:
-                return {
-                    'statusCode': 500,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({
-                        'success': False,
-                        'error': 'لم يتم الحصول على استجابة من الوكيل'
-                    })
-                }
+                return error_response(500, 'لم يتم الحصول على استجابة من الوكيل')
                 
         except ClientError as e:
             logger.error(f"Bedrock AgentCore error in follow-up: {e}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': f'خطأ في استدعاء الوكيل: {str(e)}'
-                })
-            }
+            return error_response(500, f'خطأ في استدعاء الوكيل: {str(e)}')
             
     except Exception as e:
         logger.error(f"Error in ask_followup_question: {e}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'success': False,
-                'error': f'خطأ غير متوقع: {str(e)}'
-            })
-        }
+        return error_response(500, f'خطأ غير متوقع: {str(e)}')
+
+def run_ocr(ocr_payload):
+    """Run the OCR pipeline in this container, or in the OCR Lambda when OCR_MODE=lambda"""
+    if OCR_MODE == 'lambda':
+        logger.info(f"Calling OCR processor Lambda function: {OCR_FUNCTION_NAME}")
+        
+        # Invoke simplified OCR processor Lambda
+        ocr_response = get_lambda_client().invoke(
+            FunctionName=OCR_FUNCTION_NAME,
+            InvocationType='RequestResponse',
+            Payload=json_bytes(ocr_payload)
+        )
+        return json.loads(ocr_response['Payload'].read())
+    
+    # Imported on first use so analysis-only containers don't load the imaging stack
+    import ocr_processor
+    
+    logger.info("Running OCR pipeline in-process")
+    return ocr_processor.lambda_handler(ocr_payload, None)
+
+def get_lambda_client():
+    """Return the shared Lambda client used for remote OCR and job dispatch"""
+    return get_client('lambda', 'us-west-2')
+
+def create_upload_session(body_str):
+    """Hand out object keys and presigned URLs for uploading scans straight to S3"""
+    
+    try:
+        data = json.loads(body_str) if isinstance(body_str, str) else body_str
+        
+        if not upload_store.uploads_enabled():
+            return error_response(503, upload_store.UPLOADS_DISABLED_ERROR)
+        
+        # A single file may be described at the top level; files OCR would refuse are refused
+        # here, before they are uploaded
+        session = upload_store.create_session(
+            data.get('files') if 'files' in data else [data], max_file_bytes=OCR_MAX_SOURCE_BYTES
+        )
+        logger.info(f"Created upload session {session['session_id']} for {len(session['uploads'])} files")
+        return json_response(200, {'success': True, **session})
+        
+    except ValueError as e:
+        return error_response(400, str(e))
+    except Exception as e:
+        logger.error(f"Error in create_upload_session: {e}")
+        return error_response(500, f'فشل في إنشاء جلسة الرفع: {str(e)}')
+
+def complete_upload(body_str):
+    """Assemble a multipart upload once the browser has sent every part"""
+    
+    try:
+        data = json.loads(body_str) if isinstance(body_str, str) else body_str
+        
+        if not upload_store.uploads_enabled():
+            return error_response(503, upload_store.UPLOADS_DISABLED_ERROR)
+        
+        object_key = upload_store.complete_upload(data.get('object_key'), data.get('upload_id'), data.get('parts'))
+        return json_response(200, {'success': True, 'object_key': object_key})
+        
+    except ValueError as e:
+        return error_response(400, str(e))
+    except ClientError as e:
+        # Missing or mismatched parts, or an upload that was already completed or expired
+        logger.error(f"Failed to complete upload: {e}")
+        return error_response(400, f"فشل في إكمال رفع الملف: {e.response.get('Error', {}).get('Code', '')}")
+    except Exception as e:
+        logger.error(f"Error in complete_upload: {e}")
+        return error_response(500, f'فشل في إكمال رفع الملف: {str(e)}')
+
+def ocr_input_error(ocr_payload):
+    """Error message for an invalid upload key or an image outside the size limits, judged from its base64 length"""
+    # Same precedence as the OCR function: uploads, then a PDF or Word file, then pages, then a single image
+    object_keys = ocr_payload.get('object_keys') or ([ocr_payload['object_key']] if ocr_payload.get('object_key') else [])
+    if object_keys:
+        try:
+            for key in object_keys if isinstance(object_keys, list) else [object_keys]:
+                upload_store.validate_object_key(key)
+        except ValueError as e:
+            return str(e)
+        return None
+    if ocr_payload.get('document_data') or ocr_payload.get('pdf_data'):
+        return None
+    multipage = bool(ocr_payload.get('pages'))
+    images = ocr_payload['pages'] if multipage else [ocr_payload.get('image_data')]
+    if not isinstance(images, list):
+        return None
+    
+    for page_number, image in enumerate(images, start=1):
+        if not isinstance(image, str) or not image:
+            continue
+        size_error = validate_image_size(decoded_size(image, base64_start(image)))
+        if size_error:
+            return f"صفحة {page_number}: {size_error}" if multipage else size_error
+    return None
 
 def process_contract_image(body):
     """Process contract image using simplified OCR (direct image processing - no S3)"""
@@ -572,39 +1269,30 @@ def process_contract_image(body):
             
         logger.info("Starting simplified OCR processing for contract image")
         
-        # Check for required image_data
-        if 'image_data' not in data:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': 'مطلوب image_data'
-                })
-            }
+        # Check for required image_data (or pages for multi-page documents, document_data
+        # for PDF and Word files, or object_key / object_keys for files uploaded to S3)
+        if not any(key in data for key in OCR_INPUT_KEYS):
+            return error_response(400, 'مطلوب image_data')
         
-        # Call simplified OCR processor Lambda function
-        logger.info("Calling simplified OCR processor Lambda function")
-        lambda_client = boto3.client('lambda', region_name='us-west-2')
+        # Prepare payload for simplified OCR (pass image data or object keys directly)
+        ocr_payload = {key: data[key] for key in OCR_INPUT_KEYS if key in data}
         
-        # Prepare payload for simplified OCR (pass image_data directly)
-        ocr_payload = {
-            'image_data': data['image_data']
-        }
+        # Bad upload keys and images outside the size limits are turned away here,
+        # before any decoding, download or OCR hop
+        input_error = ocr_input_error(ocr_payload)
+        if input_error:
+            return error_response(400, input_error)
+        
+        record_size('image_base64_bytes', sum(
+            len(ocr_payload[key]) for key in ('image_data', 'pdf_data', 'document_data')
+            if isinstance(ocr_payload.get(key), str)
+        ) + sum(len(page) for page in ocr_payload.get('pages') or [] if isinstance(page, str)))
+        request_metrics.set_property('ocr_mode', OCR_MODE)
         
         try:
-            # Invoke simplified OCR processor Lambda
-            ocr_response = lambda_client.invoke(
-                FunctionName='ocr-processor',
-                InvocationType='RequestResponse',
-                Payload=json.dumps(ocr_payload)
-            )
-            
-            # Parse OCR response
-            ocr_result = json.loads(ocr_response['Payload'].read())
+            # In OCR_MODE=lambda this includes the invoke hop; the OCR function emits its own stages
+            with span('ocr'):
+                ocr_result = run_ocr(ocr_payload)
             
             if ocr_result['statusCode'] == 200:
                 # Parse the extracted text
@@ -618,9 +1306,15 @@ def process_contract_image(body):
                     'success': True,
                     'extracted_text': extracted_text,
                     'character_count': len(extracted_text),
-                    'processing_method': 'direct_claude_vision'
+                    'processing_method': ocr_body.get('processing_method', 'direct_claude_vision')
                 }
                 
+                # OCR cache outcome, and per-page results for multi-page documents
+                for key in ('document_type', 'page_count', 'failed_pages', 'text_layer_pages', 'pages', 'cache_hit',
+                            'cache_hits', 'cache_tier'):
+                    if key in ocr_body:
+                        response_data[key] = ocr_body[key]
+                
                 # If auto_analyze is requested, run contract analysis
                 if data.get('auto_analyze') and data.get('analysis_type') and extracted_text:
                     logger.info(f"Running auto-analysis: {data['analysis_type']}")
@@ -634,7 +1328,8 @@ def process_contract_image(body):
                     }
                     
                     # Run analysis
-                    analysis_result = analyze_contract(json.dumps(analysis_request))
+                    with span('auto_analyze'):
+                        analysis_result = analyze_contract(json.dumps(analysis_request))
                     
                     if analysis_result['statusCode'] == 200:
                         analysis_data = json.loads(analysis_result['body'])
@@ -646,55 +1341,333 @@ def process_contract_image(body):
                         response_data['auto_analysis_completed'] = False
                         logger.warning("Auto-analysis failed")
                 
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps(response_data, ensure_ascii=False)
-                }
+                return json_response(200, response_data)
                 
             else:
                 # OCR failed
                 ocr_error = json.loads(ocr_result['body']).get('error', 'فشل في استخراج النص')
                 logger.error(f"OCR processor error: {ocr_error}")
-                return {
-                    'statusCode': 500,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({
-                        'success': False,
-                        'error': f'فشل في استخراج النص من الصورة: {ocr_error}'
-                    })
-                }
+                # Rejected input (missing upload, unreadable file) stays a client error
+                status_code = ocr_result['statusCode'] if 400 <= ocr_result['statusCode'] < 500 else 500
+                return error_response(status_code, f'فشل في استخراج النص من الصورة: {ocr_error}')
                 
         except Exception as e:
             logger.error(f"Error calling OCR processor: {e}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': f'فشل في استدعاء معالج OCR: {str(e)}'
-                })
-            }
+            return error_response(500, f'فشل في استدعاء معالج OCR: {str(e)}')
             
     except Exception as e:
         logger.error(f"Error in process_contract_image: {e}")
-        return {
+        return error_response(500, f'خطأ غير متوقع: {str(e)}')
+
+def stream_agent_events(agent_arn, session_id, payload, meta, on_result=None, response_format='text'):
+    """Invoke an agent and yield SSE events with partial cleaned text as chunks arrive"""
+    yield format_sse_event('start', meta)
+    
+    try:
+        response = invoke_agent_with_retry(agent_arn, session_id, payload)
+        
+        if 'response' not in response:
+            yield format_sse_event('error', {
+                'success': False,
+                'statusCode': 500,
+                'error': 'لم يتم الحصول على استجابة من الوكيل'
+            })
+            return
+        
+        cleaner = IncrementalTextCleaner()
+        parts = []
+        
+        for text in iter_agent_text(response):
+            parts.append(text)
+            partial = cleaner.feed(text)
+            if partial:
+                yield format_sse_event('chunk', {'text': partial})
+        
+        tail = cleaner.finish()
+        if tail:
+            yield format_sse_event('chunk', {'text': tail})
+        
+        # The final event carries the fully formatted result, same as the buffered endpoints
+        entry = result_entry(parse_agent_response(''.join(parts)))
+        if on_result:
+            on_result(entry)
+        
+        yield format_sse_event('done', dict(meta, success=True, **format_result(entry, response_format)))
+        
+    except ClientError as e:
+        logger.error(f"Bedrock AgentCore streaming error: {e}")
+        yield format_sse_event('error', {
+            'success': False,
             'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
+            'error': f'خطأ في استدعاء الوكيل: {str(e)}'
+        })
+    except Exception as e:
+        logger.error(f"Error while streaming agent response: {e}")
+        yield format_sse_event('error', {
+            'success': False,
+            'statusCode': 500,
+            'error': f'خطأ غير متوقع: {str(e)}'
+        })
+
+def stream_contract_analysis(data):
+    """Yield SSE events for a contract analysis request"""
+    analysis_type = data.get('analysis_type')
+    contract_text = data.get('contract_text')
+    user_id = data.get('user_id', f'web_user_{uuid.uuid4().hex[:8]}')
+    
+    if not get_agent_core_client():
+        yield format_sse_event('error', {'success': False, 'statusCode': 503, 'error': 'خدمة AgentCore غير متاحة'})
+        return
+    
+    if not analysis_type or not contract_text:
+        yield format_sse_event('error', {'success': False, 'statusCode': 400, 'error': 'نوع التحليل أو نص العقد مفقود'})
+        return
+    
+    if analysis_type not in AGENT_ARNS:
+        yield format_sse_event('error', {'success': False, 'statusCode': 400, 'error': 'نوع التحليل غير صحيح'})
+        return
+    
+    response_format = data.get('format', 'text')
+    if response_format not in RESPONSE_FORMATS:
+        yield format_sse_event('error', {'success': False, 'statusCode': 400, 'error': 'صيغة الاستجابة غير مدعومة'})
+        return
+    
+    agent_arn = AGENT_ARNS[analysis_type]
+    session_id = create_session_id(user_id)
+    meta = {'analysis_type': analysis_type, 'user_id': user_id, 'session_id': session_id}
+    
+    contract_id = contract_registry.register(contract_text)
+    if contract_id:
+        meta['contract_id'] = contract_id
+    
+    use_cache = data.get('use_cache', True)
+    
+    # Sectioned analyses are merged at the end, so only the final result is sent
+    if use_long_document_mode(contract_text, data.get('long_document')):
+        yield format_sse_event('start', meta)
+        status_code, response_data = run_sectioned_analysis(
+            analysis_type, contract_text, user_id, use_cache=use_cache, response_format=response_format
+        )
+        if status_code == 200:
+            yield format_sse_event('done', dict(response_data, **meta))
+        else:
+            yield format_sse_event('error', dict(response_data, statusCode=status_code))
+        return
+    
+    cache_key = make_cache_key(contract_text, analysis_type, agent_arn)
+    
+    if use_cache:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Result cache hit (stream): {analysis_type} ({cache_key[:12]})")
+            yield format_sse_event('start', meta)
+            yield format_sse_event('done', dict(meta, success=True, cached=True, **format_result(cached, response_format)))
+            return
+    
+    def store_result(entry):
+        if use_cache and entry['result'] not in UNCACHEABLE_RESULTS:
+            result_cache.set(cache_key, entry)
+    
+    logger.info(f"Streaming agent: {analysis_type} for user: {user_id}")
+    payload = build_analysis_payload(analysis_type, contract_text, user_id)
+    yield from stream_agent_events(
+        agent_arn, session_id, payload, meta, on_result=store_result, response_format=response_format
+    )
+
+def stream_followup_answer(data):
+    """Yield SSE events for a follow-up question"""
+    question = data.get('question')
+    user_id = data.get('user_id', f'web_user_{uuid.uuid4().hex[:8]}')
+    session_id = create_session_id(user_id, data.get('session_id'))
+    
+    if not get_agent_core_client():
+        yield format_sse_event('error', {'success': False, 'statusCode': 503, 'error': 'خدمة AgentCore غير متاحة'})
+        return
+    
+    if not question:
+        yield format_sse_event('error', {'success': False, 'statusCode': 400, 'error': 'السؤال مطلوب'})
+        return
+    
+    contract_text, contract_id = resolve_followup_contract(data)
+    if contract_text is None:
+        yield format_sse_event('error', {
+            'success': False, 'statusCode': 404,
+            'error': 'العقد غير موجود أو انتهت صلاحيته، يرجى إعادة إرسال نص العقد'
+        })
+        return
+    
+    meta = {'question': question, 'user_id': user_id, 'session_id': session_id, 'contract_id': contract_id}
+    
+    cache_scope = followup_cache_scope(contract_text, contract_id) if data.get('use_cache', True) else None
+    
+    if cache_scope:
+        cached_answer, cache_tier = answer_cache.get(cache_scope, question)
+        if cached_answer is not None:
+            logger.info(f"Answer cache hit (stream, {cache_tier}): {question[:100]}")
+            yield format_sse_event('start', meta)
+            yield format_sse_event('done', dict(
+                meta, success=True, result=cached_answer, cached=True, cache_tier=cache_tier
+            ))
+            return
+    
+    def store_answer(entry):
+        if cache_scope and entry['result'] not in UNCACHEABLE_RESULTS:
+            answer_cache.set(cache_scope, question, entry['result'])
+    
+    contract_excerpt, clauses = select_followup_clauses(question, contract_text, contract_id)
+    meta['clauses'] = clauses
+    
+    logger.info(f"Streaming follow-up question: {question[:100]}...")
+    payload = build_followup_payload(question, contract_excerpt, user_id, clauses)
+    yield from stream_agent_events(FOLLOWUP_AGENT_ARN, session_id, payload, meta, on_result=store_answer)
+
+def job_handlers():
+    """Map job types to the endpoint functions that do the work"""
+    return {
+        'analyze': analyze_contract,
+        'batch': analyze_contract_batch,
+        'ask': ask_followup_question,
+        'ocr': process_contract_image
+    }
+
+def jobs_available():
+    """Jobs need a store every container shares once they run in Lambda
+    
+    The worker runs in another invocation, and polls can land on any container, so a
+    per-container memory or sqlite store would lose the job.
+    """
+    in_lambda = bool(os.environ.get('AWS_LAMBDA_FUNCTION_NAME')) or JOB_WORKER_MODE == 'lambda'
+    return job_store.shared or not in_lambda
+
+def create_job(body_str):
+    """Queue a long-running request and return its job ID immediately"""
+    try:
+        if not jobs_available():
+            logger.error("Asynchronous jobs need JOB_STORE_BACKEND=dynamodb in Lambda")
+            return error_response(503, 'المهام غير المتزامنة غير مفعّلة: تتطلب مخزن مهام مشتركاً')
+        
+        # Parse request body
+        if isinstance(body_str, str):
+            data = json.loads(body_str)
+        else:
+            data = body_str
+        
+        job_type = data.pop('type', None)
+        
+        if job_type not in job_handlers():
+            return json_response(400, {
+                'success': False,
+                'error': 'نوع المهمة غير صحيح',
+                'supported_types': sorted(job_handlers())
+            })
+        
+        # Job results are stored whole, so never stream them
+        data.pop('stream', None)
+        
+        try:
+            job = job_store.create(job_type, data)
+        except jobs.PayloadTooLarge:
+            return error_response(413, 'الطلب أكبر من الحد المسموح به للمهام، يرجى رفع الملف مباشرة واستخدام object_key')
+        logger.info(f"Created {job_type} job: {job['job_id']}")
+        
+        try:
+            dispatch_job(job['job_id'])
+        except Exception as e:
+            logger.error(f"Failed to dispatch job {job['job_id']}: {e}")
+            job_store.update(job['job_id'], status=jobs.JOB_STATUS_FAILED, request=None,
+                             statusCode=500, result={'success': False, 'error': f'فشل في بدء المهمة: {str(e)}'})
+            return json_response(500, {
                 'success': False,
-                'error': f'خطأ غير متوقع: {str(e)}'
+                'job_id': job['job_id'],
+                'error': f'فشل في بدء المهمة: {str(e)}'
             })
-        }
\ No newline at end of file
+        
+        return json_response(202, {
+            'success': True,
+            'job_id': job['job_id'],
+            'type': job_type,
+            'status': job['status'],
+            'status_url': f"/api/jobs/{job['job_id']}"
+        }, headers={'Location': f"/api/jobs/{job['job_id']}"})
+        
+    except Exception as e:
+        logger.error(f"Error in create_job: {e}")
+        return error_response(500, f'خطأ غير متوقع: {str(e)}')
+
+def dispatch_job(job_id):
+    """Start a worker for a queued job"""
+    if JOB_WORKER_MODE == 'thread':
+        threading.Thread(target=run_job, args=(job_id,), daemon=True).start()
+        return
+    
+    # Only the job ID travels in the event - async invoke payloads are capped at 256 KB
+    get_lambda_client().invoke(
+        FunctionName=JOB_FUNCTION_NAME,
+        InvocationType='Event',
+        Payload=json.dumps({'job_worker': job_id})
+    )
+
+def run_job(job_id):
+    """Worker: run a queued job and store its outcome"""
+    job = job_store.claim(job_id)
+    if job is None:
+        # Redelivered events find the job claimed; a worker that died leaves it stale
+        current = job_store.get(job_id)
+        if current is None:
+            logger.error(f"Job not found: {job_id}")
+            return {'statusCode': 404, 'job_id': job_id}
+        current = job_store.expire_stale(current)
+        logger.warning(f"Job {job_id} already {current['status']}, skipping")
+        return {'statusCode': 409, 'job_id': job_id}
+    
+    logger.info(f"Running {job['type']} job: {job_id}")
+    
+    try:
+        response = job_handlers()[job['type']](job_store.payload(job, 'request'))
+        result = json.loads(response['body'])
+        status = jobs.JOB_STATUS_SUCCEEDED if response['statusCode'] == 200 else jobs.JOB_STATUS_FAILED
+        status_code = response['statusCode']
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}")
+        result = {'success': False, 'error': f'خطأ غير متوقع: {str(e)}'}
+        status = jobs.JOB_STATUS_FAILED
+        status_code = 500
+    
+    # The request can be large (images, contracts) and is no longer needed
+    try:
+        job_store.update(job_id, status=status, statusCode=status_code, result=result,
+                         request=None, request_key=None, finished_at=time.time())
+    except jobs.PayloadTooLarge:
+        status, status_code = jobs.JOB_STATUS_FAILED, 413
+        job_store.update(job_id, status=status, statusCode=status_code, request=None, request_key=None,
+                         finished_at=time.time(),
+                         result={'success': False, 'error': 'نتيجة المهمة أكبر من الحد المسموح به للتخزين'})
+    logger.info(f"Job {job_id} {status}")
+    return {'statusCode': status_code, 'job_id': job_id}
+
+def get_job(job_id):
+    """Return the status, and once finished the result, of a job"""
+    try:
+        job = job_store.get(job_id)
+        
+        if job is None:
+            return error_response(404, 'المهمة غير موجودة')
+        
+        job = job_store.expire_stale(job)
+        if job.get('result_key'):
+            job['result'] = job_store.payload(job, 'result')
+        for field in ('request', 'request_key', 'result_key'):
+            job.pop(field, None)
+        job['success'] = job['status'] != jobs.JOB_STATUS_FAILED
+        
+        return json_response(200, job)
+        
+    except Exception as e:
+        logger.error(f"Error in get_job: {e}")
+        return error_response(500, f'خطأ غير متوقع: {str(e)}')
+
+INIT_TIMINGS['import'] = round(time.perf_counter() - INIT_STARTED, 3)
+
+if EAGER_INIT:
+    warm_up()
+    INIT_TIMINGS['eager_warm_up'] = round(time.perf_counter() - INIT_STARTED - INIT_TIMINGS['import'], 3)
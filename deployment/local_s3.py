@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Local S3 stand-in for the upload path
+An in-memory, S3-compatible HTTP server covering what direct uploads use: presigned
+PUTs, multipart uploads, GET, HEAD and DELETE of objects, with path-style URLs and
+browser CORS. Signatures are not verified, but presigned URLs do expire. Point boto3
+at it with AWS_ENDPOINT_URL_S3=http://127.0.0.1:9000 (an IP, so URLs stay path-style)
+"""
+
+import argparse
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from calendar import timegm
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.etree import ElementTree
+
+logger = logging.getLogger(__name__)
+
+S3_XMLNS = 'http://s3.amazonaws.com/doc/2006-03-01/'
+
+
+class ObjectStore:
+    """Objects and in-progress multipart uploads, kept in memory"""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.lock = threading.Lock()
+
+    def put(self, bucket, key, data, content_type):
+        record = {'data': data, 'etag': f'"{hashlib.md5(data).hexdigest()}"',
+                  'content_type': content_type or 'binary/octet-stream', 'modified': time.time()}
+        with self.lock:
+            self.objects[(bucket, key)] = record
+        return record
+
+    def get(self, bucket, key):
+        with self.lock:
+            return self.objects.get((bucket, key))
+
+    def delete(self, bucket, key):
+        with self.lock:
+            self.objects.pop((bucket, key), None)
+
+    def create_upload(self, bucket, key, content_type):
+        upload_id = uuid.uuid4().hex
+        with self.lock:
+            self.uploads[upload_id] = {'bucket': bucket, 'key': key, 'content_type': content_type, 'parts': {}}
+        return upload_id
+
+    def put_part(self, upload_id, part_number, data):
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        with self.lock:
+            upload = self.uploads.get(upload_id)
+            if upload is None:
+                return None
+            upload['parts'][part_number] = (etag, data)
+        return etag
+
+    def complete_upload(self, upload_id, parts):
+        """Join the listed parts into the object; returns (record, error code)"""
+        with self.lock:
+            upload = self.uploads.get(upload_id)
+        if upload is None:
+            return None, 'NoSuchUpload'
+
+        chunks = []
+        for part_number, etag in parts:
+            stored = upload['parts'].get(part_number)
+            if stored is None or stored[0].strip('"') != etag.strip('"'):
+                return None, 'InvalidPart'
+            chunks.append(stored[1])
+
+        record = self.put(upload['bucket'], upload['key'], b''.join(chunks), upload['content_type'])
+        with self.lock:
+            self.uploads.pop(upload_id, None)
+        return record, None
+
+    def abort_upload(self, upload_id):
+        with self.lock:
+            self.uploads.pop(upload_id, None)
+
+
+class LocalS3RequestHandler(BaseHTTPRequestHandler):
+    """Path-style S3 REST requests against an ObjectStore"""
+
+    protocol_version = 'HTTP/1.1'
+    store = None
+
+    def do_OPTIONS(self):
+        self._send(200)
+
+    def do_PUT(self):
+        bucket, key, query = self._parse()
+        if self._expired(query):
+            return
+        data = self._read_body()
+        if not key:
+            self._send(200)
+        elif 'uploadId' in query:
+            etag = self.store.put_part(query['uploadId'], int(query.get('partNumber', 0)), data)
+            if etag is None:
+                self._error(404, 'NoSuchUpload')
+            else:
+                self._send(200, headers={'ETag': etag})
+        else:
+            record = self.store.put(bucket, key, data, self.headers.get('Content-Type'))
+            self._send(200, headers={'ETag': record['etag']})
+
+    def do_POST(self):
+        bucket, key, query = self._parse()
+        if self._expired(query):
+            return
+        body = self._read_body()
+        if 'uploads' in query:
+            upload_id = self.store.create_upload(bucket, key, self.headers.get('Content-Type'))
+            self._send_xml('InitiateMultipartUploadResult', {'Bucket': bucket, 'Key': key, 'UploadId': upload_id})
+        elif 'uploadId' in query:
+            parts = [(int(part.findtext('{*}PartNumber')), part.findtext('{*}ETag') or '')
+                     for part in ElementTree.fromstring(body).iterfind('{*}Part')]
+            record, error = self.store.complete_upload(query['uploadId'], parts)
+            if error:
+                self._error(400 if error == 'InvalidPart' else 404, error)
+            else:
+                self._send_xml('CompleteMultipartUploadResult',
+                               {'Bucket': bucket, 'Key': key, 'ETag': record['etag']})
+        else:
+            self._error(400, 'InvalidRequest')
+
+    def do_GET(self):
+        self._send_object(include_body=True)
+
+    def do_HEAD(self):
+        self._send_object(include_body=False)
+
+    def do_DELETE(self):
+        bucket, key, query = self._parse()
+        if 'uploadId' in query:
+            self.store.abort_upload(query['uploadId'])
+        else:
+            self.store.delete(bucket, key)
+        self._send(204)
+
+    def _send_object(self, include_body):
+        bucket, key, query = self._parse()
+        if self._expired(query):
+            return
+        record = self.store.get(bucket, key)
+        if record is None:
+            self._error(404, 'NoSuchKey', include_body=include_body)
+            return
+        self._send(200, record['data'] if include_body else b'', headers={
+            'ETag': record['etag'],
+            'Content-Type': record['content_type'],
+            'Last-Modified': formatdate(record['modified'], usegmt=True)
+        }, content_length=len(record['data']))
+
+    def _parse(self):
+        parts = urlsplit(self.path)
+        bucket, _, key = unquote(parts.path).lstrip('/').partition('/')
+        query = {name: values[0] for name, values in parse_qs(parts.query, keep_blank_values=True).items()}
+        return bucket, key, query
+
+    def _expired(self, query):
+        """Reject presigned URLs past their X-Amz-Expires (SigV4) or Expires (SigV2)"""
+        expires_at = None
+        if 'X-Amz-Date' in query and 'X-Amz-Expires' in query:
+            signed_at = timegm(time.strptime(query['X-Amz-Date'], '%Y%m%dT%H%M%SZ'))
+            expires_at = signed_at + int(query['X-Amz-Expires'])
+        elif 'Expires' in query:
+            expires_at = int(query['Expires'])
+        if expires_at is not None and time.time() > expires_at:
+            self._read_body()
+            self._error(403, 'AccessDenied')
+            return True
+        return False
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length) if length else b''
+        # Streaming uploads with checksum trailers use aws-chunked framing
+        if 'aws-chunked' in (self.headers.get('Content-Encoding') or '') or self.headers.get('x-amz-decoded-content-length'):
+            data = decode_aws_chunked(data)
+        return data
+
+    def _send_xml(self, root_name, fields):
+        root = ElementTree.Element(root_name, xmlns=S3_XMLNS)
+        for name, value in fields.items():
+            ElementTree.SubElement(root, name).text = value
+        self._send(200, ElementTree.tostring(root, encoding='utf-8', xml_declaration=True),
+                   headers={'Content-Type': 'application/xml'})
+
+    def _error(self, status, code, include_body=True):
+        root = ElementTree.Element('Error')
+        ElementTree.SubElement(root, 'Code').text = code
+        ElementTree.SubElement(root, 'Message').text = code
+        body = ElementTree.tostring(root, encoding='utf-8', xml_declaration=True)
+        self._send(status, body if include_body else b'', headers={'Content-Type': 'application/xml'},
+                   content_length=len(body))
+
+    def _send(self, status, body=b'', headers=None, content_length=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        # Browsers PUT straight to the bucket and read ETags of multipart parts
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,HEAD')
+        self.send_header('Access-Control-Allow-Headers', '*')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
+        self.send_header('Content-Length', str(len(body) if content_length is None else content_length))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info(format % args)
+
+
+def decode_aws_chunked(data):
+    """Payload of an aws-chunked body: hex size;extensions CRLF data CRLF ... 0 CRLF trailers"""
+    chunks = []
+    position = 0
+    while True:
+        line_end = data.index(b'\r\n', position)
+        size = int(data[position:line_end].split(b';')[0], 16)
+        if size == 0:
+            return b''.join(chunks)
+        chunks.append(data[line_end + 2:line_end + 2 + size])
+        position = line_end + 2 + size + 2
+
+
+def make_server(host='127.0.0.1', port=0):
+    """An HTTP server over a fresh in-memory store"""
+    handler = type('Handler', (LocalS3RequestHandler,), {'store': ObjectStore()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_server(host='127.0.0.1', port=0):
+    """Serve from a background thread (for benchmarks and tests); returns (server, endpoint URL)"""
+    server = make_server(host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = make_server(args.host, args.port)
+    logger.info(f"Local S3 listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+OCR result cache keyed by the content hash of the uploaded image
+An optional perceptual-hash tier also catches near-duplicate re-scans of the same page
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from cache_backends import create_backend
+
+# Pillow is only needed for the perceptual tier
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+PHASH_SIZE = 16
+
+
+def perceptual_hash(image_bytes, hash_size=PHASH_SIZE):
+    """Difference hash (dHash) of an image as an int with hash_size * hash_size bits"""
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft('L', (hash_size * 8, hash_size * 8))
+    pixels = list(image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR).getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
+
+class OcrCache:
+    """Two-tier OCR cache: exact SHA-256 match, then optional perceptual near-match"""
+
+    def __init__(self, backend, ttl=None, perceptual=False, max_distance=4, index_size=1024):
+        self.backend = backend
+        self.ttl = ttl
+        self.perceptual = perceptual and Image is not None
+        self.max_distance = max_distance
+        self.index_size = index_size
+        self._phash_index = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def fingerprint(self, image_bytes):
+        """Compute the cache identity of an image once per request"""
+        fingerprint = {'sha256': hashlib.sha256(image_bytes).hexdigest(), 'phash': None}
+
+        if self.perceptual:
+            try:
+                fingerprint['phash'] = perceptual_hash(image_bytes)
+            except Exception as e:
+                logger.warning(f"Perceptual hash failed: {e}")
+        return fingerprint
+
+    def get(self, fingerprint):
+        """Return (text, tier) for a cached image, or (None, None)"""
+        try:
+            text = self.backend.get(f"ocr:{fingerprint['sha256']}")
+            if text is not None:
+                self._count('exact_hits')
+                return text, 'exact'
+
+            if fingerprint['phash'] is not None:
+                sha256 = self._find_similar(fingerprint['phash'])
+                if sha256:
+                    text = self.backend.get(f'ocr:{sha256}')
+                    if text is not None:
+                        self._count('perceptual_hits')
+                        return text, 'perceptual'
+        except Exception as e:
+            logger.error(f"OCR cache read failed: {e}")
+            self._count('errors')
+
+        self._count('misses')
+        return None, None
+
+    def set(self, fingerprint, text):
+        """Store extracted text for an image"""
+        try:
+            self.backend.set(f"ocr:{fingerprint['sha256']}", text, self.ttl)
+
+            if fingerprint['phash'] is not None:
+                phash_key = f"ocr-phash:{fingerprint['phash']:0{PHASH_SIZE * PHASH_SIZE // 4}x}"
+                self.backend.set(phash_key, fingerprint['sha256'], self.ttl)
+                with self._lock:
+                    self._phash_index[fingerprint['phash']] = fingerprint['sha256']
+                    self._phash_index.move_to_end(fingerprint['phash'])
+                    while len(self._phash_index) > self.index_size:
+                        self._phash_index.popitem(last=False)
+        except Exception as e:
+            logger.error(f"OCR cache write failed: {e}")
+            self._count('errors')
+
+    def stats(self):
+        """Return hit counters per tier together with backend statistics"""
+        with self._lock:
+            lookups = self.exact_hits + self.perceptual_hits + self.misses
+            hits = self.exact_hits + self.perceptual_hits
+            stats = {
+                'exact_hits': self.exact_hits,
+                'perceptual_hits': self.perceptual_hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'perceptual_enabled': self.perceptual
+            }
+        stats['store'] = self.backend.stats()
+        return stats
+
+    def _find_similar(self, phash):
+        """Look up an identical hash in the store, then the nearest one seen by this container"""
+        phash_key = f'ocr-phash:{phash:0{PHASH_SIZE * PHASH_SIZE // 4}x}'
+        sha256 = self.backend.get(phash_key)
+        if sha256:
+            return sha256
+
+        best_sha256, best_distance = None, self.max_distance + 1
+        with self._lock:
+            for candidate, candidate_sha256 in self._phash_index.items():
+                distance = hamming_distance(phash, candidate)
+                if distance < best_distance:
+                    best_sha256, best_distance = candidate_sha256, distance
+        return best_sha256
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+def create_ocr_cache():
+    """Create the OCR cache from environment configuration"""
+    if os.environ.get('OCR_CACHE_ENABLED', 'true').lower() != 'true':
+        return None
+
+    ttl = int(os.environ.get('OCR_CACHE_TTL_SECONDS', 7 * 24 * 60 * 60))
+    backend = create_backend(
+        os.environ.get('OCR_CACHE_BACKEND', 'memory'),
+        max_entries=int(os.environ.get('OCR_CACHE_MAX_ENTRIES', 1024)),
+        max_bytes=int(os.environ.get('OCR_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+        default_ttl=ttl,
+        namespace='ocr'
+    )
+    return OcrCache(
+        backend,
+        ttl=ttl,
+        perceptual=os.environ.get('OCR_CACHE_PERCEPTUAL', 'false').lower() == 'true',
+        max_distance=int(os.environ.get('OCR_PHASH_MAX_DISTANCE', 4))
+    )
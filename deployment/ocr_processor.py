@@ -1,17 +1,65 @@
 #!/usr/bin/env python3
 """
 Simple OCR Processor Lambda - Direct Image to Arabic Text
-No S3 dependency - just image in, text out
+Images go to Claude Vision; PDF and Word text layers are read locally, so only scanned
+pages are OCR'd
 """
 import json
-import boto3
+import os
 import base64
+import io
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import request_metrics
+from arabic_text import tidy_whitespace
+from aws_clients import get_client
+from document_text import detect_document_type, read_docx, read_pdf_pages
+from image_payloads import (
+    MAX_IMAGE_BYTES, OCR_MAX_SOURCE_BYTES, base64_start, decode_base64, decoded_size, is_canonical, join_parts,
+    validate_image_size
+)
+from ocr_cache import create_ocr_cache
+from request_metrics import propagate, record_outcome, record_size, span
+from upload_store import UPLOAD_MAX_BYTES, get_s3_client, read_upload, upload_size, uploads_enabled
+
+# Pillow is optional - without it images are sent to Claude Vision unmodified
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# OCR results cache, kept for the lifetime of the container
+ocr_cache = create_ocr_cache()
+
+# Multi-page documents are OCR'd concurrently, one Claude Vision call per page
+OCR_MAX_WORKERS = int(os.environ.get('OCR_MAX_WORKERS', 4))
+OCR_MAX_PAGES = int(os.environ.get('OCR_MAX_PAGES', 30))
+OCR_PDF_DPI = int(os.environ.get('OCR_PDF_DPI', 150))
+
+PAGE_MARKER = "--- صفحة {page} ---"
+
+# Stands in for the image data while the Claude Vision request is serialized
+IMAGE_DATA_PLACEHOLDER = '<image-data>'
+
+# Pre-processing before Claude Vision: larger images only cost upload time and tokens
+OCR_MAX_LONG_EDGE = int(os.environ.get('OCR_MAX_LONG_EDGE', 1568))
+OCR_JPEG_QUALITY = int(os.environ.get('OCR_JPEG_QUALITY', 85))
+OCR_GRAYSCALE = os.environ.get('OCR_GRAYSCALE', 'false').lower() == 'true'
+OCR_REENCODE_MIN_BYTES = int(os.environ.get('OCR_REENCODE_MIN_BYTES', 1024 * 1024))
+
+# Media types accepted by Claude Vision, keyed by file signature
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif')
+]
+
 def lambda_handler(event, context):
     """
     Simple OCR processor: Image data → Arabic text
@@ -19,6 +67,18 @@ def lambda_handler(event, context):
     Input: {
         "image_data": "base64_encoded_image_data"
     }
+    or, for multi-page documents: {
+        "pages": ["base64_page_1", "base64_page_2", ...]
+    }
+    or, for PDF and Word files (text layers are read locally, only scanned pages are OCR'd): {
+        "document_data": "base64_encoded_pdf_or_docx"
+    }
+    or: {
+        "object_key": "uploads/..."
+    }
+    or, to prime the container without doing any work: {
+        "warmup": true
+    }
     
     Output: {
         "statusCode": 200,
@@ -29,6 +89,13 @@ def lambda_handler(event, context):
     }
     """
     
+    # In-process calls join the API request's metrics instead of emitting their own line
+    with request_metrics.request('ocr', service='ocr'):
+        return process_event(event)
+
+def process_event(event):
+    """Dispatch an OCR event to the warm-up, multi-page or single-image path"""
+    
     try:
         logger.info("🔍 Starting direct OCR processing")
         
@@ -37,41 +104,130 @@ def lambda_handler(event, context):
             data = json.loads(event)
         else:
             data = event
+        
+        if data.get('warmup'):
+            warm_up()
+            return {'statusCode': 200, 'body': json.dumps({'success': True, 'warmup': True})}
+        
+        # Files uploaded straight to S3 - only their keys travel in the event
+        if data.get('object_key') or data.get('object_keys'):
+            return process_uploaded_document(data)
+        
+        # PDF or Word files (pdf_data is the older name), dispatched by file type
+        if data.get('document_data') or data.get('pdf_data'):
+            return process_encoded_document(data.get('document_data') or data['pdf_data'])
+        
+        if data.get('pages'):
+            return process_multipage_document(data)
             
         # Get image data
         image_data = data.get('image_data')
         if not image_data:
             return create_error_response(400, "مطلوب image_data")
             
+        if not isinstance(image_data, str):
+            return create_error_response(400, "فشل في تحويل الصورة: يجب أن تكون image_data نصاً")
+            
         logger.info(f"📥 Received image data (length: {len(image_data)})")
         
-        # Clean base64 data (remove data URL prefix if present)
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
-            
+        # Skip any data URL prefix and check the size from the base64 length before decoding
+        start = base64_start(image_data)
+        size_error = validate_image_size(decoded_size(image_data, start))
+        if size_error:
+            return create_error_response(400, size_error)
+        
         # Decode base64 to bytes
         try:
-            image_bytes = base64.b64decode(image_data)
+            with span('ocr_decode'):
+                image_bytes = decode_base64(image_data, start)
+            record_size('image_bytes', len(image_bytes))
             logger.info(f"✅ Decoded image: {len(image_bytes)} bytes")
         except Exception as e:
             return create_error_response(400, f"فشل في تحويل الصورة: {str(e)}")
         
-        # Validate image size
-        if len(image_bytes) < 100:
-            return create_error_response(400, "الصورة صغيرة جداً، يرجى رفع صورة أكبر")
-            
-        if len(image_bytes) > 5 * 1024 * 1024:  # 5MB limit
-            return create_error_response(400, "الصورة كبيرة جداً، الحد الأقصى 5 ميجابايت")
+        # Base64 with line breaks decodes to less than its length suggests
+        size_error = validate_image_size(len(image_bytes))
+        if size_error:
+            return create_error_response(400, size_error)
         
-        # Process with Claude Vision
-        logger.info("🤖 Processing with Claude Vision...")
-        extracted_text = process_image_with_claude(image_bytes)
-        
-        if not extracted_text:
-            return create_error_response(500, "لم يتم العثور على نص في الصورة")
-            
-        logger.info(f"✅ OCR completed successfully: {len(extracted_text)} characters")
+        # The client's base64 is reused if the image needs no changes
+        return process_document(image_bytes, source=(image_data, start))
         
+    except Exception as e:
+        logger.error(f"❌ OCR processing failed: {str(e)}")
+        return create_error_response(500, f"فشل في معالجة الصورة: {str(e)}")
+
+def warm_up():
+    """Create the Claude Vision client and open the OCR cache ahead of the first document"""
+    get_client('bedrock-runtime', 'us-west-2')
+    if ocr_cache is not None:
+        ocr_cache.backend.warm()
+    if uploads_enabled():
+        get_s3_client()
+
+def process_document(document_bytes, source=None):
+    """Dispatch decoded bytes by file type: PDF and Word text is read locally, images go to Claude Vision"""
+    
+    document_type = detect_document_type(document_bytes)
+    record_outcome('ocr_document_type', document_type or 'image')
+    if document_type == 'pdf':
+        return process_pdf(document_bytes)
+    if document_type == 'docx':
+        return process_docx(document_bytes)
+    return ocr_single_image(document_bytes, source)
+
+def process_encoded_document(encoded):
+    """Decode a base64 PDF or Word file (or image) and extract its text"""
+    
+    try:
+        with span('ocr_decode'):
+            document_bytes = decode_base64_data(encoded)
+    except ValueError as e:
+        return create_error_response(400, str(e))
+    record_size('document_bytes', len(document_bytes))
+    
+    if len(document_bytes) > OCR_MAX_SOURCE_BYTES:
+        return create_error_response(400, f"حجم الملف كبير جداً، الحد الأقصى {OCR_MAX_SOURCE_BYTES // (1024 * 1024)} ميجابايت")
+    return process_document(document_bytes)
+
+def process_pdf(pdf_bytes):
+    """Read each PDF page's text layer and OCR only the pages without one"""
+    
+    try:
+        with span('ocr_pdf_split'):
+            pages = read_pdf_pages(pdf_bytes, OCR_MAX_PAGES, OCR_PDF_DPI)
+    except ValueError as e:
+        return create_error_response(400, str(e))
+    
+    scanned = [page for page in pages if 'image' in page]
+    logger.info(f"📄 PDF with {len(pages)} pages: {len(pages) - len(scanned)} read from the text layer, "
+                f"{len(scanned)} sent to Claude Vision")
+    
+    page_results = [
+        {'page': page['page'], 'success': True, 'text': page['text'], 'cache_tier': None, 'source': 'text_layer'}
+        for page in pages if 'text' in page
+    ]
+    if scanned:
+        page_images = [page['image'] for page in scanned]
+        size_error = page_size_error(page_images, [page['page'] for page in scanned])
+        if size_error:
+            return size_error
+        record_size('image_bytes', sum(len(image_bytes) for image_bytes in page_images))
+        page_results += ocr_pages(page_images, page_numbers=[page['page'] for page in scanned])
+    
+    return multipage_response(sorted(page_results, key=lambda result: result['page']), 'pdf')
+
+def process_docx(docx_bytes):
+    """Read a Word document's text; scans pasted into it as pictures are OCR'd instead"""
+    
+    try:
+        with span('ocr_docx_extract'):
+            extracted_text, images = read_docx(docx_bytes, OCR_MAX_PAGES)
+    except ValueError as e:
+        return create_error_response(400, str(e))
+    
+    if extracted_text:
+        logger.info(f"📄 Word document read locally: {len(extracted_text)} characters")
         return {
             'statusCode': 200,
             'headers': {
@@ -82,20 +238,342 @@ def lambda_handler(event, context):
                 'success': True,
                 'extracted_text': extracted_text,
                 'character_count': len(extracted_text),
-                'processing_method': 'direct_claude_vision'
+                'document_type': 'docx',
+                'processing_method': 'text_layer',
+                'cache_hit': False,
+                'cache_tier': None
             }, ensure_ascii=False)
         }
+    
+    if not images:
+        return create_error_response(400, "لم يتم العثور على نص في ملف Word")
+    logger.info(f"📄 Word document without text: OCR'ing {len(images)} embedded images")
+    return ocr_page_images(images, max_bytes=OCR_MAX_SOURCE_BYTES, document_type='docx')
+
+def ocr_single_image(image_bytes, source=None):
+    """OCR one image with Claude Vision and build the single-image response"""
+    
+    logger.info("🤖 Processing with Claude Vision...")
+    try:
+        extracted_text, cache_tier = extract_text_cached(image_bytes, source=source)
+    except ValueError as e:
+        return create_error_response(400, str(e))
+    
+    if not extracted_text:
+        return create_error_response(500, "لم يتم العثور على نص في الصورة")
         
+    logger.info(f"✅ OCR completed successfully: {len(extracted_text)} characters")
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({
+            'success': True,
+            'extracted_text': extracted_text,
+            'character_count': len(extracted_text),
+            'processing_method': 'direct_claude_vision',
+            'cache_hit': cache_tier is not None,
+            'cache_tier': cache_tier
+        }, ensure_ascii=False)
+    }
+
+def process_uploaded_document(data):
+    """OCR files uploaded to S3: one image, one PDF, or a list of page images"""
+    
+    keys = data.get('object_keys') or [data.get('object_key')]
+    if not isinstance(keys, list):
+        return create_error_response(400, "يجب أن تكون object_keys قائمة من مفاتيح الملفات")
+    if len(keys) > OCR_MAX_PAGES:
+        return create_error_response(400, f"عدد الصفحات كبير جداً، الحد الأقصى {OCR_MAX_PAGES} صفحة")
+    
+    try:
+        with span('ocr_download'):
+            # Every size is checked before any body is read: each file against the OCR
+            # limit, and all of them together against the upload limit
+            sizes = [upload_size(key, max_bytes=OCR_MAX_SOURCE_BYTES) for key in keys]
+            if sum(sizes) > UPLOAD_MAX_BYTES:
+                return create_error_response(
+                    400, f"حجم الملفات كبير جداً، الحد الأقصى {UPLOAD_MAX_BYTES // (1024 * 1024)} ميجابايت"
+                )
+            documents = [read_upload(key, max_bytes=OCR_MAX_SOURCE_BYTES) for key in keys]
+    except ValueError as e:
+        return create_error_response(400, str(e))
+    record_size('upload_bytes', sum(len(document) for document in documents))
+    logger.info(f"📥 Read {len(documents)} uploaded files ({sum(len(document) for document in documents)} bytes)")
+    
+    if data.get('object_keys'):
+        return ocr_page_images(documents, max_bytes=OCR_MAX_SOURCE_BYTES)
+    
+    if detect_document_type(documents[0]) is None:
+        size_error = validate_image_size(len(documents[0]), OCR_MAX_SOURCE_BYTES)
+        if size_error:
+            return create_error_response(400, size_error)
+    return process_document(documents[0])
+
+def process_multipage_document(data):
+    """OCR a list of page images and reassemble the text in page order"""
+    
+    pages = data['pages']
+    if not isinstance(pages, list):
+        return create_error_response(400, "يجب أن تكون pages قائمة من الصور")
+    if len(pages) > OCR_MAX_PAGES:
+        return create_error_response(400, f"عدد الصفحات كبير جداً، الحد الأقصى {OCR_MAX_PAGES} صفحة")
+    
+    # Every page's size is checked from its base64 length before any page is decoded
+    for page_number, page in enumerate(pages, start=1):
+        size_error = isinstance(page, str) and page and validate_image_size(decoded_size(page, base64_start(page)))
+        if size_error:
+            return create_error_response(400, f"صفحة {page_number}: {size_error}")
+    
+    try:
+        with span('ocr_decode'):
+            page_images = [decode_base64_data(page) for page in pages]
+    except ValueError as e:
+        return create_error_response(400, str(e))
+    sources = [(page, base64_start(page)) for page in pages]
+    
+    record_size('image_bytes', sum(len(image_bytes) for image_bytes in page_images))
+    return ocr_page_images(page_images, sources)
+
+def ocr_page_images(page_images, sources=None, max_bytes=MAX_IMAGE_BYTES, document_type=None):
+    """OCR page images and build the multi-page response, text reassembled in page order"""
+    
+    size_error = page_size_error(page_images, max_bytes=max_bytes)
+    if size_error:
+        return size_error
+    
+    logger.info(f"🤖 Processing {len(page_images)} pages with Claude Vision...")
+    return multipage_response(ocr_pages(page_images, sources), document_type)
+
+def page_size_error(page_images, page_numbers=None, max_bytes=MAX_IMAGE_BYTES):
+    """Error response for the first page image outside the size limits, if any"""
+    
+    for page_number, image_bytes in zip(page_numbers or range(1, len(page_images) + 1), page_images):
+        size_error = validate_image_size(len(image_bytes), max_bytes)
+        if size_error:
+            return create_error_response(400, f"صفحة {page_number}: {size_error}")
+    return None
+
+def multipage_response(page_results, document_type=None):
+    """Multi-page response, text reassembled in page order from the text layer or Claude Vision"""
+    
+    extracted_text = assemble_pages(page_results)
+    if not extracted_text:
+        return create_error_response(500, "لم يتم العثور على نص في الصور")
+    
+    failed_pages = [result['page'] for result in page_results if not result['success']]
+    cache_hits = sum(1 for result in page_results if result['cache_tier'])
+    text_layer_pages = sum(1 for result in page_results if result['source'] == 'text_layer')
+    for result in page_results:
+        record_outcome('ocr_page_source', result['source'])
+    logger.info(f"✅ Multi-page OCR completed: {len(page_results)} pages ({text_layer_pages} from the text layer), "
+                f"{len(extracted_text)} characters")
+    
+    if text_layer_pages == len(page_results):
+        processing_method = 'text_layer'
+    elif text_layer_pages:
+        processing_method = 'text_layer_and_claude_vision'
+    else:
+        processing_method = 'direct_claude_vision'
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({
+            'success': True,
+            'extracted_text': extracted_text,
+            'character_count': len(extracted_text),
+            'page_count': len(page_results),
+            'failed_pages': failed_pages,
+            'text_layer_pages': text_layer_pages,
+            'cache_hit': cache_hits == len(page_results),
+            'cache_hits': cache_hits,
+            'pages': [
+                {
+                    'page': result['page'],
+                    'success': result['success'],
+                    'character_count': len(result['text']),
+                    'source': result['source'],
+                    'cache_hit': result['cache_tier'] is not None,
+                    **({'error': result['error']} if 'error' in result else {})
+                }
+                for result in page_results
+            ],
+            **({'document_type': document_type} if document_type else {}),
+            'processing_method': processing_method
+        }, ensure_ascii=False)
+    }
+
+def decode_base64_data(encoded):
+    """Decode base64 image or document data, dropping any data URL prefix"""
+    
+    if not isinstance(encoded, str) or not encoded:
+        raise ValueError("بيانات الصفحة فارغة أو غير صحيحة")
+    
+    try:
+        return decode_base64(encoded, base64_start(encoded))
     except Exception as e:
-        logger.error(f"❌ OCR processing failed: {str(e)}")
-        return create_error_response(500, f"فشل في معالجة الصورة: {str(e)}")
+        raise ValueError(f"فشل في تحويل الصورة: {str(e)}")
+
+def ocr_pages(page_images, sources=None, max_workers=OCR_MAX_WORKERS, page_numbers=None):
+    """OCR page images concurrently with a bounded worker pool, returning results in page order
+    
+    sources optionally holds each page's (base64 text, offset) as sent by the client, and
+    page_numbers the pages' places in their document when only some of its pages are OCR'd.
+    """
+    
+    # One client shared by all workers, its connection pool sized for concurrent pages
+    bedrock_client = get_client('bedrock-runtime', 'us-west-2')
+    sources = sources or [None] * len(page_images)
+    
+    def ocr_page(page_number, image_bytes, source):
+        try:
+            text, cache_tier = extract_text_cached(image_bytes, bedrock_client, source)
+            return {'page': page_number, 'success': bool(text), 'text': text or '', 'cache_tier': cache_tier,
+                    'source': 'vision'}
+        except Exception as e:
+            logger.error(f"❌ OCR failed for page {page_number}: {str(e)}")
+            return {'page': page_number, 'success': False, 'text': '', 'cache_tier': None, 'source': 'vision',
+                    'error': str(e)}
+    
+    workers = max(1, min(max_workers, len(page_images)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(propagate(ocr_page), page_numbers or range(1, len(page_images) + 1),
+                                 page_images, sources))
 
-def process_image_with_claude(image_bytes):
-    """Process image directly with Claude Vision model"""
+def assemble_pages(page_results):
+    """Join per-page text in page order with page markers"""
+    
+    sections = [
+        f"{PAGE_MARKER.format(page=result['page'])}\n{result['text']}"
+        for result in page_results
+        if result['text']
+    ]
+    return '\n\n'.join(sections)
+
+def extract_text_cached(image_bytes, bedrock_client=None, source=None):
+    """OCR an image through the cache, returning (text, cache_tier) - tier is None on a miss"""
+    
+    if ocr_cache is None:
+        return process_image_with_claude(image_bytes, bedrock_client, source), None
+    
+    with span('ocr_cache_lookup'):
+        fingerprint = ocr_cache.fingerprint(image_bytes)
+        text, cache_tier = ocr_cache.get(fingerprint)
+    record_outcome('ocr_cache', cache_tier or 'miss')
+    if text is not None:
+        logger.info(f"♻️ OCR cache hit ({cache_tier}): {fingerprint['sha256'][:12]}")
+        return text, cache_tier
+    
+    text = process_image_with_claude(image_bytes, bedrock_client, source)
+    if text:
+        ocr_cache.set(fingerprint, text)
+    return text, None
+
+def sniff_media_type(image_bytes):
+    """Detect the real image media type from its file signature"""
+    
+    for signature, media_type in IMAGE_SIGNATURES:
+        if image_bytes.startswith(signature):
+            return media_type
+    
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'image/webp'
+    
+    return None
+
+def preprocess_image(image_bytes, max_long_edge=OCR_MAX_LONG_EDGE, grayscale=OCR_GRAYSCALE,
+                     quality=OCR_JPEG_QUALITY):
+    """Downscale, optionally grayscale and re-encode an image for Claude Vision
+
+    Returns (image_bytes, media_type). Images that are already small enough and
+    in a supported format are passed through untouched.
+    """
+    
+    media_type = sniff_media_type(image_bytes)
+    
+    if Image is None:
+        if media_type is None:
+            logger.warning("⚠️ Unknown image format and Pillow unavailable, sending as image/jpeg")
+        return image_bytes, media_type or 'image/jpeg'
+    
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        width, height = image.size
+        
+        needs_resize = max(width, height) > max_long_edge
+        needs_convert = media_type is None or (grayscale and image.mode != 'L')
+        needs_reencode = len(image_bytes) > OCR_REENCODE_MIN_BYTES
+        
+        # Phone photos store their orientation in EXIF rather than in the pixels
+        needs_rotate = image.getexif().get(0x0112, 1) != 1
+        
+        if not (needs_resize or needs_convert or needs_rotate or needs_reencode):
+            return image_bytes, media_type
+        
+        # Let the JPEG decoder scale down while decoding - much faster for phone photos
+        if image.format == 'JPEG' and needs_resize:
+            ratio = max_long_edge / max(width, height)
+            image.draft('RGB', (int(width * ratio), int(height * ratio)))
+        
+        image = ImageOps.exif_transpose(image)
+        
+        if max(image.size) > max_long_edge:
+            image.thumbnail((max_long_edge, max_long_edge), Image.LANCZOS)
+        
+        image = image.convert('L') if grayscale else image.convert('RGB')
+        
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=quality, optimize=True)
+        processed = output.getvalue()
+        
+        # Re-encoding a small supported image can make it bigger - keep the original then,
+        # unless it had to be resized or rotated upright
+        if len(processed) >= len(image_bytes) and media_type and not needs_resize and not needs_rotate:
+            return image_bytes, media_type
+        
+        saved = len(image_bytes) - len(processed)
+        logger.info(
+            f"🗜️ Pre-processed image {media_type or 'unknown'} → image/jpeg {image.size[0]}x{image.size[1]}: "
+            f"{len(image_bytes)} → {len(processed)} bytes (saved {saved} bytes, {saved * 100 // max(len(image_bytes), 1)}%)"
+        )
+        return processed, 'image/jpeg'
+        
+    except Exception as e:
+        logger.warning(f"⚠️ Image pre-processing failed, sending original: {str(e)}")
+        return image_bytes, media_type or 'image/jpeg'
+
+def process_image_with_claude(image_bytes, bedrock_client=None, source=None):
+    """Process image directly with Claude Vision model
+    
+    source is the image's (base64 text, offset) as received; when pre-processing leaves
+    the image unchanged that text goes into the request as-is instead of being re-encoded.
+    """
     
     try:
-        # Initialize Bedrock client
-        bedrock_client = boto3.client('bedrock-runtime', region_name='us-west-2')
+        # Shared Bedrock client, created once per container
+        if bedrock_client is None:
+            bedrock_client = get_client('bedrock-runtime', 'us-west-2')
+        
+        original = image_bytes
+        with span('ocr_preprocess'):
+            image_bytes, media_type = preprocess_image(image_bytes)
+        record_size('vision_image_bytes', len(image_bytes))
+        
+        # Uploads can exceed Claude Vision's limit when pre-processing could not shrink them
+        if len(image_bytes) > MAX_IMAGE_BYTES:
+            raise ValueError(validate_image_size(len(image_bytes)))
+        
+        if image_bytes is original and source is not None and is_canonical(source[0], source[1], len(image_bytes)):
+            image_data = source
+        else:
+            image_data = base64.b64encode(image_bytes)
         
         # Prepare the request for Claude Vision
         request_body = {
@@ -109,8 +587,8 @@ def process_image_with_claude(image_bytes):
                             "type": "image",
                             "source": {
                                 "type": "base64",
-                                "media_type": "image/jpeg",
-                                "data": base64.b64encode(image_bytes).decode('utf-8')
+                                "media_type": media_type,
+                                "data": IMAGE_DATA_PLACEHOLDER
                             }
                         },
                         {
@@ -131,14 +609,19 @@ def process_image_with_claude(image_bytes):
             ]
         }
         
-        # Call Claude Vision
-        response = bedrock_client.invoke_model(
-            modelId='anthropic.claude-3-sonnet-20240229-v1:0',
-            body=json.dumps(request_body)
-        )
+        # The base64 is spliced into the serialized request rather than going through json.dumps
+        prefix, suffix = json.dumps(request_body).split(IMAGE_DATA_PLACEHOLDER)
+        body = join_parts([prefix.encode('utf-8'), image_data, suffix.encode('utf-8')])
         
-        # Parse response
-        response_body = json.loads(response['body'].read())
+        # Call Claude Vision
+        with span('ocr_vision'):
+            response = bedrock_client.invoke_model(
+                modelId='anthropic.claude-3-sonnet-20240229-v1:0',
+                body=body
+            )
+            
+            # Parse response
+            response_body = json.loads(response['body'].read())
         
         if 'content' in response_body and response_body['content']:
             extracted_text = response_body['content'][0]['text'].strip()
@@ -174,12 +657,8 @@ def clean_extracted_text(text):
         if cleaned.startswith(prefix):
             cleaned = cleaned[len(prefix):].strip()
     
-    # Remove excessive whitespace
-    import re
-    cleaned = re.sub(r'\n\s*\n', '\n\n', cleaned)  # Multiple empty lines to double
-    cleaned = re.sub(r' +', ' ', cleaned)  # Multiple spaces to single
-    
-    return cleaned.strip()
+    # Remove excessive whitespace: blank lines to one empty line, repeated spaces to one
+    return tidy_whitespace(cleaned)
 
 def create_error_response(status_code, error_message):
     """Create standardized error response"""
@@ -0,0 +1,229 @@
+"""
+Per-request stage timing
+Spans time the stages of a request (body decoding, OCR, agent calls, serialization).
+Each request is written as one CloudWatch Embedded Metric Format (EMF) log line, which
+CloudWatch turns into metrics without any API calls, and recent values are kept in
+rolling histograms per container for the GET /metrics route
+"""
+
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'EgyptianLegalContractAPI')
+METRICS_EMF_ENABLED = os.environ.get('METRICS_EMF_ENABLED', 'true').lower() == 'true'
+
+# Samples kept per histogram; older ones roll off
+METRICS_WINDOW = int(os.environ.get('METRICS_WINDOW', 1024))
+
+DURATION_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+_lock = threading.Lock()
+_durations = {}
+_sizes = {}
+_outcomes = {}
+_requests = {}
+
+
+class RollingHistogram:
+    """The last `window` values of one measurement, summarized on demand"""
+
+    def __init__(self, window=METRICS_WINDOW, buckets=None):
+        self.samples = deque(maxlen=window)
+        self.buckets = buckets
+        self.count = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+
+    def summary(self):
+        values = sorted(self.samples)
+        if not values:
+            return {'count': self.count, 'window': 0}
+
+        percentile = lambda fraction: round(values[min(len(values) - 1, int(fraction * len(values)))], 2)
+        summary = {
+            'count': self.count,
+            'window': len(values),
+            'mean': round(sum(values) / len(values), 2),
+            'p50': percentile(0.5),
+            'p90': percentile(0.9),
+            'p99': percentile(0.99),
+            'max': round(values[-1], 2)
+        }
+        if self.buckets:
+            # Cumulative counts, like a Prometheus histogram
+            summary['buckets'] = {f'le_{bound}': sum(1 for value in values if value <= bound) for bound in self.buckets}
+        return summary
+
+
+class RequestMetrics:
+    """Stage durations, payload sizes and cache outcomes collected for one request"""
+
+    def __init__(self, route, service):
+        self.route = route
+        self.service = service
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.sizes = {}
+        self.outcomes = {}
+        self.properties = {}
+        self._lock = threading.Lock()
+
+    def add_duration(self, stage, milliseconds):
+        # Stages that run more than once (pages, sections) are summed
+        with self._lock:
+            self.durations[stage] = self.durations.get(stage, 0.0) + milliseconds
+
+    def add_size(self, name, size):
+        with self._lock:
+            self.sizes[name] = self.sizes.get(name, 0) + size
+
+    def set_outcome(self, name, value):
+        with self._lock:
+            self.outcomes[name] = value
+
+    def set_property(self, name, value):
+        with self._lock:
+            self.properties[name] = value
+
+    def to_emf(self):
+        """The request as one EMF document"""
+        metrics = [{'Name': stage, 'Unit': 'Milliseconds'} for stage in self.durations]
+        metrics += [{'Name': name, 'Unit': 'Bytes'} for name in self.sizes]
+        document = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['Service', 'Route']],
+                    'Metrics': metrics
+                }]
+            },
+            'Service': self.service,
+            'Route': self.route
+        }
+        document.update({stage: round(value, 2) for stage, value in self.durations.items()})
+        document.update(self.sizes)
+        document.update(self.outcomes)
+        document.update(self.properties)
+        return document
+
+
+def _histogram(registry, name, buckets=None):
+    histogram = registry.get(name)
+    if histogram is None:
+        histogram = registry[name] = RollingHistogram(buckets=buckets)
+    return histogram
+
+
+def current():
+    """The request being measured in this context, or None"""
+    return _current.get()
+
+
+@contextmanager
+def request(route, service='api'):
+    """Measure a request and emit it when it finishes
+
+    Nested calls (the OCR pipeline running in-process inside an API request) join the
+    outer request instead of emitting their own line.
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        yield metrics
+        return
+
+    metrics = RequestMetrics(route, service)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+        metrics.add_duration('total', (time.perf_counter() - metrics.started) * 1000)
+        with _lock:
+            _histogram(_requests, f'{service} {route}', DURATION_BUCKETS_MS).add(metrics.durations['total'])
+        if METRICS_EMF_ENABLED:
+            emit(metrics)
+
+
+@contextmanager
+def span(stage):
+    """Time a stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        milliseconds = (time.perf_counter() - started) * 1000
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add_duration(stage, milliseconds)
+        with _lock:
+            _histogram(_durations, stage, DURATION_BUCKETS_MS).add(milliseconds)
+
+
+def record_size(name, size):
+    """Record a payload size in bytes"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_size(name, size)
+    with _lock:
+        _histogram(_sizes, name).add(size)
+
+
+def record_outcome(name, value):
+    """Record a categorical outcome, such as a cache hit or miss"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.set_outcome(name, value)
+    with _lock:
+        counts = _outcomes.setdefault(name, {})
+        counts[value] = counts.get(value, 0) + 1
+
+
+def set_property(name, value):
+    """Attach a searchable field to the current request's log line"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.set_property(name, value)
+
+
+def propagate(fn):
+    """Wrap fn so calls from worker threads record into the calling request"""
+    context = contextvars.copy_context()
+    # Each call runs in its own copy; a context cannot be entered by two threads at once
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def emit(metrics):
+    """Write the request's EMF line to stdout, where Lambda forwards it to CloudWatch Logs"""
+    sys.stdout.write(json.dumps(metrics.to_emf(), ensure_ascii=False) + '\n')
+    sys.stdout.flush()
+
+
+def snapshot():
+    """Rolling histograms of request and stage durations, sizes and outcome counts"""
+    with _lock:
+        return {
+            'window': METRICS_WINDOW,
+            'requests': {name: histogram.summary() for name, histogram in _requests.items()},
+            'stages': {name: histogram.summary() for name, histogram in _durations.items()},
+            'sizes': {name: histogram.summary() for name, histogram in _sizes.items()},
+            'outcomes': {name: dict(counts) for name, counts in _outcomes.items()}
+        }
+
+
+def reset():
+    """Drop all histograms (for tests and benchmarks)"""
+    with _lock:
+        _durations.clear()
+        _sizes.clear()
+        _outcomes.clear()
+        _requests.clear()
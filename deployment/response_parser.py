@@ -0,0 +1,253 @@
+"""
+Single-pass parsing of agent responses
+Unwraps the AgentCore envelope once, recognizes the explanation and assessment schemas
+and keeps the structured object, so it can be rendered as Arabic text or returned as JSON
+"""
+
+import json
+
+from agent_streaming import JSON_PUNCTUATION, SUMMARY_PREFIXES
+from arabic_text import collapse_whitespace
+
+EMPTY_ANSWER = "لم أتمكن من الحصول على إجابة"
+DEFAULT_ANALYSIS_RESULT = "تم تحليل العقد بنجاح"
+
+RESPONSE_TEXT = 'text'
+RESPONSE_EXPLANATION = 'explanation'
+RESPONSE_ASSESSMENT = 'assessment'
+
+EXPLANATION_KEYS = ('contract_summary', 'contract_type', 'legal_classification', 'contract_duration', 'additional_notes')
+ASSESSMENT_KEYS = (
+    'risk_assessment', 'identified_risks', 'contract_weaknesses', 'recommendations', 'overall_fairness',
+    'legal_compliance', 'knowledge_base_insights', 'knowledge_base_sources'
+)
+
+CODE_FENCE = '```'
+
+
+def load_json_object(text):
+    """Decode text holding a JSON object, or return None without raising"""
+    stripped = text.strip()
+    # Models sometimes wrap the object in a markdown code fence
+    if stripped.startswith(CODE_FENCE):
+        stripped = stripped[len(CODE_FENCE):]
+        if stripped.startswith('json'):
+            stripped = stripped[4:]
+        if stripped.rstrip().endswith(CODE_FENCE):
+            stripped = stripped.rstrip()[:-len(CODE_FENCE)]
+        stripped = stripped.strip()
+
+    if not stripped.startswith('{'):
+        return None
+    try:
+        value = json.loads(stripped)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def envelope_text(envelope):
+    """Agent text inside {"role": "assistant", "content": [{"text": ...}]} or {"text": ...}"""
+    content = envelope.get('content')
+    if isinstance(content, list) and content and isinstance(content[0], dict):
+        text = content[0].get('text')
+        return text if isinstance(text, str) else None
+
+    text = envelope.get('text')
+    if isinstance(text, str) and response_kind(envelope) == RESPONSE_TEXT:
+        return text
+    return None
+
+
+def response_kind(data):
+    """Schema of a decoded agent answer: assessment, explanation or plain text"""
+    if not isinstance(data, dict):
+        return RESPONSE_TEXT
+    if any(key in data for key in ASSESSMENT_KEYS):
+        return RESPONSE_ASSESSMENT
+    if any(key in data for key in EXPLANATION_KEYS):
+        return RESPONSE_EXPLANATION
+    return RESPONSE_TEXT
+
+
+def parse_agent_response(response_text):
+    """Parse an agent response once
+
+    Returns a dict with the schema "kind" and its "data": the decoded object for
+    explanation and assessment answers, cleaned Arabic text for everything else.
+    """
+    if not response_text or not response_text.strip():
+        return {'kind': RESPONSE_TEXT, 'data': EMPTY_ANSWER}
+
+    body = response_text
+    data = load_json_object(body)
+    if data is not None:
+        inner = envelope_text(data)
+        if inner is not None:
+            body = inner
+            data = load_json_object(inner)
+
+    kind = response_kind(data)
+    if kind != RESPONSE_TEXT:
+        # Follow-up answers come back as a lone summary field
+        if kind == RESPONSE_EXPLANATION and len(data) == 1 and isinstance(data.get('contract_summary'), str):
+            return {'kind': RESPONSE_TEXT, 'data': clean_text_response(data['contract_summary'])}
+        return {'kind': kind, 'data': data}
+
+    return {'kind': RESPONSE_TEXT, 'data': clean_text_response(body)}
+
+
+def render_response(parsed):
+    """Arabic text for a parsed response"""
+    if parsed['kind'] == RESPONSE_TEXT:
+        return parsed['data']
+    return format_contract_json_to_arabic(parsed['data'])
+
+
+def extract_clean_arabic_text(response_text):
+    """Extract clean Arabic text from complex JSON responses"""
+    return render_response(parse_agent_response(response_text))
+
+
+def describe(item, main_key, detail_keys=()):
+    """One bullet for a list entry that is either a string or a dict of labelled fields"""
+    if not isinstance(item, dict):
+        return [f"  • {item}"]
+
+    lines = [f"  • {item.get(main_key, '')}".rstrip()]
+    for key, label in detail_keys:
+        if item.get(key):
+            lines.append(f"    {label}: {item[key]}")
+    return lines
+
+
+def format_contract_json_to_arabic(data):
+    """Format contract JSON data into clean Arabic text"""
+    result = []
+
+    # For follow-up questions, don't repeat contract summary - just return the main content
+    if len(data) == 1 and 'contract_summary' in data:
+        return data['contract_summary']
+
+    # Contract summary (only for full analysis)
+    if 'contract_summary' in data and len(data) > 1:
+        result.append(f"📋 ملخص العقد: {data['contract_summary']}")
+
+    # Contract type
+    if 'contract_type' in data:
+        contract_type = data['contract_type']
+        if isinstance(contract_type, dict):
+            if 'نوع_رئيسي' in contract_type:
+                result.append(f"📝 نوع العقد: {contract_type['نوع_رئيسي']}")
+            if 'تصنيف_فرعي' in contract_type:
+                result.append(f"🏷️ التصنيف: {contract_type['تصنيف_فرعي']}")
+
+            # Characteristics
+            if 'خصائص' in contract_type and isinstance(contract_type['خصائص'], list):
+                result.append("\n✨ خصائص العقد:")
+                for feature in contract_type['خصائص']:
+                    result.append(f"  • {feature}")
+
+    # Legal classification
+    if 'legal_classification' in data:
+        legal = data['legal_classification']
+        if isinstance(legal, dict):
+            result.append("\n⚖️ التصنيف القانوني:")
+            if 'القانون_الحاكم' in legal:
+                result.append(f"  📚 القانون الحاكم: {legal['القانون_الحاكم']}")
+            if 'طبيعة_العقد' in legal:
+                result.append(f"  🏛️ طبيعة العقد: {legal['طبيعة_العقد']}")
+            if 'درجة_الإلزام' in legal:
+                result.append(f"  ⚡ درجة الإلزام: {legal['درجة_الإلزام']}")
+
+    # Contract duration
+    if 'contract_duration' in data:
+        duration = data['contract_duration']
+        if isinstance(duration, dict):
+            result.append("\n⏰ مدة العقد:")
+            if 'نوع_المدة' in duration:
+                result.append(f"  📅 نوع المدة: {duration['نوع_المدة']}")
+            if 'فترة_الاختبار' in duration:
+                result.append(f"  🧪 فترة الاختبار: {duration['فترة_الاختبار']}")
+            if 'تاريخ_البدء' in duration:
+                result.append(f"  🚀 تاريخ البدء: {duration['تاريخ_البدء']}")
+
+    # Additional notes
+    if 'additional_notes' in data:
+        notes = data['additional_notes']
+        if isinstance(notes, dict) and 'ملاحظات_قانونية' in notes:
+            if isinstance(notes['ملاحظات_قانونية'], list):
+                result.append("\n📝 ملاحظات قانونية:")
+                for note in notes['ملاحظات_قانونية']:
+                    result.append(f"  • {note}")
+
+    result.extend(format_assessment_to_arabic(data))
+
+    return '\n'.join(result).strip() if result else DEFAULT_ANALYSIS_RESULT
+
+
+def format_assessment_to_arabic(data):
+    """Lines for the assessment agent's risk and recommendation fields"""
+    result = []
+
+    if data.get('risk_assessment'):
+        result.append(f"\n⚠️ تقييم المخاطر: {data['risk_assessment']}")
+
+    if isinstance(data.get('identified_risks'), list) and data['identified_risks']:
+        result.append("\n🚨 المخاطر المحددة:")
+        for risk in data['identified_risks']:
+            result.extend(describe(risk, 'risk', (
+                ('severity', 'درجة الخطورة'), ('impact', 'التأثير'), ('kb_reference', 'المرجع')
+            )))
+
+    if isinstance(data.get('contract_weaknesses'), list) and data['contract_weaknesses']:
+        result.append("\n🔍 نقاط الضعف:")
+        for weakness in data['contract_weaknesses']:
+            result.extend(describe(weakness, 'weakness', (('comparison_with_standard', 'مقارنة بالمعايير'),)))
+
+    if isinstance(data.get('recommendations'), list) and data['recommendations']:
+        result.append("\n✅ التوصيات:")
+        for recommendation in data['recommendations']:
+            result.extend(describe(recommendation, 'recommendation', (
+                ('priority', 'الأولوية'), ('suggested_clause', 'البند المقترح'),
+                ('justification', 'التبرير'), ('kb_source', 'المصدر')
+            )))
+
+    if data.get('overall_fairness'):
+        result.append(f"\n⚖️ عدالة العقد: {data['overall_fairness']}")
+
+    if data.get('legal_compliance'):
+        result.append(f"\n📚 التوافق مع القانون: {data['legal_compliance']}")
+
+    insights = data.get('knowledge_base_insights')
+    if isinstance(insights, dict):
+        if insights.get('comparison_summary'):
+            result.append(f"\n📊 المقارنة مع العقود المشابهة: {insights['comparison_summary']}")
+        if isinstance(insights.get('best_practices_identified'), list) and insights['best_practices_identified']:
+            result.append("\n💡 أفضل الممارسات:")
+            for practice in insights['best_practices_identified']:
+                result.append(f"  • {practice}")
+
+    if isinstance(data.get('knowledge_base_sources'), list) and data['knowledge_base_sources']:
+        result.append("\n📎 المصادر:")
+        for source in data['knowledge_base_sources']:
+            result.append(f"  • {source}")
+
+    return result
+
+
+def clean_text_response(text):
+    """Clean and format text response"""
+    if not text:
+        return EMPTY_ANSWER
+
+    # Remove extra whitespace and JSON-like punctuation
+    cleaned = JSON_PUNCTUATION.sub('', collapse_whitespace(text))
+
+    # Remove contract summary prefixes specifically
+    for prefix in SUMMARY_PREFIXES:
+        if cleaned.startswith(prefix):
+            cleaned = cleaned[len(prefix):].strip()
+            break
+
+    return cleaned
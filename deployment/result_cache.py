@@ -0,0 +1,98 @@
+"""
+Content-addressed cache for contract analysis results
+Keys are derived from the normalized contract text, analysis type and agent ARN
+"""
+
+import hashlib
+import logging
+import os
+import threading
+
+from arabic_text import normalize_text
+from cache_backends import create_backend
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(contract_text, analysis_type, agent_arn):
+    """Build a SHA-256 key for a contract analysis request"""
+    digest = hashlib.sha256()
+    # Orthographic normalization lets retyped and re-OCRed copies share a key
+    for part in (agent_arn, analysis_type, normalize_text(contract_text)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Cache front-end that namespaces keys and counts hits and misses"""
+
+    def __init__(self, backend, namespace='analysis', ttl=None, enabled=True):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key or None"""
+        if not self.enabled:
+            return None
+
+        try:
+            value = self.backend.get(f'{self.namespace}:{key}')
+        except Exception as e:
+            logger.error(f"Result cache read failed: {e}")
+            value = None
+            with self._lock:
+                self.errors += 1
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store value under key, logging rather than raising on backend errors"""
+        if not self.enabled:
+            return
+
+        try:
+            self.backend.set(f'{self.namespace}:{key}', value, self.ttl)
+        except Exception as e:
+            logger.error(f"Result cache write failed: {e}")
+            with self._lock:
+                self.errors += 1
+
+    def stats(self):
+        """Return hit/miss counters together with backend statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+        stats['store'] = self.backend.stats()
+        return stats
+
+
+def create_result_cache():
+    """Create the analysis result cache from environment configuration"""
+    ttl = int(os.environ.get('RESULT_CACHE_TTL_SECONDS', 24 * 60 * 60))
+    backend = create_backend(
+        os.environ.get('RESULT_CACHE_BACKEND', 'memory'),
+        max_entries=int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 512)),
+        max_bytes=int(os.environ.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+        default_ttl=ttl,
+        namespace='analysis'
+    )
+    enabled = os.environ.get('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+    return ResultCache(backend, namespace='analysis', ttl=ttl, enabled=enabled)
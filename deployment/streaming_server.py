@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Streaming HTTP host for the contract analysis API
+Serves lambda_handler over HTTP and forwards agent chunks as server-sent events.
+Run it locally, or in Lambda behind the AWS Lambda Web Adapter with a
+RESPONSE_STREAM function URL, so time-to-first-byte no longer waits for the
+whole agent answer.
+"""
+
+import base64
+import json
+import logging
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import lambda_function
+from http_responses import decode_request_body
+
+logger = logging.getLogger(__name__)
+
+# (whether to stream, stream) per route - the same dispatch as lambda_handler, so requests
+# it answers in one piece, such as full reports, are handed to it
+STREAM_ROUTES = {
+    '/api/analyze': (lambda_function.streams_analysis, lambda_function.stream_contract_analysis),
+    '/api/ask': (lambda_function.streams_answer, lambda_function.stream_followup_answer)
+}
+
+
+class ContractAPIRequestHandler(BaseHTTPRequestHandler):
+    """Translate HTTP requests into API Gateway proxy events"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_OPTIONS(self):
+        self._handle('OPTIONS')
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        path = self.path.split('?', 1)[0]
+
+        event = {'path': path, 'httpMethod': method, 'headers': dict(self.headers)}
+        # Compressed uploads are passed on base64-encoded, the way API Gateway delivers binary bodies
+        if raw and self.headers.get('Content-Encoding'):
+            event.update(body=base64.b64encode(raw).decode('ascii'), isBase64Encoded=True)
+        else:
+            event['body'] = raw.decode('utf-8', errors='replace') if raw else '{}'
+
+        route = STREAM_ROUTES.get(path) if method == 'POST' else None
+        if route:
+            should_stream, stream = route
+            try:
+                data = json.loads(decode_request_body(event))
+            except ValueError:
+                data = None
+            if should_stream(data):
+                self._send_stream(stream(data))
+                return
+
+        self._send_response(lambda_function.lambda_handler(event, None))
+
+    def _send_response(self, response):
+        body = response.get('body') or ''
+        payload = base64.b64decode(body) if response.get('isBase64Encoded') else body.encode('utf-8')
+        self.send_response(response['statusCode'])
+        for name, value in response.get('headers', {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, events):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        for event in events:
+            data = event.encode('utf-8')
+            self.wfile.write(f'{len(data):X}\r\n'.encode('ascii') + data + b'\r\n')
+            self.wfile.flush()
+        self.wfile.write(b'0\r\n\r\n')
+
+    def log_message(self, format, *args):
+        logger.info(format % args)
+
+
+def main():
+    """Start the streaming host on $PORT (8080 matches the Lambda Web Adapter default)"""
+    port = int(os.environ.get('PORT', 8080))
+    server = ThreadingHTTPServer(('0.0.0.0', port), ContractAPIRequestHandler)
+    logger.info(f"Streaming API listening on port {port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Direct-to-S3 uploads for contract scans
+Browsers PUT files straight to the upload bucket with presigned URLs (multipart for
+large PDFs) and send only the object key to /api/ocr, so scans skip base64 and the
+6 MB Lambda payload limit. Keys carry a random session ID and are only readable
+under UPLOAD_PREFIX
+"""
+
+import json
+import math
+import os
+import re
+import uuid
+
+from aws_clients import get_client
+
+UPLOAD_BUCKET = os.environ.get('UPLOAD_BUCKET', '')
+UPLOAD_PREFIX = os.environ.get('UPLOAD_PREFIX', 'uploads/')
+# Job requests and results too large for a job record are kept here instead
+PAYLOAD_PREFIX = os.environ.get('PAYLOAD_PREFIX', 'jobs/')
+UPLOAD_REGION = os.environ.get('AWS_REGION', 'us-west-2')
+UPLOAD_URL_TTL_SECONDS = int(os.environ.get('UPLOAD_URL_TTL_SECONDS', 900))
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 50 * 1024 * 1024))
+UPLOAD_MAX_FILES = int(os.environ.get('UPLOAD_MAX_FILES', 30))
+
+# Larger files are uploaded in parts of this size; S3 parts (but the last) must be at least 5 MB
+UPLOAD_PART_BYTES = max(5 * 1024 * 1024, int(os.environ.get('UPLOAD_PART_BYTES', 8 * 1024 * 1024)))
+
+UPLOAD_CONTENT_TYPES = {
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'application/pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+}
+
+UPLOADS_DISABLED_ERROR = 'الرفع المباشر للملفات غير مفعّل'
+
+KEY_PATTERN = re.compile(r'[0-9a-f]{32}/\d+-[A-Za-z0-9._-]+')
+
+
+def uploads_enabled():
+    return bool(UPLOAD_BUCKET)
+
+
+def get_s3_client():
+    return get_client('s3', UPLOAD_REGION)
+
+
+def safe_file_name(name):
+    """File name reduced to characters that are safe in object keys and URLs"""
+    stem = re.sub(r'[^A-Za-z0-9._-]+', '_', str(name or '')).strip('_')
+    return stem[-100:] or 'file'
+
+
+def validate_object_key(key):
+    """Raise ValueError unless key names an object handed out by create_session"""
+    if not isinstance(key, str) or not key.startswith(UPLOAD_PREFIX) or \
+            not KEY_PATTERN.fullmatch(key[len(UPLOAD_PREFIX):]):
+        raise ValueError('مفتاح الملف غير صالح')
+
+
+def create_session(files, max_file_bytes=UPLOAD_MAX_BYTES):
+    """Object keys and presigned upload URLs for a list of {name, content_type, size}
+
+    Each file may be at most max_file_bytes, and all of them together UPLOAD_MAX_BYTES.
+    Files over UPLOAD_PART_BYTES get a multipart upload with one URL per part; the
+    client then calls complete_upload with the ETag S3 returned for each part.
+    """
+    if not isinstance(files, list) or not files:
+        raise ValueError('مطلوب files')
+    if len(files) > UPLOAD_MAX_FILES:
+        raise ValueError(f'عدد الملفات كبير جداً، الحد الأقصى {UPLOAD_MAX_FILES} ملف')
+
+    for file in files:
+        if not isinstance(file, dict):
+            raise ValueError('بيانات الملف غير صحيحة')
+        if file.get('content_type') not in UPLOAD_CONTENT_TYPES:
+            raise ValueError('نوع الملف غير مدعوم. يرجى رفع صورة JPG أو PNG أو ملف PDF أو Word')
+        size = file.get('size')
+        if not isinstance(size, int) or size <= 0:
+            raise ValueError('حجم الملف غير صحيح')
+        check_size(size, min(max_file_bytes, UPLOAD_MAX_BYTES))
+    total = sum(file['size'] for file in files)
+    if total > UPLOAD_MAX_BYTES:
+        raise ValueError(f'حجم الملفات كبير جداً، الحد الأقصى {UPLOAD_MAX_BYTES // (1024 * 1024)} ميجابايت')
+
+    s3 = get_s3_client()
+    session_id = uuid.uuid4().hex
+    uploads = []
+    for index, file in enumerate(files, start=1):
+        content_type = file['content_type']
+        size = file['size']
+
+        key = f'{UPLOAD_PREFIX}{session_id}/{index}-{safe_file_name(file.get("name"))}'
+        params = {'Bucket': UPLOAD_BUCKET, 'Key': key}
+
+        if size <= UPLOAD_PART_BYTES:
+            url = s3.generate_presigned_url(
+                'put_object', Params=dict(params, ContentType=content_type), ExpiresIn=UPLOAD_URL_TTL_SECONDS
+            )
+            uploads.append({'object_key': key, 'method': 'PUT', 'url': url, 'headers': {'Content-Type': content_type}})
+            continue
+
+        upload_id = s3.create_multipart_upload(ContentType=content_type, **params)['UploadId']
+        uploads.append({
+            'object_key': key,
+            'method': 'PUT',
+            'multipart': {
+                'upload_id': upload_id,
+                'part_size': UPLOAD_PART_BYTES,
+                'parts': [
+                    {
+                        'part_number': part_number,
+                        'url': s3.generate_presigned_url(
+                            'upload_part', Params=dict(params, UploadId=upload_id, PartNumber=part_number),
+                            ExpiresIn=UPLOAD_URL_TTL_SECONDS
+                        )
+                    }
+                    for part_number in range(1, math.ceil(size / UPLOAD_PART_BYTES) + 1)
+                ]
+            }
+        })
+
+    return {'session_id': session_id, 'expires_in': UPLOAD_URL_TTL_SECONDS, 'uploads': uploads}
+
+
+def complete_upload(key, upload_id, parts):
+    """Assemble a multipart upload from its [{part_number, etag}] list"""
+    validate_object_key(key)
+    if not isinstance(upload_id, str) or not upload_id:
+        raise ValueError('مطلوب upload_id')
+    if not isinstance(parts, list) or not parts or \
+            not all(isinstance(part, dict) and part.get('part_number') and part.get('etag') for part in parts):
+        raise ValueError('مطلوب parts مع part_number و etag لكل جزء')
+
+    get_s3_client().complete_multipart_upload(
+        Bucket=UPLOAD_BUCKET,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={'Parts': sorted(
+            ({'PartNumber': int(part['part_number']), 'ETag': part['etag']} for part in parts),
+            key=lambda part: part['PartNumber']
+        )}
+    )
+    return key
+
+
+def upload_size(key, max_bytes=UPLOAD_MAX_BYTES):
+    """Size of an uploaded file, from a HEAD request; raises ValueError like read_upload"""
+    return check_size(request_upload(key, 'head_object')['ContentLength'], max_bytes)
+
+
+def read_upload(key, max_bytes=UPLOAD_MAX_BYTES):
+    """Bytes of an uploaded file; raises ValueError for bad keys, missing or oversized objects"""
+    response = request_upload(key, 'get_object')
+    # Presigned PUTs cannot cap the size, so it is checked before the body is read
+    try:
+        check_size(response['ContentLength'], max_bytes)
+    except ValueError:
+        response['Body'].close()
+        raise
+    return response['Body'].read()
+
+
+def request_upload(key, operation):
+    from botocore.exceptions import ClientError
+
+    if not uploads_enabled():
+        raise ValueError(UPLOADS_DISABLED_ERROR)
+    validate_object_key(key)
+    try:
+        return getattr(get_s3_client(), operation)(Bucket=UPLOAD_BUCKET, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', 'NotFound', '404'):
+            raise ValueError('الملف غير موجود، يرجى رفعه أولاً')
+        raise
+
+
+def check_size(size, max_bytes):
+    if size > max_bytes:
+        raise ValueError(f'حجم الملف كبير جداً، الحد الأقصى {max_bytes // (1024 * 1024)} ميجابايت')
+    return size
+
+
+def store_payload(name, payload):
+    """Keep a JSON payload in the bucket under PAYLOAD_PREFIX; returns its object key"""
+    key = f'{PAYLOAD_PREFIX}{name}'
+    get_s3_client().put_object(
+        Bucket=UPLOAD_BUCKET, Key=key, ContentType='application/json',
+        Body=json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    )
+    return key
+
+
+def load_payload(key):
+    """A payload saved by store_payload"""
+    return json.loads(get_s3_client().get_object(Bucket=UPLOAD_BUCKET, Key=key)['Body'].read())
@@ -4,18 +4,24 @@ Knowledge Base Manager for Egyptian Legal Contracts
 Creates and manages Bedrock Knowledge Base for RAG functionality
 """
 
-import boto3
 import json
 import time
 import os
+import sys
 from botocore.exceptions import ClientError
 
+# The shared client factory lives with the Lambda code, whose modules import each other by bare name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'deployment'))
+
+from aws_clients import get_client
+
 class KnowledgeBaseManager:
     def __init__(self, region='us-west-2'):
         self.region = region
-        self.bedrock_agent = boto3.client('bedrock-agent', region_name=region)
-        self.opensearch = boto3.client('opensearchserverless', region_name=region)
-        self.s3 = boto3.client('s3', region_name=region)
+        self.bedrock_agent = get_client('bedrock-agent', region)
+        self.bedrock_agent_runtime = get_client('bedrock-agent-runtime', region)
+        self.opensearch = get_client('opensearchserverless', region)
+        self.s3 = get_client('s3', region)
         
     def create_knowledge_base(self, name="egyptian-legal-contracts", bucket_name=None):
         """Create a new knowledge base for Egyptian legal contracts"""
@@ -330,7 +336,7 @@ class KnowledgeBaseManager:
     def query_knowledge_base(self, kb_id, query):
         """Test query against knowledge base"""
         try:
-            response = self.bedrock_agent.retrieve(
+            response = self.bedrock_agent_runtime.retrieve(
                 knowledgeBaseId=kb_id,
                 retrievalQuery={'text': query}
             )
@@ -62,14 +62,26 @@ def create_iam_role():
         else:
             raise e
 
+# Local development hosts, not imported by either Lambda
+DEV_ONLY_MODULES = {'streaming_server.py', 'local_s3.py'}
+
+def build_deployment_package(zip_path, source_dir='deployment'):
+    """Zip every handler module at the top level, where the handlers import them by bare name
+    
+    Pillow and PyMuPDF (OCR pre-processing and PDFs) are not included; add them as a layer.
+    """
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for name in sorted(os.listdir(source_dir)):
+            if name.endswith('.py') and name not in DEV_ONLY_MODULES:
+                zip_file.write(os.path.join(source_dir, name), name)
+    return zip_path
+
 def create_lambda_function(role_arn):
     """Create Lambda function"""
     lambda_client = boto3.client('lambda', region_name='us-west-2')
     
     # Create deployment package
-    zip_path = 'egyptian-legal-lambda-deployment.zip'
-    with zipfile.ZipFile(zip_path, 'w') as zip_file:
-        zip_file.write('lambda-deployment/lambda_function.py', 'lambda_function.py')
+    zip_path = build_deployment_package('egyptian-legal-lambda-deployment.zip')
     
     with open(zip_path, 'rb') as zip_file:
         zip_content = zip_file.read()
@@ -194,6 +206,172 @@ def create_s3_bucket():
         else:
             raise e
 
+def create_upload_bucket(role_name='egyptian-legal-lambda-role'):
+    """Create private S3 bucket for direct contract uploads"""
+    s3 = boto3.client('s3', region_name='us-west-2')
+    iam = boto3.client('iam', region_name='us-west-2')
+
+    bucket_name = 'egyptian-legal-contract-uploads'
+
+    try:
+        s3.create_bucket(
+            Bucket=bucket_name,
+            CreateBucketConfiguration={'LocationConstraint': 'us-west-2'}
+        )
+        print(f"Created S3 bucket: {bucket_name}")
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'BucketAlreadyOwnedByYou':
+            print("Upload bucket already exists")
+        else:
+            raise e
+
+    s3.put_public_access_block(
+        Bucket=bucket_name,
+        PublicAccessBlockConfiguration={
+            'BlockPublicAcls': True,
+            'IgnorePublicAcls': True,
+            'BlockPublicPolicy': True,
+            'RestrictPublicBuckets': True
+        }
+    )
+
+    # Browsers PUT files with presigned URLs and read part ETags for multipart uploads
+    s3.put_bucket_cors(
+        Bucket=bucket_name,
+        CORSConfiguration={
+            'CORSRules': [
+                {
+                    'AllowedOrigins': ['*'],
+                    'AllowedMethods': ['PUT'],
+                    'AllowedHeaders': ['*'],
+                    'ExposeHeaders': ['ETag'],
+                    'MaxAgeSeconds': 3000
+                }
+            ]
+        }
+    )
+
+    # Uploads are only needed until OCR has run, and large job payloads (jobs/) until the job expires
+    s3.put_bucket_lifecycle_configuration(
+        Bucket=bucket_name,
+        LifecycleConfiguration={
+            'Rules': [
+                {
+                    'ID': 'expire-uploads',
+                    'Filter': {'Prefix': 'uploads/'},
+                    'Status': 'Enabled',
+                    'Expiration': {'Days': 1},
+                    'AbortIncompleteMultipartUpload': {'DaysAfterInitiation': 1}
+                },
+                {
+                    'ID': 'expire-job-payloads',
+                    'Filter': {'Prefix': 'jobs/'},
+                    'Status': 'Enabled',
+                    'Expiration': {'Days': 1}
+                }
+            ]
+        }
+    )
+
+    upload_policy = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {
+                "Effect": "Allow",
+                "Action": [
+                    "s3:PutObject",
+                    "s3:GetObject",
+                    "s3:AbortMultipartUpload"
+                ],
+                "Resource": [
+                    f"arn:aws:s3:::{bucket_name}/uploads/*",
+                    f"arn:aws:s3:::{bucket_name}/jobs/*"
+                ]
+            }
+        ]
+    }
+
+    iam.put_role_policy(
+        RoleName=role_name,
+        PolicyName='egyptian-legal-contract-uploads',
+        PolicyDocument=json.dumps(upload_policy)
+    )
+
+    return bucket_name
+
+def create_job_table(lambda_arn, role_name='egyptian-legal-lambda-role'):
+    """Create DynamoDB table for asynchronous jobs, shared by all containers"""
+    dynamodb = boto3.client('dynamodb', region_name='us-west-2')
+    iam = boto3.client('iam', region_name='us-west-2')
+
+    table_name = 'egyptian-legal-jobs'
+
+    try:
+        dynamodb.create_table(
+            TableName=table_name,
+            AttributeDefinitions=[{'AttributeName': 'cache_key', 'AttributeType': 'S'}],
+            KeySchema=[{'AttributeName': 'cache_key', 'KeyType': 'HASH'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        print(f"Created DynamoDB table: {table_name}")
+        dynamodb.get_waiter('table_exists').wait(TableName=table_name)
+        dynamodb.update_time_to_live(
+            TableName=table_name,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ResourceInUseException':
+            print("Job table already exists")
+        else:
+            raise e
+
+    table_arn = dynamodb.describe_table(TableName=table_name)['Table']['TableArn']
+
+    # Jobs run in an asynchronous invocation of the API function itself
+    job_policy = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {
+                "Effect": "Allow",
+                "Action": [
+                    "dynamodb:GetItem",
+                    "dynamodb:PutItem",
+                    "dynamodb:UpdateItem",
+                    "dynamodb:DeleteItem"
+                ],
+                "Resource": table_arn
+            },
+            {
+                "Effect": "Allow",
+                "Action": "lambda:InvokeFunction",
+                "Resource": lambda_arn
+            }
+        ]
+    }
+
+    iam.put_role_policy(
+        RoleName=role_name,
+        PolicyName='egyptian-legal-jobs',
+        PolicyDocument=json.dumps(job_policy)
+    )
+
+    return table_name
+
+def configure_lambda_environment(variables, function_name='egyptian-legal-contract-api'):
+    """Merge environment variables into the Lambda function's configuration"""
+    lambda_client = boto3.client('lambda', region_name='us-west-2')
+
+    configuration = lambda_client.get_function_configuration(FunctionName=function_name)
+    environment = configuration.get('Environment', {}).get('Variables', {})
+    environment.update(variables)
+
+    lambda_client.get_waiter('function_updated').wait(FunctionName=function_name)
+    lambda_client.update_function_configuration(
+        FunctionName=function_name,
+        Environment={'Variables': environment}
+    )
+    print(f"Set {', '.join(sorted(variables))} on {function_name}")
+
 def main():
     """Set up complete AWS infrastructure"""
     print("Setting up AWS infrastructure for Egyptian Legal Contract Analysis...")
@@ -219,18 +397,40 @@ def main():
         print("\n4. Creating S3 bucket...")
         website_url = create_s3_bucket()
         
+        # Create upload bucket
+        print("\n5. Creating upload bucket...")
+        upload_bucket = create_upload_bucket()
+        
+        # Create job table
+        print("\n6. Creating job table...")
+        job_table = create_job_table(lambda_arn)
+        
+        # Point the function at the shared stores
+        print("\n7. Configuring Lambda environment...")
+        configure_lambda_environment({
+            'UPLOAD_BUCKET': upload_bucket,
+            'JOB_STORE_BACKEND': 'dynamodb',
+            'JOB_DYNAMODB_TABLE': job_table,
+            # The function timeout (300 s) plus a margin
+            'JOB_STALE_SECONDS': '330'
+        })
+        
         print(f"\n{'='*60}")
         print("AWS INFRASTRUCTURE SETUP COMPLETE!")
         print(f"{'='*60}")
         print(f"Lambda Function ARN: {lambda_arn}")
         print(f"API Gateway URL: {api_url}")
         print(f"Website URL: {website_url}")
+        print(f"Upload bucket: {upload_bucket}")
+        print(f"Job table: {job_table}")
         print(f"{'='*60}")
         
         return {
             'lambda_arn': lambda_arn,
             'api_url': api_url,
-            'website_url': website_url
+            'website_url': website_url,
+            'upload_bucket': upload_bucket,
+            'job_table': job_table
         }
         
     except Exception as e: